@@ -0,0 +1,40 @@
+"""Unique natural key on metrics
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Remove duplicates left by overlapping syncs, keeping the newest row
+    op.execute("""
+        DELETE FROM metrics older
+        USING metrics newer
+        WHERE older.user_id = newer.user_id
+          AND older.metric_type = newer.metric_type
+          AND older.source = newer.source
+          AND older.timestamp = newer.timestamp
+          AND older.id < newer.id
+    """)
+
+    # Includes the partitioning column, as unique indexes on hypertables must
+    op.create_index(
+        'uq_metrics_natural_key',
+        'metrics',
+        ['user_id', 'metric_type', 'source', 'timestamp'],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_metrics_natural_key', table_name='metrics')
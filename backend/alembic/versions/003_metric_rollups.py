@@ -0,0 +1,85 @@
+"""Hourly and daily continuous aggregates over metrics
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from api.config import settings
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+ROLLUPS = {
+    'metrics_hourly': {
+        'bucket_width': '1 hour',
+        'end_offset': '1 hour',
+        'schedule_interval': '30 minutes',
+    },
+    'metrics_daily': {
+        'bucket_width': '1 day',
+        'end_offset': '1 day',
+        'schedule_interval': '1 hour',
+    },
+}
+
+
+def _has_timescaledb() -> bool:
+    return op.get_bind().execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb')"
+    )).scalar()
+
+
+def upgrade() -> None:
+    if not _has_timescaledb():
+        # Plain Postgres: queries stay on the raw tier
+        return
+
+    for view, options in ROLLUPS.items():
+        # materialized_only = false keeps real-time aggregation on, so rows
+        # newer than the last refresh are still answered exactly
+        op.execute(f"""
+            CREATE MATERIALIZED VIEW {view}
+            WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+            SELECT
+                user_id,
+                metric_type,
+                time_bucket(INTERVAL '{options['bucket_width']}', timestamp) AS bucket,
+                count(value) AS value_count,
+                sum(value) AS value_sum,
+                sum(value * value) AS value_sum_sq,
+                avg(value) AS value_avg,
+                min(value) AS value_min,
+                max(value) AS value_max,
+                max(unit) AS unit
+            FROM metrics
+            GROUP BY user_id, metric_type, bucket
+            WITH NO DATA
+        """)
+        op.execute(
+            f"CREATE INDEX idx_{view}_user_metric_bucket "
+            f"ON {view} (user_id, metric_type, bucket)"
+        )
+
+        # start_offset covers the raw retention window, so backfilled data is
+        # picked up from the invalidation log wherever raw rows still exist
+        op.execute(f"""
+            SELECT add_continuous_aggregate_policy('{view}',
+                start_offset => INTERVAL '{settings.RAW_DATA_RETENTION_DAYS} days',
+                end_offset => INTERVAL '{options['end_offset']}',
+                schedule_interval => INTERVAL '{options['schedule_interval']}')
+        """)
+
+
+def downgrade() -> None:
+    if not _has_timescaledb():
+        return
+
+    for view in reversed(list(ROLLUPS)):
+        op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view} CASCADE")
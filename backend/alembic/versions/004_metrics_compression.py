@@ -0,0 +1,56 @@
+"""Native compression on the metrics hypertable
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from api.config import settings
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def _has_timescaledb() -> bool:
+    return op.get_bind().execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb')"
+    )).scalar()
+
+
+def upgrade() -> None:
+    if not _has_timescaledb():
+        return
+
+    # Every query is scoped to one user's metric type, so each compressed
+    # segment holds exactly the rows a query needs, already in the
+    # timestamp DESC order the service layer reads them in. source is a
+    # secondary sort key because the natural-key unique index includes it.
+    op.execute("""
+        ALTER TABLE metrics SET (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = 'user_id, metric_type',
+            timescaledb.compress_orderby = 'timestamp DESC, source'
+        )
+    """)
+    op.execute(f"""
+        SELECT add_compression_policy('metrics',
+            compress_after => INTERVAL '{settings.COMPRESSION_AFTER_DAYS} days')
+    """)
+
+
+def downgrade() -> None:
+    if not _has_timescaledb():
+        return
+
+    op.execute("SELECT remove_compression_policy('metrics', if_exists => true)")
+    op.execute("""
+        SELECT decompress_chunk(chunk, if_compressed => true)
+        FROM show_chunks('metrics') AS chunk
+    """)
+    op.execute("ALTER TABLE metrics SET (timescaledb.compress = false)")
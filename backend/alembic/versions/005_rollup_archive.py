@@ -0,0 +1,54 @@
+"""Daily/hourly rollup tables for plain Postgres
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+ROLLUPS = ['metrics_hourly', 'metrics_daily']
+
+
+def _has_timescaledb() -> bool:
+    return op.get_bind().execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb')"
+    )).scalar()
+
+
+def upgrade() -> None:
+    if _has_timescaledb():
+        # Continuous aggregates from migration 003 already hold the rollups
+        return
+
+    # Without TimescaleDB, retention writes the rollups of expiring raw data
+    # here before deleting it, mirroring the continuous aggregate columns
+    for table in ROLLUPS:
+        op.create_table(table,
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('metric_type', sa.String(), nullable=False),
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('value_count', sa.BigInteger(), nullable=False),
+        sa.Column('value_sum', sa.Float(), nullable=False),
+        sa.Column('value_sum_sq', sa.Float(), nullable=False),
+        sa.Column('value_avg', sa.Float(), nullable=False),
+        sa.Column('value_min', sa.Float(), nullable=False),
+        sa.Column('value_max', sa.Float(), nullable=False),
+        sa.Column('unit', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', 'metric_type', 'bucket')
+        )
+
+
+def downgrade() -> None:
+    if _has_timescaledb():
+        return
+
+    for table in reversed(ROLLUPS):
+        op.drop_table(table)
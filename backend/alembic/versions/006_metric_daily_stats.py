@@ -0,0 +1,64 @@
+"""Per-day sufficient statistics for metrics
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('metric_daily_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('metric_type', sa.String(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('value_count', sa.BigInteger(), nullable=False),
+    sa.Column('value_sum', sa.Float(), nullable=False),
+    sa.Column('value_sum_sq', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'metric_type', 'day')
+    )
+
+    # Backfill from raw rows, then from the daily rollup for days whose raw
+    # rows retention has already removed
+    op.execute("""
+        INSERT INTO metric_daily_stats (user_id, metric_type, day, value_count, value_sum, value_sum_sq)
+        SELECT
+            user_id,
+            metric_type,
+            (timestamp AT TIME ZONE 'UTC')::date AS day,
+            count(value),
+            sum(value),
+            sum(value * value)
+        FROM metrics
+        GROUP BY user_id, metric_type, day
+    """)
+
+    has_daily_rollup = op.get_bind().execute(sa.text(
+        "SELECT to_regclass('metrics_daily') IS NOT NULL"
+    )).scalar()
+    if has_daily_rollup:
+        op.execute("""
+            INSERT INTO metric_daily_stats (user_id, metric_type, day, value_count, value_sum, value_sum_sq)
+            SELECT
+                user_id,
+                metric_type,
+                (bucket AT TIME ZONE 'UTC')::date,
+                value_count,
+                value_sum,
+                value_sum_sq
+            FROM metrics_daily
+            ON CONFLICT (user_id, metric_type, day) DO NOTHING
+        """)
+
+
+def downgrade() -> None:
+    op.drop_table('metric_daily_stats')
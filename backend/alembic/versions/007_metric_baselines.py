@@ -0,0 +1,74 @@
+"""Streaming anomaly baselines per metric
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('metric_baselines',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('metric_type', sa.String(), nullable=False),
+    sa.Column('sample_count', sa.BigInteger(), nullable=False),
+    sa.Column('mean', sa.Float(), nullable=False),
+    sa.Column('m2', sa.Float(), nullable=False),
+    sa.Column('ewma_mean', sa.Float(), nullable=True),
+    sa.Column('ewma_var', sa.Float(), nullable=True),
+    sa.Column('last_timestamp', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_value', sa.Float(), nullable=True),
+    sa.Column('last_z', sa.Float(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'metric_type')
+    )
+
+    # Seed from the daily stats: exact lifetime moments, and the last 30 days'
+    # mean/variance as the starting point of the exponentially weighted state
+    op.execute("""
+        WITH recent AS (
+            SELECT user_id, metric_type, max(day) - 29 AS since
+            FROM metric_daily_stats
+            GROUP BY user_id, metric_type
+        )
+        INSERT INTO metric_baselines (
+            user_id, metric_type, sample_count, mean, m2,
+            ewma_mean, ewma_var, last_timestamp, updated_at
+        )
+        SELECT
+            s.user_id,
+            s.metric_type,
+            sum(s.value_count),
+            sum(s.value_sum) / sum(s.value_count),
+            greatest(sum(s.value_sum_sq) - sum(s.value_sum) ^ 2 / sum(s.value_count), 0),
+            sum(s.value_sum) FILTER (WHERE s.day >= r.since)
+                / sum(s.value_count) FILTER (WHERE s.day >= r.since),
+            greatest(
+                sum(s.value_sum_sq) FILTER (WHERE s.day >= r.since)
+                    / sum(s.value_count) FILTER (WHERE s.day >= r.since)
+                - (sum(s.value_sum) FILTER (WHERE s.day >= r.since)
+                    / sum(s.value_count) FILTER (WHERE s.day >= r.since)) ^ 2,
+                0
+            ),
+            (
+                SELECT max(m.timestamp) FROM metrics m
+                WHERE m.user_id = s.user_id AND m.metric_type = s.metric_type
+            ),
+            now()
+        FROM metric_daily_stats s
+        JOIN recent r ON r.user_id = s.user_id AND r.metric_type = s.metric_type
+        GROUP BY s.user_id, s.metric_type, r.since
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('metric_baselines')
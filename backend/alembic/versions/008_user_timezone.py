@@ -0,0 +1,23 @@
+"""Per-user time zone
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('timezone', sa.String(), nullable=False, server_default='UTC'))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'timezone')
@@ -0,0 +1,41 @@
+"""Precomputed insights
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('insights',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('insight_type', sa.String(), nullable=False),
+    sa.Column('metric_type', sa.String(), nullable=False),
+    sa.Column('related_metric_type', sa.String(), nullable=True),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('details', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('generated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_insights_id'), 'insights', ['id'], unique=False)
+    op.create_index('idx_user_insight_score', 'insights', ['user_id', 'score'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_user_insight_score', table_name='insights')
+    op.drop_index(op.f('ix_insights_id'), table_name='insights')
+    op.drop_table('insights')
@@ -0,0 +1,82 @@
+"""Per-day quantile sketches for metrics
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+import math
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+# Must match SKETCH_RELATIVE_ACCURACY and SKETCH_MIN_VALUE in services/sketches.py
+RELATIVE_ACCURACY = 0.01
+MIN_VALUE = 1e-9
+
+
+def upgrade() -> None:
+    op.create_table('metric_daily_sketches',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('metric_type', sa.String(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('value_count', sa.BigInteger(), nullable=False),
+    sa.Column('value_min', sa.Float(), nullable=False),
+    sa.Column('value_max', sa.Float(), nullable=False),
+    sa.Column('zero_count', sa.BigInteger(), nullable=False),
+    sa.Column('positive_keys', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.Column('positive_counts', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.Column('negative_keys', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.Column('negative_counts', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'metric_type', 'day')
+    )
+
+    # Backfill from raw rows; days retention already removed keep no sketch
+    ln_gamma = math.log((1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY))
+    op.execute(f"""
+        WITH binned AS (
+            SELECT
+                user_id,
+                metric_type,
+                (timestamp AT TIME ZONE 'UTC')::date AS day,
+                sign(value) * (abs(value) > {MIN_VALUE})::integer AS side,
+                CASE WHEN abs(value) > {MIN_VALUE}
+                    THEN ceil(ln(abs(value)) / {ln_gamma!r})::integer
+                    ELSE 0
+                END AS key,
+                count(*) AS value_count,
+                min(value) AS value_min,
+                max(value) AS value_max
+            FROM metrics
+            GROUP BY user_id, metric_type, day, side, key
+        )
+        INSERT INTO metric_daily_sketches (
+            user_id, metric_type, day, value_count, value_min, value_max, zero_count,
+            positive_keys, positive_counts, negative_keys, negative_counts
+        )
+        SELECT
+            user_id,
+            metric_type,
+            day,
+            sum(value_count),
+            min(value_min),
+            max(value_max),
+            coalesce(sum(value_count) FILTER (WHERE side = 0), 0),
+            coalesce(array_agg(key ORDER BY key) FILTER (WHERE side = 1), '{{}}'),
+            coalesce(array_agg(value_count::integer ORDER BY key) FILTER (WHERE side = 1), '{{}}'),
+            coalesce(array_agg(key ORDER BY key) FILTER (WHERE side = -1), '{{}}'),
+            coalesce(array_agg(value_count::integer ORDER BY key) FILTER (WHERE side = -1), '{{}}')
+        FROM binned
+        GROUP BY user_id, metric_type, day
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('metric_daily_sketches')
@@ -0,0 +1,46 @@
+"""Background export jobs
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('export_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('format', sa.String(), nullable=False),
+    sa.Column('metric_types', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('start_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('end_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('rows_total', sa.BigInteger(), nullable=True),
+    sa.Column('rows_written', sa.BigInteger(), nullable=False),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('file_path', sa.String(), nullable=True),
+    sa.Column('file_size', sa.BigInteger(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_export_jobs_id'), 'export_jobs', ['id'], unique=False)
+    op.create_index('idx_user_export_created', 'export_jobs', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_user_export_created', table_name='export_jobs')
+    op.drop_index(op.f('ix_export_jobs_id'), table_name='export_jobs')
+    op.drop_table('export_jobs')
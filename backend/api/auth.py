@@ -109,7 +109,13 @@ async def get_current_active_superuser(
     return current_user
 
 
-async def create_user(db: AsyncSession, email: str, password: str, full_name: Optional[str] = None) -> User:
+async def create_user(
+    db: AsyncSession,
+    email: str,
+    password: str,
+    full_name: Optional[str] = None,
+    timezone: str = "UTC"
+) -> User:
     """Create a new user"""
     # Check if user exists
     existing_user = await get_user_by_email(db, email)
@@ -122,6 +128,7 @@ async def create_user(db: AsyncSession, email: str, password: str, full_name: Op
         email=email,
         hashed_password=hashed_password,
         full_name=full_name,
+        timezone=timezone,
         is_active=True,
         is_superuser=False
     )
@@ -0,0 +1,28 @@
+"""
+Redis client for application caches
+"""
+import redis.asyncio as redis
+from typing import Optional
+from api.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Get the shared async Redis client (created lazily)"""
+    global _client
+    if _client is None:
+        _client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+
+async def close_redis():
+    """Close the shared Redis client"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+        logger.info("Redis connection closed")
@@ -28,6 +28,8 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379/0"
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
+    LATEST_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    RESULT_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
 
     # Garmin Connect API
     GARMIN_CLIENT_ID: str = ""
@@ -57,6 +59,7 @@ class Settings(BaseSettings):
     # Sync Configuration
     SYNC_INTERVAL_MINUTES: int = 60
     HISTORICAL_BACKFILL_DAYS: int = 90
+    BULK_INSERT_CHUNK_SIZE: int = 10000
 
     # Alert Configuration
     ENABLE_ALERTS: bool = True
@@ -84,6 +87,38 @@ class Settings(BaseSettings):
     RAW_DATA_RETENTION_DAYS: int = 365
     AGGREGATED_DATA_RETENTION_DAYS: int = 1825
     ALERT_HISTORY_RETENTION_DAYS: int = 90
+    COMPRESSION_AFTER_DAYS: int = 7
+    RETENTION_DELETE_BATCH_SIZE: int = 5000
+
+    # Segment analysis reads the hourly rollup for ranges at least this long
+    SEGMENT_ROLLUP_MIN_DAYS: int = 90
+
+    # Pattern detection (periodogram false alarm probability cutoff)
+    PATTERN_MAX_FALSE_ALARM: float = 0.01
+    PATTERN_TASK_CLAIM_SECONDS: int = 10 * 60
+
+    # Insights job
+    INSIGHTS_LOOKBACK_DAYS: int = 90
+    INSIGHTS_PER_USER: int = 20
+    INSIGHTS_BATCH_SIZE: int = 50  # Users per Celery task
+    INSIGHTS_CONCURRENCY: int = 4  # Users processed at once within a task
+
+    # Data exports (rows read and written per chunk; jobs and files kept for
+    # EXPORT_RETENTION_DAYS after they finish)
+    EXPORT_DIR: str = "./exports"
+    EXPORT_CHUNK_SIZE: int = 50000
+    EXPORT_RETENTION_DAYS: int = 7
+
+    # Streaming anomaly baselines (EWMA span in samples)
+    BASELINE_EWMA_SPAN: int = 30
+    BASELINE_MIN_SAMPLES: int = 10
+    BASELINE_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Compute Pool (CPU-bound analytics run in worker processes)
+    COMPUTE_POOL_WORKERS: int = 2  # 0 runs everything inline
+    COMPUTE_POOL_MAX_PENDING: int = 32
+    COMPUTE_TASK_TIMEOUT_SECONDS: float = 30.0
+    COMPUTE_INLINE_MAX_BYTES: int = 256 * 1024
 
     # Feature Flags
     ENABLE_CORRELATION_ANALYSIS: bool = True
@@ -5,7 +5,10 @@ from sqlalchemy import create_engine, event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from contextlib import asynccontextmanager
 from api.config import settings
+from api.cache import close_redis
 import logging
 
 logger = logging.getLogger(__name__)
@@ -62,3 +65,37 @@ async def get_db() -> AsyncSession:
             raise
         finally:
             await session.close()
+
+
+@asynccontextmanager
+async def task_session():
+    """
+    Session for Celery tasks
+
+    Each task runs its own event loop (asyncio.run), so it gets a dedicated
+    unpooled engine instead of the API's pool, which is bound to another loop.
+    The shared Redis client is closed on exit for the same reason.
+    """
+    task_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    try:
+        async with AsyncSession(task_engine, expire_on_commit=False) as session:
+            yield session
+    finally:
+        await task_engine.dispose()
+        await close_redis()
+
+
+@asynccontextmanager
+async def task_sessions():
+    """
+    Session factory for Celery tasks that work on several sessions at once
+
+    Same event loop constraints as task_session; every session opens its
+    own connection, so concurrency is bounded by the caller.
+    """
+    task_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    try:
+        yield async_sessionmaker(task_engine, class_=AsyncSession, expire_on_commit=False)
+    finally:
+        await task_engine.dispose()
+        await close_redis()
@@ -8,9 +8,11 @@ import logging
 from contextlib import asynccontextmanager
 
 from api.config import settings
-from api.routers import metrics, auth, sync, trends, alerts, analytics
+from api.routers import metrics, auth, sync, trends, alerts, analytics, admin
 from api.database import engine, init_db
+from api.cache import close_redis
 from api.middleware import LoggingMiddleware, RateLimitMiddleware
+from services.compute_pool import compute_pool, ComputePoolBusy, ComputeTimeout
 
 # Configure logging
 logging.basicConfig(
@@ -27,9 +29,12 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Hygieia API...")
     await init_db()
     logger.info("Database initialized")
+    compute_pool.start()
     yield
     # Shutdown
     logger.info("Shutting down Hygieia API...")
+    await compute_pool.shutdown()
+    await close_redis()
 
 
 # Create FastAPI app
@@ -63,6 +68,7 @@ app.include_router(sync.router, prefix=f"/api/{settings.API_VERSION}/sync", tags
 app.include_router(trends.router, prefix=f"/api/{settings.API_VERSION}/trends", tags=["Trends"])
 app.include_router(alerts.router, prefix=f"/api/{settings.API_VERSION}/alerts", tags=["Alerts"])
 app.include_router(analytics.router, prefix=f"/api/{settings.API_VERSION}/analytics", tags=["Analytics"])
+app.include_router(admin.router, prefix=f"/api/{settings.API_VERSION}/admin", tags=["Admin"])
 
 
 @app.get("/")
@@ -86,6 +92,25 @@ async def health_check():
     }
 
 
+@app.exception_handler(ComputePoolBusy)
+async def compute_busy_handler(request: Request, exc: ComputePoolBusy):
+    """Analytics workers are saturated; ask the client to retry"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "5"}
+    )
+
+
+@app.exception_handler(ComputeTimeout)
+async def compute_timeout_handler(request: Request, exc: ComputeTimeout):
+    """An analytics computation ran past its time limit"""
+    return JSONResponse(
+        status_code=504,
+        content={"detail": str(exc)}
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
@@ -2,19 +2,26 @@
 Database models package
 """
 from api.models.user import User
-from api.models.metric import Metric, MetricType
+from api.models.metric import Metric, MetricType, MetricDailyStat, MetricDailySketch, MetricBaseline
 from api.models.data_source import DataSource, DataSourceAuth
 from api.models.alert import Alert, AlertRule, AlertHistory
 from api.models.activity import Activity
+from api.models.insight import Insight
+from api.models.export import ExportJob
 
 __all__ = [
     "User",
     "Metric",
     "MetricType",
+    "MetricDailyStat",
+    "MetricDailySketch",
+    "MetricBaseline",
     "DataSource",
     "DataSourceAuth",
     "Alert",
     "AlertRule",
     "AlertHistory",
     "Activity",
+    "Insight",
+    "ExportJob",
 ]
@@ -0,0 +1,43 @@
+"""
+Export job models for background data exports
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from api.database import Base
+
+
+class ExportJob(Base):
+    """A user's request to export metrics to a file, written by a Celery task"""
+    __tablename__ = "export_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    # What to export
+    format = Column(String, nullable=False)  # parquet, csv, ndjson
+    metric_types = Column(JSONB, nullable=True)  # All metrics if null
+    start_date = Column(DateTime(timezone=True), nullable=True)
+    end_date = Column(DateTime(timezone=True), nullable=True)
+
+    # Progress
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed
+    rows_total = Column(BigInteger, nullable=True)
+    rows_written = Column(BigInteger, nullable=False, default=0)
+    error = Column(String, nullable=True)
+
+    # Result, relative to EXPORT_DIR
+    file_path = Column(String, nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_user_export_created', 'user_id', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<ExportJob(id={self.id}, format={self.format}, status={self.status})>"
@@ -0,0 +1,35 @@
+"""
+Insight models for precomputed analytics findings
+"""
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from api.database import Base
+
+
+class Insight(Base):
+    """A ranked finding about a user's data, regenerated by the insights job"""
+    __tablename__ = "insights"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    # What was found
+    insight_type = Column(String, nullable=False)  # correlation, anomaly, trend
+    metric_type = Column(String, nullable=False)
+    related_metric_type = Column(String, nullable=True)  # Other side of a correlation
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=False)
+
+    # Ranking (0-1, higher first) and the numbers behind the finding
+    score = Column(Float, nullable=False)
+    details = Column(JSONB, nullable=True)
+
+    generated_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_user_insight_score', 'user_id', 'score'),
+    )
+
+    def __repr__(self):
+        return f"<Insight(type={self.insight_type}, metric={self.metric_type}, score={self.score})>"
@@ -1,8 +1,8 @@
 """
 Metric models for time-series health data
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, Enum as SQLEnum
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, ForeignKey, Index, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from api.database import Base
 import enum
 
@@ -66,7 +66,16 @@ class Metric(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     # Metric identification
-    metric_type = Column(SQLEnum(MetricType), nullable=False, index=True)
+    # Stored as the enum value in a VARCHAR column, matching the migrations
+    metric_type = Column(
+        SQLEnum(
+            MetricType,
+            native_enum=False,
+            values_callable=lambda enum: [member.value for member in enum]
+        ),
+        nullable=False,
+        index=True
+    )
     source = Column(String, nullable=False, index=True)  # garmin, oura, wyze, etc.
 
     # Value and units
@@ -86,6 +95,8 @@ class Metric(Base):
 
     # Indexes for efficient querying
     __table_args__ = (
+        # Natural key: re-ingesting the same sample upserts instead of duplicating
+        Index('uq_metrics_natural_key', 'user_id', 'metric_type', 'source', 'timestamp', unique=True),
         Index('idx_user_metric_time', 'user_id', 'metric_type', 'timestamp'),
         Index('idx_user_time', 'user_id', 'timestamp'),
         Index('idx_metric_source_time', 'metric_type', 'source', 'timestamp'),
@@ -93,3 +104,71 @@ class Metric(Base):
 
     def __repr__(self):
         return f"<Metric(type={self.metric_type}, value={self.value}, timestamp={self.timestamp})>"
+
+
+class MetricDailyStat(Base):
+    """Per-day sufficient statistics of a metric, maintained at ingest"""
+    __tablename__ = "metric_daily_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    metric_type = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC calendar day
+
+    # Count, sum and sum of squares of the day's raw values
+    value_count = Column(BigInteger, nullable=False)
+    value_sum = Column(Float, nullable=False)
+    value_sum_sq = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<MetricDailyStat(type={self.metric_type}, day={self.day}, n={self.value_count})>"
+
+
+class MetricDailySketch(Base):
+    """Per-day DDSketch of a metric's raw values, maintained at ingest"""
+    __tablename__ = "metric_daily_sketches"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    metric_type = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC calendar day
+
+    value_count = Column(BigInteger, nullable=False)
+    value_min = Column(Float, nullable=False)
+    value_max = Column(Float, nullable=False)
+
+    # Sparse log-spaced bins (see services/sketches.py); values near zero
+    # are counted separately, negative values binned by magnitude
+    zero_count = Column(BigInteger, nullable=False, default=0)
+    positive_keys = Column(ARRAY(Integer), nullable=False)
+    positive_counts = Column(ARRAY(Integer), nullable=False)
+    negative_keys = Column(ARRAY(Integer), nullable=False)
+    negative_counts = Column(ARRAY(Integer), nullable=False)
+
+    def __repr__(self):
+        return f"<MetricDailySketch(type={self.metric_type}, day={self.day}, n={self.value_count})>"
+
+
+class MetricBaseline(Base):
+    """Streaming baseline of a metric, updated with every newly ingested sample"""
+    __tablename__ = "metric_baselines"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    metric_type = Column(String, primary_key=True)
+
+    # Welford running moments over every sample (variance = m2 / (count - 1))
+    sample_count = Column(BigInteger, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)
+
+    # Exponentially weighted moments, which follow recent behaviour
+    ewma_mean = Column(Float, nullable=True)
+    ewma_var = Column(Float, nullable=True)
+
+    # Newest sample folded into the EWMA and its score against the state before it
+    last_timestamp = Column(DateTime(timezone=True), nullable=True)
+    last_value = Column(Float, nullable=True)
+    last_z = Column(Float, nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<MetricBaseline(type={self.metric_type}, n={self.sample_count}, ewma={self.ewma_mean})>"
@@ -18,6 +18,9 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
 
+    # IANA zone name; local-time analytics (e.g. day-of-week segments) use it
+    timezone = Column(String, nullable=False, default="UTC", server_default="UTC")
+
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -0,0 +1,38 @@
+"""
+Administrative endpoints
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.auth import get_current_active_superuser
+from api.database import get_db
+from api.models.user import User
+from services.compute_pool import compute_pool
+from services.maintenance_service import MaintenanceService
+
+router = APIRouter()
+
+
+@router.get("/storage")
+async def get_storage_report(
+    current_user: User = Depends(get_current_active_superuser),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get storage report for the metrics hypertable
+
+    Returns the overall compression ratio and the size of every chunk
+    """
+    return await MaintenanceService.compression_report(db)
+
+
+@router.get("/compute")
+async def get_compute_stats(
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    Get analytics compute pool metrics
+
+    Returns queue depth, task counters and wait/execution time percentiles
+    """
+    return compute_pool.stats()
@@ -1,10 +1,22 @@
 """
 Analytics endpoints for correlation and advanced analysis
 """
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from datetime import date
+from datetime import date, datetime
+import os
+
+from api.auth import get_current_user
+from api.config import settings
+from api.database import get_db
+from api.models.user import User
+from api.routers.metrics import resolve_time_range
+from services.analytics_service import AnalyticsService
+from services.export_service import EXPORT_FORMATS, ExportService, export_file_path
+from services.insights_service import InsightsService
 
 router = APIRouter()
 
@@ -16,6 +28,42 @@ class CorrelationResult(BaseModel):
     p_value: float
     sample_size: int
     correlation_type: str  # pearson, spearman
+    lag_days: Optional[int] = None  # positive: metric_y follows metric_x
+
+
+class ExportRequest(BaseModel):
+    metric_types: Optional[List[str]] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    format: str = "parquet"  # parquet, csv, ndjson
+
+
+class ExportJobResult(BaseModel):
+    id: int
+    status: str  # pending, running, completed, failed
+    format: str
+    rows_total: Optional[int]
+    rows_written: int
+    file_size: Optional[int]
+    error: Optional[str]
+    created_at: Optional[datetime]
+    completed_at: Optional[datetime]
+    download_url: Optional[str]
+
+
+class InsightResult(BaseModel):
+    id: int
+    insight_type: str  # correlation, anomaly, trend
+    metric_type: str
+    related_metric_type: Optional[str]
+    title: str
+    description: str
+    score: float
+    details: Optional[dict]
+    generated_at: datetime
+
+    class Config:
+        from_attributes = True
 
 
 class SegmentComparison(BaseModel):
@@ -31,7 +79,10 @@ async def get_correlations(
     metric: Optional[str] = None,
     min_correlation: float = Query(0.3, ge=-1.0, le=1.0),
     start_date: Optional[date] = None,
-    end_date: Optional[date] = None
+    end_date: Optional[date] = None,
+    method: str = "pearson",
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get correlation analysis between metrics
@@ -40,9 +91,19 @@ async def get_correlations(
     - **min_correlation**: Minimum absolute correlation value to include
     - **start_date**: Start date for analysis
     - **end_date**: End date for analysis
+    - **method**: Correlation method (pearson, spearman)
     """
-    # TODO: Calculate correlations
-    return []
+    start, end = resolve_time_range(start_date, end_date, None)
+
+    return await AnalyticsService.find_correlations(
+        db,
+        current_user,
+        metric=metric,
+        min_correlation=min_correlation,
+        start_date=start,
+        end_date=end,
+        method=method
+    )
 
 
 @router.get("/correlations/{metric_x}/{metric_y}", response_model=CorrelationResult)
@@ -51,7 +112,10 @@ async def get_specific_correlation(
     metric_y: str,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    method: str = "pearson"
+    method: str = "pearson",
+    max_lag_days: Optional[int] = Query(None, ge=0, le=365),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get correlation between two specific metrics
@@ -59,40 +123,77 @@ async def get_specific_correlation(
     - **metric_x**: First metric
     - **metric_y**: Second metric
     - **method**: Correlation method (pearson, spearman)
+    - **max_lag_days**: Also try shifting metric_y up to this many days either way and return the strongest lag
     """
-    # TODO: Calculate specific correlation
-    return {
-        "metric_x": metric_x,
-        "metric_y": metric_y,
-        "correlation": 0.0,
-        "p_value": 1.0,
-        "sample_size": 0,
-        "correlation_type": method
-    }
+    start, end = resolve_time_range(start_date, end_date, None)
 
+    if max_lag_days is not None:
+        try:
+            return await AnalyticsService.calculate_lagged_correlation(
+                db,
+                current_user,
+                metric_x,
+                metric_y,
+                max_lag_days,
+                start_date=start,
+                end_date=end,
+                method=method
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/segment-comparison/{metric_type}")
+    return await AnalyticsService.calculate_correlation(
+        db,
+        current_user,
+        metric_x,
+        metric_y,
+        start_date=start,
+        end_date=end,
+        method=method
+    )
+
+
+@router.get("/segment-comparison/{metric_type}", response_model=List[SegmentComparison])
 async def segment_comparison(
     metric_type: str,
-    segment_by: str,  # e.g., "day_of_week", "activity_type", "sleep_quality"
+    segment_by: str,  # day_of_week, hour_of_day, month, activity_type, sleep_quality
     start_date: Optional[date] = None,
-    end_date: Optional[date] = None
+    end_date: Optional[date] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Compare metric values across different segments
 
     - **metric_type**: Metric to analyze
-    - **segment_by**: How to segment the data
+    - **segment_by**: How to segment the data, in the user's time zone
+    - **start_date**: Start date for analysis
+    - **end_date**: End date for analysis
     """
-    # TODO: Perform segmentation analysis
-    return []
+    start, end = resolve_time_range(start_date, end_date, None)
+
+    try:
+        return await AnalyticsService.segment_analysis(
+            db,
+            current_user,
+            metric_type,
+            segment_by,
+            start_date=start,
+            end_date=end
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/anomalies/{metric_type}")
 async def detect_anomalies(
     metric_type: str,
     sensitivity: float = Query(2.0, ge=1.0, le=5.0),
-    lookback_days: int = 30
+    lookback_days: int = 30,
+    method: str = "zscore",  # zscore, rolling_mad, ewma, online
+    window: int = Query(60, ge=3, le=10080),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Detect anomalies in metric data
@@ -100,61 +201,231 @@ async def detect_anomalies(
     - **metric_type**: Metric to analyze
     - **sensitivity**: Standard deviations for anomaly threshold
     - **lookback_days**: Days to look back for baseline
+    - **method**: Baseline: global mean/std (zscore), rolling median/MAD (rolling_mad), EWMA (ewma),
+      or the latest sample against the baseline kept at ingest (online)
+    - **window**: Samples in the rolling baseline window, or the EWMA span
     """
-    # TODO: Detect anomalies using statistical methods
-    return {
-        "metric_type": metric_type,
-        "anomalies": [],
-        "baseline_mean": 0.0,
-        "baseline_std": 0.0
-    }
+    try:
+        return await AnalyticsService.detect_anomalies(
+            db,
+            current_user,
+            metric_type,
+            sensitivity=sensitivity,
+            lookback_days=lookback_days,
+            method=method,
+            window=window
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/patterns/{metric_type}")
 async def detect_patterns(
     metric_type: str,
-    pattern_type: str = "cyclical"  # cyclical, seasonal, trend
+    response: Response,
+    pattern_type: str = "cyclical",  # cyclical, seasonal
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Detect patterns in metric data
 
     - **metric_type**: Metric to analyze
-    - **pattern_type**: Type of pattern to detect
+    - **pattern_type**: cyclical (3 hours to 45 days over the last 90 days of
+      hourly means) or seasonal (20 to 400 days over the last three years of
+      daily means, or as much as AGGREGATED_DATA_RETENTION_DAYS keeps)
+
+    Results are cached until new data arrives. When they are being
+    recomputed the response is 202 with status "pending" and the previous
+    result, if any; poll again shortly.
     """
-    # TODO: Detect patterns using time series analysis
-    return {
-        "metric_type": metric_type,
-        "pattern_type": pattern_type,
-        "patterns": []
-    }
+    try:
+        result = await AnalyticsService.get_patterns(db, current_user, metric_type, pattern_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    if result["status"] == "pending":
+        response.status_code = 202
+    return result
 
-@router.get("/insights")
-async def get_insights(limit: int = 10):
+
+@router.get("/insights", response_model=List[InsightResult])
+async def get_insights(
+    limit: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Get automatically generated insights
 
-    Returns AI-generated insights based on data analysis
+    Returns the strongest correlations, latest-day anomalies and trends in
+    the user's recent data, best first. They are regenerated daily by a
+    background job, so this is a single indexed read.
     """
-    # TODO: Generate insights using analytics
-    return []
+    return await InsightsService.get_insights(db, current_user, limit=limit)
 
 
-@router.post("/export")
+@router.post("/export", response_model=ExportJobResult, status_code=202)
 async def export_data(
-    metric_types: Optional[List[str]] = None,
-    start_date: Optional[date] = None,
-    end_date: Optional[date] = None,
-    format: str = "csv"  # csv, json, excel
+    request: ExportRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Export data for external analysis
 
+    Starts a background export; poll its status until it is completed,
+    then fetch the file from its download_url.
+
     - **metric_types**: Metrics to export (all if not specified)
-    - **format**: Export format
+    - **format**: Export format (parquet, csv, ndjson)
     """
-    # TODO: Generate export file
+    if not settings.ENABLE_EXPORT:
+        raise HTTPException(status_code=403, detail="Export is disabled")
+
+    start, end = resolve_time_range(request.start_date, request.end_date, None)
+    try:
+        job = await ExportService.create_job(
+            db,
+            current_user,
+            format=request.format,
+            metric_types=request.metric_types,
+            start_date=start,
+            end_date=end
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Imported here: the task module imports the services
+    from ingestion.tasks import export_metrics
+
+    try:
+        export_metrics.delay(job.id)
+    except Exception as e:
+        job.status = "failed"
+        job.error = f"Could not start export: {e}"
+        await db.commit()
+        raise HTTPException(status_code=503, detail="Export queue unavailable")
+    return _export_result(job)
+
+
+@router.get("/export/{job_id}", response_model=ExportJobResult)
+async def get_export(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the status and progress of an export
+    """
+    job = await ExportService.get_job(db, current_user, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return _export_result(job)
+
+
+@router.get("/export/{job_id}/download")
+async def download_export(
+    job_id: int,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Download a completed export
+
+    Supports a single HTTP Range (bytes=start-end, start- or -suffix), so
+    interrupted downloads of large exports can resume.
+    """
+    job = await ExportService.get_job(db, current_user, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    path = export_file_path(job)
+    if path is None:
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}, no file to download")
+
+    extension, media_type = EXPORT_FORMATS[job.format]
+    size = os.path.getsize(path)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="hygieia-export-{job.id}{extension}"'
+    }
+
+    byte_range = _parse_range(range_header, size)
+    if byte_range is None:
+        first, last, status_code = 0, size - 1, 200
+    elif byte_range is False:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    else:
+        first, last = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    headers["Content-Length"] = str(last - first + 1)
+
+    return StreamingResponse(
+        _read_file(path, first, last),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
+
+
+def _export_result(job) -> dict:
     return {
-        "status": "success",
-        "download_url": "/downloads/export.csv"
+        "id": job.id,
+        "status": job.status,
+        "format": job.format,
+        "rows_total": job.rows_total,
+        "rows_written": job.rows_written,
+        "file_size": job.file_size,
+        "error": job.error,
+        "created_at": job.created_at,
+        "completed_at": job.completed_at,
+        "download_url": (
+            f"/api/{settings.API_VERSION}/analytics/export/{job.id}/download"
+            if job.status == "completed" else None
+        )
     }
+
+
+def _parse_range(header: Optional[str], size: int):
+    """
+    First and last byte of a single byte range, inclusive
+
+    None serves the whole file: no header, or one this endpoint doesn't
+    handle (other units, several ranges, invalid syntax), which RFC 9110
+    allows ignoring.
+    False means the range can't be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[len("bytes="):].strip().partition("-")
+    try:
+        if not start:
+            # Suffix range: the last N bytes
+            length = int(end)
+            if length <= 0 or size == 0:
+                return False
+            return max(size - length, 0), size - 1
+        first = int(start)
+        last = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if last < first:
+        return None
+    if first >= size:
+        return False
+    return first, min(last, size - 1)
+
+
+def _read_file(path: str, first: int, last: int, chunk_size: int = 64 * 1024):
+    """Yield bytes first..last of a file; a plain generator, run in a thread by Starlette"""
+    with open(path, "rb") as file:
+        file.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
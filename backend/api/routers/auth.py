@@ -3,10 +3,11 @@ Authentication endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import timedelta
+from zoneinfo import ZoneInfo
 
 from api.database import get_db
 from api.auth import (
@@ -27,16 +28,37 @@ class Token(BaseModel):
     token_type: str
 
 
+def _check_timezone(value: Optional[str]) -> Optional[str]:
+    """Accept only IANA zone names the server knows"""
+    if value is not None:
+        try:
+            ZoneInfo(value)
+        except (KeyError, ValueError):
+            raise ValueError(f"Unknown time zone: {value}")
+    return value
+
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
     full_name: Optional[str] = None
+    timezone: str = "UTC"
+
+    _valid_timezone = field_validator("timezone")(_check_timezone)
+
+
+class UserUpdate(BaseModel):
+    full_name: Optional[str] = None
+    timezone: Optional[str] = None
+
+    _valid_timezone = field_validator("timezone")(_check_timezone)
 
 
 class UserResponse(BaseModel):
     id: int
     email: str
     full_name: Optional[str]
+    timezone: str
     is_active: bool
 
     class Config:
@@ -50,7 +72,8 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
         db=db,
         email=user_data.email,
         password=user_data.password,
-        full_name=user_data.full_name
+        full_name=user_data.full_name,
+        timezone=user_data.timezone
     )
     return user
 
@@ -132,6 +155,26 @@ async def get_me(current_user = Depends(get_current_user)):
     return current_user
 
 
+@router.patch("/me", response_model=UserResponse)
+async def update_me(
+    user_data: UserUpdate,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Update the current user's profile
+
+    - **timezone**: IANA zone name (e.g. Europe/Berlin) used for local-time analytics
+    """
+    for field, value in user_data.model_dump(exclude_unset=True).items():
+        if value is not None:
+            setattr(current_user, field, value)
+
+    await db.commit()
+    await db.refresh(current_user)
+    return current_user
+
+
 @router.get("/garmin/authorize")
 async def garmin_authorize(current_user = Depends(get_current_user)):
     """Initiate Garmin OAuth flow"""
@@ -1,12 +1,18 @@
 """
 Metrics endpoints for querying health data
 """
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime, date
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple, Union
+from datetime import datetime, date, time, timedelta
 from enum import Enum
 
+from api.auth import get_current_user
+from api.database import get_db
+from api.models.user import User
+from services.metrics_service import MetricsService
+
 router = APIRouter()
 
 
@@ -27,29 +33,77 @@ class MetricResponse(BaseModel):
     timestamp: datetime
     source: str
 
+    class Config:
+        from_attributes = True
+
+
+class MetricPage(BaseModel):
+    data: List[MetricResponse]
+    next_cursor: Optional[str] = None
+
+
+class MetricCreate(BaseModel):
+    metric_type: str
+    value: float
+    unit: str
+    source: str = "manual"
+    timestamp: Optional[datetime] = None
+
 
 class MetricSummary(BaseModel):
     metric_type: str
     count: int
     mean: float
-    median: float
+    median: Optional[float]
     min: float
     max: float
     std: float
     unit: str
 
 
-@router.get("/", response_model=List[MetricResponse])
+TIME_RANGE_DAYS = {
+    TimeRange.DAY: 1,
+    TimeRange.WEEK: 7,
+    TimeRange.MONTH: 30,
+    TimeRange.QUARTER: 90,
+    TimeRange.YEAR: 365,
+}
+
+
+def resolve_time_range(
+    start_date: Optional[date],
+    end_date: Optional[date],
+    time_range: Optional[TimeRange]
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Convert query dates/time range into an inclusive datetime window"""
+    if time_range == TimeRange.ALL:
+        return None, None
+
+    if time_range is not None:
+        end = datetime.utcnow()
+        return end - timedelta(days=TIME_RANGE_DAYS[time_range]), end
+
+    start = datetime.combine(start_date, time.min) if start_date else None
+    end = datetime.combine(end_date, time.max) if end_date else None
+    return start, end
+
+
+@router.get("/", response_model=Union[List[MetricResponse], MetricPage])
 async def get_metrics(
     metric_type: Optional[str] = None,
     source: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     time_range: Optional[TimeRange] = None,
-    limit: int = Query(1000, le=10000)
+    limit: int = Query(1000, ge=1, le=10000),
+    page_size: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=3, le=10000),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Query metrics with filters
+    Query metrics with filters, newest first
 
     - **metric_type**: Filter by metric type (e.g., heart_rate, steps)
     - **source**: Filter by data source (e.g., garmin, oura)
@@ -57,9 +111,50 @@ async def get_metrics(
     - **end_date**: End date for time range
     - **time_range**: Predefined time range (overrides start/end dates)
     - **limit**: Maximum number of results
+    - **page_size**: Paginate, with this many results per page
+    - **cursor**: `next_cursor` from the previous page, to continue after it
+    - **max_points**: Downsample the whole range to this many points (LTTB)
+      for charting; requires `metric_type` and disables pagination
+
+    Returns a list of up to `limit` metrics. Passing `page_size` or
+    `cursor` returns a page instead: `{"data": [...], "next_cursor": ...}`.
     """
-    # TODO: Implement metric querying from database
-    return []
+    start, end = resolve_time_range(start_date, end_date, time_range)
+
+    if max_points is not None:
+        if not metric_type:
+            raise HTTPException(status_code=400, detail="max_points requires metric_type")
+
+        points = await MetricsService.get_downsampled_metrics(
+            db,
+            current_user,
+            metric_type=metric_type,
+            max_points=max_points,
+            source=source,
+            start_date=start,
+            end_date=end
+        )
+        return points
+
+    paginated = page_size is not None or cursor is not None
+
+    try:
+        metrics, next_cursor = await MetricsService.get_metrics_page(
+            db,
+            current_user,
+            metric_type=metric_type,
+            source=source,
+            start_date=start,
+            end_date=end,
+            limit=page_size or limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not paginated:
+        return metrics
+    return {"data": metrics, "next_cursor": next_cursor}
 
 
 @router.get("/types")
@@ -80,38 +175,65 @@ async def get_metric_summary(
     metric_type: str,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    time_range: Optional[TimeRange] = None
+    time_range: Optional[TimeRange] = None,
+    include_median: bool = True,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get statistical summary for a metric"""
-    # TODO: Calculate statistics from database
-    return {
-        "metric_type": metric_type,
-        "count": 0,
-        "mean": 0.0,
-        "median": 0.0,
-        "min": 0.0,
-        "max": 0.0,
-        "std": 0.0,
-        "unit": "bpm"
-    }
+    """
+    Get statistical summary for a metric
+
+    - **include_median**: An exact median requires scanning raw samples, so
+      the default (true) always reads the raw tier. Set to false to let
+      whole-day/hour ranges be answered from the rollup tiers (median is
+      then null).
+    """
+    start, end = resolve_time_range(start_date, end_date, time_range)
+    return await MetricsService.get_metric_summary(
+        db,
+        current_user,
+        metric_type,
+        start_date=start,
+        end_date=end,
+        include_median=include_median
+    )
 
 
 @router.get("/latest")
-async def get_latest_metrics():
+async def get_latest_metrics(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     """Get latest value for each metric type"""
-    # TODO: Query latest metrics
-    return {}
+    return await MetricsService.get_latest_metrics(db, current_user)
 
 
 @router.post("/")
-async def create_metric(metric: MetricResponse):
+async def create_metric(
+    metric: MetricCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     """Manually add a metric (for testing or manual entries)"""
-    # TODO: Insert metric into database
-    return {"status": "success", "metric_id": 1}
+    created = await MetricsService.create_metric(
+        db,
+        current_user,
+        metric_type=metric.metric_type,
+        value=metric.value,
+        unit=metric.unit,
+        source=metric.source,
+        timestamp=metric.timestamp
+    )
+    return {"status": "success", "metric_id": created.id}
 
 
 @router.delete("/{metric_id}")
-async def delete_metric(metric_id: int):
+async def delete_metric(
+    metric_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     """Delete a metric"""
-    # TODO: Delete metric from database
+    if not await MetricsService.delete_metric(db, current_user, metric_id):
+        raise HTTPException(status_code=404, detail="Metric not found")
     return {"status": "success"}
@@ -1,17 +1,24 @@
 """
 Trend analysis endpoints
 """
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+
+from api.auth import get_current_user
+from api.database import get_db
+from api.models.user import User
+from api.routers.metrics import resolve_time_range
+from services.metrics_service import MetricsService, downsample_points
 
 router = APIRouter()
 
 
 class TrendPoint(BaseModel):
     timestamp: datetime
-    value: float
+    value: Optional[float] = None
     moving_average: Optional[float] = None
 
 
@@ -25,20 +32,41 @@ class TrendResponse(BaseModel):
 
 class ComparisonResponse(BaseModel):
     metric_type: str
-    current_period: float
-    previous_period: float
-    change: float
-    change_percentage: float
+    current_period: Optional[float] = None
+    previous_period: Optional[float] = None
+    change: Optional[float] = None
+    change_percentage: Optional[float] = None
     unit: str
 
 
+# Declared before /{metric_type}, which would otherwise capture "compare"
+@router.get("/compare", response_model=List[ComparisonResponse])
+async def compare_all_periods(
+    period: str = "week",  # week, month, quarter, year
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Compare current period with previous period for every metric
+
+    - **period**: Period to compare (week, month, quarter, year)
+    """
+    try:
+        return await MetricsService.compare_periods(db, current_user, period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/{metric_type}", response_model=TrendResponse)
 async def get_trend(
     metric_type: str,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     interval: str = "day",  # hour, day, week, month
-    moving_average_window: int = Query(7, ge=1, le=90)
+    moving_average_window: int = Query(7, ge=1, le=90),
+    max_points: Optional[int] = Query(None, ge=3, le=10000),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get trend data for a metric
@@ -48,21 +76,33 @@ async def get_trend(
     - **end_date**: End date for analysis
     - **interval**: Aggregation interval
     - **moving_average_window**: Window size for moving average
+    - **max_points**: Downsample the series to this many points (LTTB)
     """
-    # TODO: Calculate trend data
-    return {
-        "metric_type": metric_type,
-        "data": [],
-        "trend_direction": "stable",
-        "change_percentage": 0.0,
-        "unit": "bpm"
-    }
+    start, end = resolve_time_range(start_date, end_date, None)
+
+    try:
+        trend = await MetricsService.get_trend(
+            db,
+            current_user,
+            metric_type,
+            start_date=start,
+            end_date=end,
+            interval=interval,
+            moving_average_window=moving_average_window
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    trend["data"] = downsample_points(trend["data"], max_points)
+    return trend
 
 
 @router.get("/compare/{metric_type}", response_model=ComparisonResponse)
 async def compare_periods(
     metric_type: str,
-    period: str = "week"  # week, month, quarter, year
+    period: str = "week",  # week, month, quarter, year
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Compare current period with previous period
@@ -70,32 +110,56 @@ async def compare_periods(
     - **metric_type**: Type of metric to compare
     - **period**: Period to compare (week, month, quarter, year)
     """
-    # TODO: Calculate period comparison
-    return {
-        "metric_type": metric_type,
-        "current_period": 0.0,
-        "previous_period": 0.0,
-        "change": 0.0,
-        "change_percentage": 0.0,
-        "unit": "bpm"
-    }
+    try:
+        comparisons = await MetricsService.compare_periods(
+            db, current_user, period, metric_type=metric_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not comparisons:
+        return {"metric_type": metric_type, "unit": ""}
+    return comparisons[0]
 
 
 @router.get("/calendar/{metric_type}")
 async def get_calendar_heatmap(
     metric_type: str,
-    year: int
+    year: int = Query(..., ge=1900, le=2100),
+    format: str = "dict",  # dict, dense
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get calendar heatmap data for a metric
 
     Returns daily aggregated values for visualization as a calendar heatmap
+
+    - **year**: Calendar year (UTC days)
+    - **format**: "dict" maps ISO dates to values; "dense" returns one value
+      (or null) per day of the year from ``start_date``
     """
-    # TODO: Generate calendar heatmap data
+    if format not in ("dict", "dense"):
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+
+    days = await MetricsService.get_calendar(db, current_user, metric_type, year)
+    start = date(year, 1, 1)
+
+    if format == "dense":
+        return {
+            "metric_type": metric_type,
+            "year": year,
+            "start_date": start.isoformat(),
+            "data": days
+        }
     return {
         "metric_type": metric_type,
         "year": year,
-        "data": {}  # {date: value}
+        "data": {
+            (start + timedelta(days=offset)).isoformat(): value
+            for offset, value in enumerate(days)
+            if value is not None
+        }
     }
 
 
@@ -104,22 +168,26 @@ async def get_distribution(
     metric_type: str,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    bins: int = 20
+    bins: int = Query(20, ge=1, le=200),
+    exact: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get distribution data for a metric
 
     Returns histogram data for distribution visualization
+
+    - **bins**: Number of equal-width histogram bins between the minimum and maximum
+    - **exact**: Compute from raw samples instead of the daily sketches (for validation)
     """
-    # TODO: Calculate distribution
-    return {
-        "metric_type": metric_type,
-        "histogram": [],
-        "percentiles": {
-            "p10": 0.0,
-            "p25": 0.0,
-            "p50": 0.0,
-            "p75": 0.0,
-            "p90": 0.0
-        }
-    }
+    start, end = resolve_time_range(start_date, end_date, None)
+    return await MetricsService.get_distribution(
+        db,
+        current_user,
+        metric_type,
+        start_date=start,
+        end_date=end,
+        bins=bins,
+        exact=exact
+    )
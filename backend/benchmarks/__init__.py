@@ -0,0 +1,6 @@
+"""
+Performance benchmarks
+
+Run from the backend directory against a development database, e.g.
+``python -m benchmarks.bench_metric_summary``.
+"""
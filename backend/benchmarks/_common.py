@@ -0,0 +1,78 @@
+"""
+Shared helpers for benchmarks
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, delete, func, literal
+from typing import Awaitable, Callable, List
+from datetime import datetime
+import statistics
+import time
+import uuid
+
+from api.models.metric import Metric
+from api.models.user import User
+
+
+async def create_bench_user(db: AsyncSession) -> User:
+    """Create a throwaway user that owns all benchmark rows"""
+    user = User(
+        email=f"bench-{uuid.uuid4().hex[:12]}@hygieia.local",
+        hashed_password="!",
+        full_name="Benchmark",
+        is_active=True,
+        is_superuser=False
+    )
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+
+async def seed_metrics(
+    db: AsyncSession,
+    user: User,
+    metric_type: str,
+    count: int,
+    start: datetime = datetime(2020, 1, 1)
+) -> None:
+    """Insert ``count`` minute-spaced samples server-side with generate_series"""
+    g = func.generate_series(0, count - 1).column_valued("g")
+    stmt = insert(Metric).from_select(
+        ["user_id", "metric_type", "source", "value", "unit", "timestamp", "is_manual"],
+        select(
+            literal(user.id),
+            literal(metric_type, Metric.metric_type.type),
+            literal("benchmark"),
+            60 + 15 * func.random(),
+            literal("bpm"),
+            literal(start) + func.make_interval(0, 0, 0, 0, 0, g),
+            literal(0)
+        )
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def drop_bench_user(db: AsyncSession, user: User) -> None:
+    """Remove a benchmark user and everything it owns"""
+    await db.execute(delete(Metric).where(Metric.user_id == user.id))
+    await db.execute(delete(User).where(User.id == user.id))
+    await db.commit()
+
+
+async def timed(fn: Callable[[], Awaitable], repeat: int = 5) -> List[float]:
+    """Run an async callable ``repeat`` times and return wall times in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: List[float]) -> str:
+    """Format median/best timings for a benchmark row"""
+    return (
+        f"{label:<28} median {statistics.median(timings) * 1000:9.1f} ms"
+        f"   best {min(timings) * 1000:9.1f} ms"
+    )
@@ -0,0 +1,84 @@
+"""
+Benchmark bulk ingest throughput: ORM add_all vs binary COPY
+
+Usage: python -m benchmarks.bench_bulk_ingest [--sizes 10000 100000]
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete
+from datetime import datetime, timedelta
+from typing import List
+import argparse
+import asyncio
+import random
+import time
+
+from api.database import AsyncSessionLocal
+from api.models.metric import Metric, MetricType
+from api.models.user import User
+from services.metrics_service import MetricsService
+from benchmarks._common import create_bench_user, drop_bench_user
+
+
+def synthetic_rows(count: int, start: datetime) -> List[dict]:
+    """Minute-spaced intraday heart rate rows shaped like normalized Garmin data"""
+    return [
+        {
+            "metric_type": MetricType.HEART_RATE,
+            "value": 60 + 15 * random.random(),
+            "unit": "bpm",
+            "source": "garmin",
+            "timestamp": start + timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+async def orm_add_all(db: AsyncSession, user: User, metrics_data: List[dict]) -> int:
+    """Previous implementation: one ORM object per row, flushed as INSERTs"""
+    metrics = [
+        Metric(
+            user_id=user.id,
+            **metric_data
+        )
+        for metric_data in metrics_data
+    ]
+
+    db.add_all(metrics)
+    await db.commit()
+
+    return len(metrics)
+
+
+async def run(sizes):
+    async with AsyncSessionLocal() as db:
+        user = await create_bench_user(db)
+        try:
+            for size in sizes:
+                rows = synthetic_rows(size, datetime(2020, 1, 1))
+                print(f"\n{size:,} rows")
+
+                for label, loader in (
+                    ("ORM add_all", orm_add_all),
+                    ("COPY bulk_load_metrics", MetricsService.bulk_load_metrics),
+                ):
+                    start = time.perf_counter()
+                    await loader(db, user, rows)
+                    elapsed = time.perf_counter() - start
+                    print(f"{label:<28} {size / elapsed:12,.0f} rows/s   ({elapsed:.2f} s)")
+
+                    db.expunge_all()
+                    await db.execute(delete(Metric).where(Metric.user_id == user.id))
+                    await db.commit()
+        finally:
+            await drop_bench_user(db, user)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark MetricsService.get_metric_summary against the ORM + pandas path
+
+Usage: python -m benchmarks.bench_metric_summary [--sizes 10000 100000 1000000]
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, and_
+import argparse
+import asyncio
+import pandas as pd
+
+from api.database import AsyncSessionLocal
+from api.models.metric import Metric, MetricType
+from api.models.user import User
+from services.metrics_service import MetricsService
+from benchmarks._common import create_bench_user, seed_metrics, drop_bench_user, timed, report
+
+
+async def orm_pandas_summary(db: AsyncSession, user: User, metric_type: str) -> dict:
+    """Previous implementation: hydrate every row, then summarize with pandas"""
+    query = select(Metric).where(
+        and_(
+            Metric.user_id == user.id,
+            Metric.metric_type == metric_type
+        )
+    )
+    result = await db.execute(query)
+    metrics = result.scalars().all()
+
+    values = [m.value for m in metrics]
+    df = pd.Series(values)
+
+    return {
+        "metric_type": metric_type,
+        "count": len(values),
+        "mean": float(df.mean()),
+        "median": float(df.median()),
+        "min": float(df.min()),
+        "max": float(df.max()),
+        "std": float(df.std()),
+        "unit": metrics[0].unit if metrics else ""
+    }
+
+
+async def run(sizes, repeat):
+    metric_type = MetricType.HEART_RATE
+
+    for size in sizes:
+        async with AsyncSessionLocal() as db:
+            user = await create_bench_user(db)
+            try:
+                await seed_metrics(db, user, metric_type, size)
+
+                async def legacy():
+                    await orm_pandas_summary(db, user, metric_type)
+                    db.expunge_all()
+
+                async def aggregate():
+                    await MetricsService.get_metric_summary(db, user, metric_type)
+
+                print(f"\n{size:,} rows")
+                print(report("ORM + pandas", await timed(legacy, repeat)))
+                print(report("SQL aggregate", await timed(aggregate, repeat)))
+            finally:
+                await drop_bench_user(db, user)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
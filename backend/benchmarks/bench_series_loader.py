@@ -0,0 +1,85 @@
+"""
+Benchmark services.timeseries.load_series against ORM entities + DataFrame
+
+Reports latency and peak Python heap (tracemalloc) for both paths.
+
+Usage: python -m benchmarks.bench_series_loader [--sizes 10000 100000 1000000]
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, and_
+import argparse
+import asyncio
+import tracemalloc
+import pandas as pd
+
+from api.database import AsyncSessionLocal
+from api.models.metric import Metric, MetricType
+from api.models.user import User
+from services.timeseries import load_series
+from benchmarks._common import create_bench_user, seed_metrics, drop_bench_user, timed, report
+
+
+async def orm_dataframe(db: AsyncSession, user: User, metric_type: str) -> pd.DataFrame:
+    """Previous pattern: hydrate every Metric, then copy into a DataFrame"""
+    query = select(Metric).where(
+        and_(
+            Metric.user_id == user.id,
+            Metric.metric_type == metric_type
+        )
+    ).order_by(Metric.timestamp)
+    result = await db.execute(query)
+    metrics = result.scalars().all()
+
+    df = pd.DataFrame([
+        {"timestamp": m.timestamp, "value": m.value}
+        for m in metrics
+    ])
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+
+async def peak_memory(fn) -> int:
+    """Peak traced allocation, in bytes, while running an async callable once"""
+    tracemalloc.start()
+    try:
+        await fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+async def run(sizes, repeat):
+    metric_type = MetricType.HEART_RATE
+
+    for size in sizes:
+        async with AsyncSessionLocal() as db:
+            user = await create_bench_user(db)
+            try:
+                await seed_metrics(db, user, metric_type, size)
+
+                async def legacy():
+                    await orm_dataframe(db, user, metric_type)
+                    db.expunge_all()
+
+                async def columnar():
+                    await load_series(db, user.id, metric_type)
+
+                print(f"\n{size:,} rows")
+                print(report("ORM + DataFrame", await timed(legacy, repeat)))
+                print(report("load_series", await timed(columnar, repeat)))
+                print(f"{'ORM + DataFrame':<28} peak {await peak_memory(legacy) / 2**20:9.1f} MiB")
+                print(f"{'load_series':<28} peak {await peak_memory(columnar) / 2**20:9.1f} MiB")
+            finally:
+                await drop_bench_user(db, user)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,18 @@
 """
 Celery tasks for data synchronization
 """
-from celery import Celery
+from celery import Celery, group
 from celery.schedules import crontab
 from api.config import settings
+from api.database import task_session, task_sessions
+from api.models.user import User
+from services.analytics_service import AnalyticsService
+from services.export_service import ExportService
+from services.insights_service import InsightsService
+from services.maintenance_service import MaintenanceService
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +53,10 @@ celery_app.conf.beat_schedule = {
         'task': 'ingestion.tasks.check_alert_rules',
         'schedule': crontab(minute='*/5'),  # Every 5 minutes
     },
+    'generate-insights-daily': {
+        'task': 'ingestion.tasks.generate_insights',
+        'schedule': crontab(hour=3, minute=0),  # 3 AM daily, after cleanup
+    },
 }
 
 
@@ -69,7 +81,9 @@ def sync_garmin_data(user_id: int, backfill_days: int = 1):
         # 1. Get user's Garmin credentials from database
         # 2. Authenticate with Garmin API
         # 3. Fetch data (sleep, activities, heart rate, etc.)
-        # 4. Normalize and store in database
+        # 4. Normalize and upsert via MetricsService.bulk_load_metrics
+        #    (keyed on the metrics natural key, so overlapping backfill
+        #    windows are no-ops rather than duplicate rows)
         # 5. Update sync status
 
         return {
@@ -156,12 +170,16 @@ def cleanup_old_data():
     logger.info("Running data cleanup")
 
     try:
-        # TODO: Delete data older than retention period
-        # TODO: Archive old alert history
+        report = asyncio.run(_apply_retention())
 
         return {
             "status": "success",
-            "records_deleted": 0
+            "records_deleted": (
+                report["raw_rows_reclaimed"]
+                + report["aggregate_rows_reclaimed"]
+                + report["alert_history_deleted"]
+            ),
+            **report
         }
     except Exception as e:
         logger.error(f"Data cleanup failed: {e}")
@@ -171,6 +189,147 @@ def cleanup_old_data():
         }
 
 
+async def _apply_retention() -> dict:
+    async with task_session() as db:
+        report = await MaintenanceService.apply_retention(db)
+    async with task_session() as db:
+        report["exports_expired"] = await ExportService.expire(db)
+    return report
+
+
+@celery_app.task(name='ingestion.tasks.detect_patterns')
+def detect_patterns(user_id: int, metric_type: str, pattern_type: str, version: str):
+    """Detect periodic patterns in a metric and cache them as of a data version"""
+    logger.info(f"Detecting {pattern_type} patterns in {metric_type} for user {user_id}")
+
+    try:
+        result = asyncio.run(_detect_patterns(user_id, metric_type, pattern_type, version))
+
+        return {
+            "status": "success",
+            "user_id": user_id,
+            "metric_type": metric_type,
+            "patterns_found": len(result["patterns"])
+        }
+    except Exception as e:
+        logger.error(f"Pattern detection failed for user {user_id}: {e}")
+        return {
+            "status": "failed",
+            "user_id": user_id,
+            "error": str(e)
+        }
+
+
+async def _detect_patterns(user_id: int, metric_type: str, pattern_type: str, version: str) -> dict:
+    async with task_session() as db:
+        user = await db.get(User, user_id)
+        return await AnalyticsService.refresh_patterns(db, user, metric_type, pattern_type, version)
+
+
+@celery_app.task(name='ingestion.tasks.generate_insights')
+def generate_insights():
+    """Fan insight generation for all active users out to batch tasks"""
+    logger.info("Scheduling insight generation")
+
+    try:
+        user_ids = asyncio.run(_active_user_ids())
+        size = settings.INSIGHTS_BATCH_SIZE
+        batches = [user_ids[i:i + size] for i in range(0, len(user_ids), size)]
+        group(generate_insights_batch.s(batch) for batch in batches).apply_async()
+
+        return {
+            "status": "success",
+            "users": len(user_ids),
+            "batches": len(batches)
+        }
+    except Exception as e:
+        logger.error(f"Insight scheduling failed: {e}")
+        return {
+            "status": "failed",
+            "error": str(e)
+        }
+
+
+async def _active_user_ids() -> list:
+    async with task_session() as db:
+        return await InsightsService.active_user_ids(db)
+
+
+@celery_app.task(name='ingestion.tasks.generate_insights_batch')
+def generate_insights_batch(user_ids: list):
+    """Regenerate insights for a batch of users, reporting compute time per user"""
+    logger.info(f"Generating insights for {len(user_ids)} users")
+
+    try:
+        users = asyncio.run(_generate_insights_batch(user_ids))
+
+        return {
+            "status": "success",
+            "users_processed": sum(1 for user in users if user["status"] == "success"),
+            "users_failed": sum(1 for user in users if user["status"] == "failed"),
+            "users": users
+        }
+    except Exception as e:
+        logger.error(f"Insight batch failed: {e}")
+        return {
+            "status": "failed",
+            "error": str(e)
+        }
+
+
+async def _generate_insights_batch(user_ids: list) -> list:
+    semaphore = asyncio.Semaphore(settings.INSIGHTS_CONCURRENCY)
+
+    async with task_sessions() as sessions:
+        async def generate(user_id: int) -> dict:
+            async with semaphore, sessions() as db:
+                started = time.perf_counter()
+                try:
+                    count = await InsightsService.generate(db, user_id)
+                except Exception as e:
+                    logger.error(f"Insight generation failed for user {user_id}: {e}")
+                    return {"user_id": user_id, "status": "failed", "error": str(e)}
+                seconds = round(time.perf_counter() - started, 3)
+                logger.info(f"Generated {count} insights for user {user_id} in {seconds}s")
+                return {"user_id": user_id, "status": "success", "insights": count, "seconds": seconds}
+
+        return await asyncio.gather(*(generate(user_id) for user_id in user_ids))
+
+
+# Long histories take a while to stream; exports get their own time limit
+@celery_app.task(
+    name='ingestion.tasks.export_metrics',
+    time_limit=4 * 60 * 60,
+    soft_time_limit=4 * 60 * 60 - 5 * 60
+)
+def export_metrics(job_id: int):
+    """Write an export job's file"""
+    logger.info(f"Running export {job_id}")
+
+    try:
+        job = asyncio.run(_export_metrics(job_id))
+
+        return {
+            "status": "success",
+            "job_id": job_id,
+            "rows_written": job.rows_written,
+            "file_size": job.file_size
+        }
+    except Exception as e:
+        logger.error(f"Export {job_id} failed: {e}")
+        return {
+            "status": "failed",
+            "job_id": job_id,
+            "error": str(e)
+        }
+
+
+async def _export_metrics(job_id: int):
+    async with task_sessions() as sessions:
+        async with sessions() as db, sessions() as progress_db:
+            return await ExportService.run(db, progress_db, job_id)
+
+
 @celery_app.task(name='ingestion.tasks.check_alert_rules')
 def check_alert_rules():
     """Check all active alert rules and trigger alerts"""
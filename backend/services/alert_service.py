@@ -4,12 +4,16 @@ Alert service for rule evaluation
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from typing import List, Optional
-from datetime import datetime, timedelta
-import pandas as pd
+from datetime import datetime, timedelta, timezone
+import numpy as np
 
+from api.config import settings
 from api.models.alert import AlertRule, Alert, AlertHistory, AlertPriority
-from api.models.metric import Metric
 from api.models.user import User
+from services.baselines import BaselineService
+from services.compute_pool import compute_pool
+from services.kernels import linear_slope
+from services.timeseries import load_series
 
 
 class AlertService:
@@ -91,22 +95,13 @@ class AlertService:
         # Get recent metrics
         start_time = datetime.utcnow() - timedelta(minutes=max(duration_minutes, 60))
 
-        query = select(Metric).where(
-            and_(
-                Metric.user_id == user_id,
-                Metric.metric_type == metric_type,
-                Metric.timestamp >= start_time
-            )
-        ).order_by(Metric.timestamp.desc())
-
-        result = await db.execute(query)
-        metrics = result.scalars().all()
+        series = await load_series(db, user_id, metric_type, start_time)
 
-        if not metrics:
+        if not len(series):
             return False
 
         # Check if condition met
-        latest_value = metrics[0].value
+        latest_value = series.values[-1]
 
         if operator == '>':
             condition_met = latest_value > threshold
@@ -124,17 +119,12 @@ class AlertService:
         # If duration specified, check if condition sustained
         if duration_minutes > 0 and condition_met:
             # Check if all metrics in duration meet condition
-            for metric in metrics:
-                if metric.timestamp < start_time:
-                    break
+            if operator == '>' and np.any(series.values <= threshold):
+                return False
+            elif operator == '<' and np.any(series.values >= threshold):
+                return False
 
-                value = metric.value
-                if operator == '>' and value <= threshold:
-                    return False
-                elif operator == '<' and value >= threshold:
-                    return False
-
-        return condition_met
+        return bool(condition_met)
 
     @staticmethod
     async def _evaluate_trend(
@@ -150,35 +140,14 @@ class AlertService:
         # Get metrics for the period
         start_date = datetime.utcnow() - timedelta(days=days)
 
-        query = select(Metric).where(
-            and_(
-                Metric.user_id == user_id,
-                Metric.metric_type == metric_type,
-                Metric.timestamp >= start_date
-            )
-        ).order_by(Metric.timestamp)
+        series = await load_series(db, user_id, metric_type, start_date)
 
-        result = await db.execute(query)
-        metrics = result.scalars().all()
-
-        if len(metrics) < 2:
+        if len(series) < 2:
             return False
 
-        # Calculate trend
-        df = pd.DataFrame([
-            {"timestamp": m.timestamp, "value": m.value}
-            for m in metrics
-        ])
-
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
-
         # Calculate linear regression
-        x = (df['timestamp'] - df['timestamp'].min()).dt.total_seconds()
-        y = df['value']
-
-        from scipy import stats
-        slope, _, _, _, _ = stats.linregress(x, y)
+        x = series.epoch_seconds()
+        slope = await compute_pool.run(linear_slope, x - x[0], series.values)
 
         # Check direction
         if direction == 'increasing':
@@ -194,57 +163,29 @@ class AlertService:
         user_id: int,
         conditions: dict
     ) -> bool:
-        """Evaluate anomaly condition"""
+        """
+        Evaluate anomaly condition
+
+        Today's latest value is scored at ingest against the metric's streaming
+        baseline (see BaselineService), so this reads one state instead of
+        scanning a lookback window; lookback_days is no longer consulted.
+        """
         metric_type = conditions.get('metric')
         sensitivity = conditions.get('sensitivity', 2.0)
-        lookback_days = conditions.get('lookback_days', 30)
 
-        # Get baseline data
-        end_date = datetime.utcnow() - timedelta(days=1)  # Exclude today
-        start_date = end_date - timedelta(days=lookback_days)
+        state = await BaselineService.get(db, user_id, metric_type)
 
-        query = select(Metric).where(
-            and_(
-                Metric.user_id == user_id,
-                Metric.metric_type == metric_type,
-                Metric.timestamp >= start_date,
-                Metric.timestamp <= end_date
-            )
-        )
-
-        result = await db.execute(query)
-        baseline_metrics = result.scalars().all()
-
-        if not baseline_metrics:
+        if state is None or state["last_z"] is None:
             return False
-
-        # Get today's value
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_query = select(Metric).where(
-            and_(
-                Metric.user_id == user_id,
-                Metric.metric_type == metric_type,
-                Metric.timestamp >= today_start
-            )
-        ).order_by(Metric.timestamp.desc()).limit(1)
-
-        today_result = await db.execute(today_query)
-        today_metric = today_result.scalar_one_or_none()
-
-        if not today_metric:
+        if state["count"] < settings.BASELINE_MIN_SAMPLES:
             return False
 
-        # Calculate z-score
-        baseline_values = [m.value for m in baseline_metrics]
-        mean = pd.Series(baseline_values).mean()
-        std = pd.Series(baseline_values).std()
-
-        if std == 0:
+        # Only a value recorded today counts
+        today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        if state["last_epoch"] < today_start.timestamp():
             return False
 
-        z_score = abs((today_metric.value - mean) / std)
-
-        return z_score > sensitivity
+        return bool(abs(state["last_z"]) > sensitivity)
 
     @staticmethod
     async def _trigger_alert(
@@ -2,15 +2,77 @@
 Analytics service for correlations and insights
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from typing import List, Tuple, Optional
-from datetime import datetime
-import pandas as pd
+from sqlalchemy import select, func, and_, case, cast, extract, literal_column, Date
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import calendar
+import logging
 import numpy as np
-from scipy import stats
 
-from api.models.metric import Metric
+from api.config import settings
+from api.models.activity import Activity
+from api.models.metric import Metric, MetricType
 from api.models.user import User
+from services.baselines import BaselineService, baseline_summary
+from services.compute_pool import compute_pool
+from services.kernels import (
+    binned_means,
+    correlation_matrix,
+    correlation_p_values,
+    daily_correlation,
+    lagged_pearson,
+    periodic_components,
+    rolling_outliers,
+    zscore_outliers,
+)
+from services.daily_stats import DailyStatsService, day_aligned
+from services.result_cache import DataVersions, ResultCache
+from services.tiers import Tier, ROLLUP_TABLES, choose_tier, rollups_available
+from services.timeseries import load_series, load_daily_matrix
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_METHODS = ("zscore", "rolling_mad", "ewma", "online")
+
+# extract() field and value -> label, per local-time segmentation
+SEGMENT_FIELDS = {
+    "day_of_week": ("isodow", lambda isodow: calendar.day_name[isodow - 1]),
+    "hour_of_day": ("hour", str),
+    "month": ("month", lambda month: calendar.month_name[month]),
+}
+
+SEGMENT_TYPES = tuple(SEGMENT_FIELDS) + ("activity_type", "sleep_quality")
+
+# Segment of days without any recorded activity
+REST_DAY = "rest"
+
+# Sleep score bands, each below its upper bound; the last is open-ended
+SLEEP_QUALITY_BANDS = (("poor", 60), ("fair", 80), ("good", None))
+
+# Lookback and band of periods (in days) searched per pattern type, and the
+# retention setting of the data each reads: cyclical bins raw rows, seasonal
+# reads the daily stats
+PATTERN_WINDOWS = {
+    "cyclical": {
+        "lookback_days": 90, "min_period_days": 3 / 24, "max_period_days": 45,
+        "retention": "RAW_DATA_RETENTION_DAYS"
+    },
+    "seasonal": {
+        "lookback_days": 3 * 365, "min_period_days": 20, "max_period_days": 400,
+        "retention": "AGGREGATED_DATA_RETENTION_DAYS"
+    },
+}
+
+# Familiar cycles, by their range of periods in days
+NAMED_CYCLES = (
+    ("circadian", 0.9, 1.1),
+    ("weekly", 6.3, 7.7),
+    ("monthly", 24, 36),
+    ("annual", 330, 400),
+)
+
+pattern_cache = ResultCache("patterns")
 
 
 class AnalyticsService:
@@ -26,38 +88,33 @@ class AnalyticsService:
         end_date: Optional[datetime] = None,
         method: str = "pearson"
     ) -> dict:
-        """Calculate correlation between two metrics"""
-        # Fetch metrics for X
-        query_x = select(Metric).where(
-            and_(
-                Metric.user_id == user.id,
-                Metric.metric_type == metric_x
-            )
-        )
-        if start_date:
-            query_x = query_x.where(Metric.timestamp >= start_date)
-        if end_date:
-            query_x = query_x.where(Metric.timestamp <= end_date)
-
-        result_x = await db.execute(query_x.order_by(Metric.timestamp))
-        metrics_x = result_x.scalars().all()
-
-        # Fetch metrics for Y
-        query_y = select(Metric).where(
-            and_(
-                Metric.user_id == user.id,
-                Metric.metric_type == metric_y
+        """
+        Calculate correlation between two metrics
+
+        Pearson over whole UTC days is answered from the daily stats store;
+        Spearman and ranges cutting through a day read raw samples.
+        """
+        if method == "pearson" and day_aligned(start_date, end_date):
+            correlation, sample_size = await DailyStatsService.pearson(
+                db, user.id, metric_x, metric_y, start_date, end_date
             )
-        )
-        if start_date:
-            query_y = query_y.where(Metric.timestamp >= start_date)
-        if end_date:
-            query_y = query_y.where(Metric.timestamp <= end_date)
+            if correlation is None:
+                correlation, p_value = 0.0, 1.0
+            else:
+                p_value = float(correlation_p_values(correlation, sample_size))
+            return {
+                "metric_x": metric_x,
+                "metric_y": metric_y,
+                "correlation": float(correlation),
+                "p_value": p_value,
+                "sample_size": sample_size,
+                "correlation_type": method
+            }
 
-        result_y = await db.execute(query_y.order_by(Metric.timestamp))
-        metrics_y = result_y.scalars().all()
+        series_x = await load_series(db, user.id, metric_x, start_date, end_date)
+        series_y = await load_series(db, user.id, metric_y, start_date, end_date)
 
-        if not metrics_x or not metrics_y:
+        if not len(series_x) or not len(series_y):
             return {
                 "metric_x": metric_x,
                 "metric_y": metric_y,
@@ -67,56 +124,91 @@ class AnalyticsService:
                 "correlation_type": method
             }
 
-        # Convert to dataframes and align timestamps
-        df_x = pd.DataFrame([
-            {"timestamp": m.timestamp, "value": m.value}
-            for m in metrics_x
-        ])
-        df_y = pd.DataFrame([
-            {"timestamp": m.timestamp, "value": m.value}
-            for m in metrics_y
-        ])
-
-        # Merge on nearest timestamps
-        df_x['timestamp'] = pd.to_datetime(df_x['timestamp'])
-        df_y['timestamp'] = pd.to_datetime(df_y['timestamp'])
-
-        # For simplicity, merge on date only
-        df_x['date'] = df_x['timestamp'].dt.date
-        df_y['date'] = df_y['timestamp'].dt.date
-
-        # Average values by date
-        df_x_daily = df_x.groupby('date')['value'].mean().reset_index()
-        df_y_daily = df_y.groupby('date')['value'].mean().reset_index()
-
-        # Merge
-        df_merged = pd.merge(df_x_daily, df_y_daily, on='date', suffixes=('_x', '_y'))
+        # Align the two metrics on UTC days they both have data for
+        correlation, p_value, sample_size = await compute_pool.run(
+            daily_correlation,
+            series_x.timestamps, series_x.values,
+            series_y.timestamps, series_y.values,
+            method
+        )
 
-        if len(df_merged) < 2:
+        if correlation is None:
             return {
                 "metric_x": metric_x,
                 "metric_y": metric_y,
                 "correlation": 0.0,
                 "p_value": 1.0,
-                "sample_size": len(df_merged),
+                "sample_size": sample_size,
                 "correlation_type": method
             }
 
-        # Calculate correlation
-        if method == "pearson":
-            correlation, p_value = stats.pearsonr(df_merged['value_x'], df_merged['value_y'])
-        else:  # spearman
-            correlation, p_value = stats.spearmanr(df_merged['value_x'], df_merged['value_y'])
-
         return {
             "metric_x": metric_x,
             "metric_y": metric_y,
-            "correlation": float(correlation),
-            "p_value": float(p_value),
-            "sample_size": len(df_merged),
+            "correlation": correlation,
+            "p_value": p_value,
+            "sample_size": sample_size,
             "correlation_type": method
         }
 
+    @staticmethod
+    async def calculate_lagged_correlation(
+        db: AsyncSession,
+        user: User,
+        metric_x: str,
+        metric_y: str,
+        max_lag_days: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        method: str = "pearson"
+    ) -> dict:
+        """
+        Find the day offset at which two metrics correlate most strongly
+
+        Daily means are laid on a continuous day grid and the full
+        cross-correlation over -max_lag_days..max_lag_days is computed in one
+        FFT pass. A positive lag_days means metric_y follows metric_x by that
+        many days. The p-value is that of the chosen lag alone, not corrected
+        for searching across lags.
+        """
+        if method != "pearson":
+            raise ValueError("Lagged correlation supports the pearson method only")
+
+        daily = (await load_daily_matrix(
+            db, user.id, start_date, end_date, metric_types=[metric_x, metric_y]
+        )).dense()
+
+        result = {
+            "metric_x": metric_x,
+            "metric_y": metric_y,
+            "correlation": 0.0,
+            "p_value": 1.0,
+            "sample_size": 0,
+            "correlation_type": method,
+            "lag_days": 0
+        }
+        if len(daily.days) < 2:
+            return result
+
+        lags, r, n = await compute_pool.run(
+            lagged_pearson, daily.column(metric_x), daily.column(metric_y), max_lag_days
+        )
+        if np.isnan(r).all():
+            return result
+
+        # Strongest relationship in either direction; ties go to the shortest lag
+        strength = np.where(np.isnan(r), -1.0, np.abs(r))
+        candidates = np.flatnonzero(strength == strength.max())
+        best = candidates[np.argmin(np.abs(lags[candidates]))]
+
+        result.update({
+            "correlation": float(r[best]),
+            "p_value": float(correlation_p_values(r[best], n[best])),
+            "sample_size": int(n[best]),
+            "lag_days": int(lags[best])
+        })
+        return result
+
     @staticmethod
     async def find_correlations(
         db: AsyncSession,
@@ -124,38 +216,52 @@ class AnalyticsService:
         metric: Optional[str] = None,
         min_correlation: float = 0.3,
         start_date: Optional[datetime] = None,
-        end_date: Optional[datetime] = None
+        end_date: Optional[datetime] = None,
+        method: str = "pearson"
     ) -> List[dict]:
-        """Find significant correlations"""
-        from sqlalchemy.sql import distinct
+        """
+        Find significant correlations
 
-        # Get all metric types
-        metric_types_query = select(distinct(Metric.metric_type)).where(
-            Metric.user_id == user.id
-        )
-        result = await db.execute(metric_types_query)
-        all_metrics = list(result.scalars().all())
+        Loads every metric's daily means once and computes all pairs in one
+        vectorized pass; each pair uses the days both metrics have, exactly
+        as calculate_correlation aligns them.
+        """
+        daily = await load_daily_matrix(db, user.id, start_date, end_date)
+        names = daily.metric_types
 
-        correlations = []
+        r, n, p = await compute_pool.run(correlation_matrix, daily.values, method)
 
         if metric:
             # Find correlations with specific metric
-            for other_metric in all_metrics:
-                if other_metric != metric:
-                    corr_result = await AnalyticsService.calculate_correlation(
-                        db, user, metric, other_metric, start_date, end_date
-                    )
-                    if abs(corr_result['correlation']) >= min_correlation:
-                        correlations.append(corr_result)
+            pairs = [(metric, other) for other in names if other != metric]
         else:
             # Find all pairwise correlations
-            for i, metric_x in enumerate(all_metrics):
-                for metric_y in all_metrics[i+1:]:
-                    corr_result = await AnalyticsService.calculate_correlation(
-                        db, user, metric_x, metric_y, start_date, end_date
-                    )
-                    if abs(corr_result['correlation']) >= min_correlation:
-                        correlations.append(corr_result)
+            pairs = [
+                (metric_x, metric_y)
+                for i, metric_x in enumerate(names)
+                for metric_y in names[i+1:]
+            ]
+
+        index = {name: i for i, name in enumerate(names)}
+        correlations = []
+
+        for metric_x, metric_y in pairs:
+            i, j = index.get(metric_x), index[metric_y]
+            sample_size = int(n[i, j]) if i is not None else 0
+            if sample_size < 2:
+                correlation, p_value = 0.0, 1.0
+            else:
+                correlation, p_value = float(r[i, j]), float(p[i, j])
+
+            if abs(correlation) >= min_correlation:
+                correlations.append({
+                    "metric_x": metric_x,
+                    "metric_y": metric_y,
+                    "correlation": correlation,
+                    "p_value": p_value,
+                    "sample_size": sample_size,
+                    "correlation_type": method
+                })
 
         # Sort by absolute correlation
         correlations.sort(key=lambda x: abs(x['correlation']), reverse=True)
@@ -168,25 +274,35 @@ class AnalyticsService:
         user: User,
         metric_type: str,
         sensitivity: float = 2.0,
-        lookback_days: int = 30
+        lookback_days: int = 30,
+        method: str = "zscore",
+        window: int = 60
     ) -> dict:
-        """Detect anomalies using z-score"""
-        end_date = datetime.utcnow()
-        start_date = end_date - pd.Timedelta(days=lookback_days)
+        """
+        Detect anomalies using z-score
 
-        query = select(Metric).where(
-            and_(
-                Metric.user_id == user.id,
-                Metric.metric_type == metric_type,
-                Metric.timestamp >= start_date,
-                Metric.timestamp <= end_date
-            )
-        ).order_by(Metric.timestamp)
+        - **method**: "zscore" scores every value against the mean/std of the
+          whole lookback window; "rolling_mad" against the median/MAD of the
+          ``window`` values before it; "ewma" against an exponentially
+          weighted mean/std with span ``window``; "online" only scores the
+          latest sample, against the streaming baseline kept at ingest
+        - **window**: Trailing window (or EWMA span) in samples, rolling modes only
+
+        In rolling modes each anomaly also carries the baseline it was scored
+        against, and baseline_mean/baseline_std describe the latest baseline.
+        """
+        if method not in ANOMALY_METHODS:
+            raise ValueError(f"Unknown anomaly method: {method}")
+
+        if method == "online":
+            return await _online_anomalies(db, user, metric_type, sensitivity)
+
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=lookback_days)
 
-        result = await db.execute(query)
-        metrics = result.scalars().all()
+        series = await load_series(db, user.id, metric_type, start_date, end_date)
 
-        if not metrics:
+        if not len(series):
             return {
                 "metric_type": metric_type,
                 "anomalies": [],
@@ -194,34 +310,100 @@ class AnalyticsService:
                 "baseline_std": 0.0
             }
 
-        # Convert to pandas
-        df = pd.DataFrame([
-            {"timestamp": m.timestamp, "value": m.value}
-            for m in metrics
-        ])
-
-        # Calculate statistics
-        mean_val = df['value'].mean()
-        std_val = df['value'].std()
+        if method == "zscore":
+            # Find anomalies (values beyond sensitivity * std from mean)
+            anomaly_idx, z_scores, mean_val, std_val = await compute_pool.run(
+                zscore_outliers, series.values, sensitivity
+            )
+            baselines = None
+        else:
+            anomaly_idx, z_scores, baselines, mean_val, std_val = await compute_pool.run(
+                rolling_outliers, series.values, sensitivity, method, window
+            )
 
-        # Find anomalies (values beyond sensitivity * std from mean)
-        df['z_score'] = (df['value'] - mean_val) / std_val
-        anomalies = df[abs(df['z_score']) > sensitivity]
+        # Serialize straight from the arrays of flagged points
+        anomalies = [
+            {"timestamp": timestamp, "value": value, "z_score": z_score}
+            for timestamp, value, z_score in zip(
+                series.isoformat(anomaly_idx),
+                series.values[anomaly_idx].tolist(),
+                z_scores.tolist()
+            )
+        ]
+        if baselines is not None:
+            for anomaly, baseline in zip(anomalies, baselines.tolist()):
+                anomaly["baseline"] = baseline
 
         return {
             "metric_type": metric_type,
-            "anomalies": [
-                {
-                    "timestamp": row['timestamp'].isoformat(),
-                    "value": float(row['value']),
-                    "z_score": float(row['z_score'])
-                }
-                for _, row in anomalies.iterrows()
-            ],
-            "baseline_mean": float(mean_val),
-            "baseline_std": float(std_val)
+            "method": method,
+            "anomalies": anomalies,
+            "baseline_mean": _finite_or_none(mean_val),
+            "baseline_std": _finite_or_none(std_val)
         }
 
+    @staticmethod
+    async def get_patterns(
+        db: AsyncSession,
+        user: User,
+        metric_type: str,
+        pattern_type: str = "cyclical"
+    ) -> dict:
+        """
+        Periodic patterns of a metric, from cache or computed in the background
+
+        Results are cached per user, metric and pattern type until new data
+        for the metric is ingested. A miss enqueues one detect_patterns task
+        and reports status "pending" (with the previous result, if any);
+        without Redis the analysis runs in the request instead.
+        """
+        if pattern_type not in PATTERN_WINDOWS:
+            raise ValueError(f"Unknown pattern_type: {pattern_type}")
+
+        result = {"metric_type": metric_type, "pattern_type": pattern_type}
+
+        version = await DataVersions.get(user.id, metric_type)
+        if version is None:
+            patterns = await _compute_patterns(db, user, metric_type, pattern_type)
+            return {**result, "status": "ready", "computed_at": None, **patterns}
+
+        cached = await pattern_cache.get(user.id, metric_type, pattern_type)
+        if cached is not None and cached["version"] == version:
+            return {**result, "status": "ready", "computed_at": cached["computed_at"], **cached["result"]}
+
+        if await pattern_cache.claim(
+            user.id, metric_type, pattern_type, version, settings.PATTERN_TASK_CLAIM_SECONDS
+        ):
+            # Imported here: the task module imports this service
+            from ingestion.tasks import detect_patterns
+
+            try:
+                detect_patterns.delay(user.id, metric_type, pattern_type, version)
+            except Exception as e:
+                logger.warning(f"Could not enqueue pattern detection for user {user.id}: {e}")
+                await pattern_cache.release(user.id, metric_type, pattern_type, version)
+
+        stale = cached["result"] if cached is not None else {"sample_count": 0, "patterns": []}
+        return {
+            **result,
+            "status": "pending",
+            "computed_at": cached["computed_at"] if cached is not None else None,
+            **stale
+        }
+
+    @staticmethod
+    async def refresh_patterns(
+        db: AsyncSession,
+        user: User,
+        metric_type: str,
+        pattern_type: str,
+        version: str
+    ) -> dict:
+        """Compute patterns and cache them as of ``version`` (the background half of get_patterns)"""
+        patterns = await _compute_patterns(db, user, metric_type, pattern_type)
+        await pattern_cache.set(user.id, metric_type, pattern_type, version, patterns)
+        return patterns
+
     @staticmethod
     async def segment_analysis(
         db: AsyncSession,
@@ -231,53 +413,331 @@ class AnalyticsService:
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None
     ) -> List[dict]:
-        """Analyze metrics by segments (e.g., day of week)"""
-        query = select(Metric).where(
-            and_(
-                Metric.user_id == user.id,
-                Metric.metric_type == metric_type
+        """
+        Analyze metrics by segments, in the user's time zone
+
+        - **segment_by**: "day_of_week", "hour_of_day" or "month" of each
+          sample; "activity_type" of the activities on its local day
+          ("rest" without any, every type on days with several); or
+          "sleep_quality", the band of that day's sleep score (days without
+          a score are left out)
+
+        Grouping and the day joins run in Postgres as one query. Ranges of
+        SEGMENT_ROLLUP_MIN_DAYS or more (or open-ended ones) read the hourly
+        rollup when the zone's UTC offset is a whole number of hours: count,
+        mean and std stay exact, while the median becomes the median of
+        hourly means. Raises ValueError for an unknown segment_by.
+        """
+        if segment_by not in SEGMENT_TYPES:
+            raise ValueError(f"Unknown segment_by: {segment_by}")
+
+        zone = _zone(user.timezone)
+        tz = literal_column(f"'{zone.key}'")
+        from_rollup = await _segment_from_rollup(db, zone, start_date, end_date)
+        samples = _segment_samples(user.id, metric_type, tz, start_date, end_date, from_rollup)
+        day = cast(samples.c.local, Date)
+
+        if segment_by in SEGMENT_FIELDS:
+            segment = extract(SEGMENT_FIELDS[segment_by][0], samples.c.local)
+            source = samples
+        elif segment_by == "activity_type":
+            days = _activity_days(user.id, tz, start_date, end_date)
+            segment = func.coalesce(days.c.activity_type, REST_DAY)
+            source = samples.outerjoin(days, days.c.day == day)
+        else:
+            days = _sleep_score_days(user.id, tz, start_date, end_date)
+            segment = case(
+                *[(days.c.score < bound, band) for band, bound in SLEEP_QUALITY_BANDS[:-1]],
+                else_=SLEEP_QUALITY_BANDS[-1][0]
             )
+            source = samples.join(days, days.c.day == day)
+
+        segmented = select(segment.label("segment"), samples).select_from(source).subquery()
+        if from_rollup:
+            count = func.sum(segmented.c.value_count)
+            total = func.sum(segmented.c.value_sum)
+            aggregates = [
+                count.label("count"),
+                (total / count).label("mean"),
+                func.sqrt(
+                    func.greatest(func.sum(segmented.c.value_sum_sq) - total * total / count, 0)
+                    / func.nullif(count - 1, 0)
+                ).label("std")
+            ]
+        else:
+            aggregates = [
+                func.count(segmented.c.value).label("count"),
+                func.avg(segmented.c.value).label("mean"),
+                func.stddev_samp(segmented.c.value).label("std")
+            ]
+
+        result = await db.execute(
+            select(
+                segmented.c.segment,
+                func.percentile_cont(0.5).within_group(segmented.c.value).label("median"),
+                *aggregates
+            ).group_by(segmented.c.segment).order_by(segmented.c.segment)
         )
 
-        if start_date:
-            query = query.where(Metric.timestamp >= start_date)
-        if end_date:
-            query = query.where(Metric.timestamp <= end_date)
-
-        result = await db.execute(query)
-        metrics = result.scalars().all()
-
-        if not metrics:
-            return []
-
-        # Convert to dataframe
-        df = pd.DataFrame([
-            {"timestamp": m.timestamp, "value": m.value}
-            for m in metrics
-        ])
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-
-        # Add segment column
-        if segment_by == "day_of_week":
-            df['segment'] = df['timestamp'].dt.day_name()
-        elif segment_by == "hour_of_day":
-            df['segment'] = df['timestamp'].dt.hour
-        elif segment_by == "month":
-            df['segment'] = df['timestamp'].dt.month_name()
-        else:
-            df['segment'] = "all"
+        label = SEGMENT_FIELDS[segment_by][1] if segment_by in SEGMENT_FIELDS else None
+        results = [
+            {
+                "segment": label(int(row.segment)) if label else row.segment,
+                "count": int(row.count),
+                "mean": float(row.mean),
+                "median": float(row.median),
+                # The sample standard deviation is undefined for a single sample
+                "std": float(row.std) if row.std is not None else 0.0
+            }
+            for row in result.all()
+        ]
+        # Segments are listed in label order, as the segment column sorts;
+        # sleep bands from worst to best
+        if segment_by == "sleep_quality":
+            bands = [band for band, _ in SLEEP_QUALITY_BANDS]
+            results.sort(key=lambda segment: bands.index(segment["segment"]))
+        elif segment_by != "hour_of_day":
+            results.sort(key=lambda segment: segment["segment"])
 
-        # Group by segment
-        grouped = df.groupby('segment')['value']
+        return results
 
-        results = []
-        for segment, values in grouped:
-            results.append({
-                "segment": str(segment),
-                "count": int(len(values)),
-                "mean": float(values.mean()),
-                "median": float(values.median()),
-                "std": float(values.std())
-            })
 
-        return results
+async def _compute_patterns(
+    db: AsyncSession,
+    user: User,
+    metric_type: str,
+    pattern_type: str
+) -> dict:
+    """
+    Run the periodogram for one pattern type over its lookback window
+
+    The window is whole UTC days ending yesterday, so seasonal reads the daily
+    stats, which outlive raw rows. A lookback longer than the retention of
+    the data it reads is cut to what is retained.
+    """
+    window = PATTERN_WINDOWS[pattern_type]
+    lookback_days = window["lookback_days"]
+    retained_days = getattr(settings, window["retention"])
+    if lookback_days > retained_days:
+        logger.warning(
+            f"{pattern_type} pattern lookback of {lookback_days} days exceeds "
+            f"{window['retention']}={retained_days}; using {retained_days}"
+        )
+        lookback_days = retained_days
+
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = today - timedelta(days=lookback_days)
+    end_date = today - timedelta(microseconds=1)
+
+    if pattern_type == "cyclical":
+        # Hourly means keep circadian rhythm while bounding the series length
+        series = await load_series(db, user.id, metric_type, start_date, end_date)
+        if len(series):
+            t, values = binned_means(series.epoch_seconds(), series.values, 3600.0)
+            t = t / 86400.0
+        else:
+            t = values = np.empty(0)
+    else:
+        daily = await load_daily_matrix(db, user.id, start_date, end_date, metric_types=[metric_type])
+        values = daily.column(metric_type)
+        present = np.isfinite(values)
+        t, values = daily.days.view(np.int64)[present].astype(np.float64), values[present]
+
+    periods, power, amplitude, false_alarm = await compute_pool.run(
+        periodic_components,
+        t,
+        values,
+        window["min_period_days"],
+        window["max_period_days"],
+        max_false_alarm=settings.PATTERN_MAX_FALSE_ALARM
+    )
+
+    return {
+        "sample_count": len(values),
+        "patterns": [
+            {
+                "period_days": period,
+                "label": _cycle_label(period),
+                "power": explained,
+                "amplitude": semi_amplitude,
+                "false_alarm_probability": probability
+            }
+            for period, explained, semi_amplitude, probability in zip(
+                periods.tolist(), power.tolist(), amplitude.tolist(), false_alarm.tolist()
+            )
+        ]
+    }
+
+
+def _cycle_label(period_days: float) -> Optional[str]:
+    """Name of the familiar cycle a period falls in, if any"""
+    for name, low, high in NAMED_CYCLES:
+        if low <= period_days <= high:
+            return name
+    return None
+
+
+async def _online_anomalies(
+    db: AsyncSession,
+    user: User,
+    metric_type: str,
+    sensitivity: float
+) -> dict:
+    """Score the latest sample from its streaming baseline, without reading history"""
+    state = await BaselineService.get(db, user.id, metric_type)
+    result = {
+        "metric_type": metric_type,
+        "method": "online",
+        "anomalies": [],
+        "baseline_mean": None,
+        "baseline_std": None
+    }
+    if state is None:
+        return result
+
+    summary = baseline_summary(state)
+    result.update({
+        "baseline_mean": summary["ewma_mean"],
+        "baseline_std": summary["ewma_std"],
+        "sample_count": summary["sample_count"]
+    })
+
+    z_score = state["last_z"]
+    if (
+        z_score is not None
+        and state["count"] >= settings.BASELINE_MIN_SAMPLES
+        and abs(z_score) > sensitivity
+    ):
+        result["anomalies"].append({
+            "timestamp": summary["last_timestamp"],
+            "value": summary["last_value"],
+            "z_score": z_score
+        })
+    return result
+
+
+def _finite_or_none(value: float) -> Optional[float]:
+    """NaN/inf (too little data for a baseline) as None, which JSON can carry"""
+    return float(value) if np.isfinite(value) else None
+
+
+def _zone(name: Optional[str]) -> ZoneInfo:
+    """The user's time zone; its key is safe to inline into SQL once loaded"""
+    try:
+        return ZoneInfo(name or "UTC")
+    except (KeyError, ValueError):
+        raise ValueError(f"Unknown time zone: {name}")
+
+
+def _segment_samples(
+    user_id: int,
+    metric_type: str,
+    tz,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    from_rollup: bool
+):
+    """
+    Samples to segment, with their local timestamp
+
+    Raw rows carry ``value``; hourly buckets carry their count/sum/sum of
+    squares plus the bucket mean as ``value``.
+    """
+    if from_rollup:
+        rollup = ROLLUP_TABLES[Tier.HOURLY]
+        query = select(
+            func.timezone(tz, rollup.c.bucket).label("local"),
+            rollup.c.value_count,
+            rollup.c.value_sum,
+            rollup.c.value_sum_sq,
+            rollup.c.value_avg.label("value")
+        ).where(
+            and_(
+                rollup.c.user_id == user_id,
+                rollup.c.metric_type == metric_type
+            )
+        )
+        if start_date:
+            query = query.where(rollup.c.bucket >= start_date)
+        if end_date:
+            query = query.where(rollup.c.bucket <= end_date)
+        return query.subquery()
+
+    query = select(
+        func.timezone(tz, Metric.timestamp).label("local"),
+        Metric.value.label("value")
+    ).where(
+        and_(
+            Metric.user_id == user_id,
+            Metric.metric_type == metric_type
+        )
+    )
+    if start_date:
+        query = query.where(Metric.timestamp >= start_date)
+    if end_date:
+        query = query.where(Metric.timestamp <= end_date)
+    return query.subquery()
+
+
+def _activity_days(
+    user_id: int,
+    tz,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+):
+    """Distinct (local day, activity type) pairs, read through idx_user_activity_time"""
+    day = cast(func.timezone(tz, Activity.start_time), Date)
+    query = select(day.label("day"), Activity.activity_type).where(Activity.user_id == user_id)
+    # A day of margin: the local day of an activity can fall outside the UTC range
+    if start_date:
+        query = query.where(Activity.start_time >= start_date - timedelta(days=1))
+    if end_date:
+        query = query.where(Activity.start_time <= end_date + timedelta(days=1))
+    return query.distinct().subquery()
+
+
+def _sleep_score_days(
+    user_id: int,
+    tz,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+):
+    """Mean sleep score per local day it was recorded on (the wake-up day)"""
+    day = cast(func.timezone(tz, Metric.timestamp), Date)
+    query = select(day.label("day"), func.avg(Metric.value).label("score")).where(
+        and_(
+            Metric.user_id == user_id,
+            Metric.metric_type == MetricType.SLEEP_SCORE
+        )
+    )
+    if start_date:
+        query = query.where(Metric.timestamp >= start_date - timedelta(days=1))
+    if end_date:
+        query = query.where(Metric.timestamp <= end_date + timedelta(days=1))
+    return query.group_by(day).subquery()
+
+
+async def _segment_from_rollup(
+    db: AsyncSession,
+    zone: ZoneInfo,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+) -> bool:
+    """Whether a segmentation can read hourly buckets instead of raw samples"""
+    if start_date is not None:
+        span_end = end_date or datetime.utcnow()
+        if span_end - start_date < timedelta(days=settings.SEGMENT_ROLLUP_MIN_DAYS):
+            return False
+
+    if choose_tier(start_date, end_date, "hour", available=await rollups_available(db)) == Tier.RAW:
+        return False
+
+    # An hourly bucket maps to a single local hour only if every offset in
+    # the range is whole hours; sample mid-winter and mid-summer of each year
+    first_year = start_date.year if start_date else 1970
+    last_year = (end_date or datetime.utcnow()).year
+    return all(
+        datetime(year, month, 1, tzinfo=zone).utcoffset() % timedelta(hours=1) == timedelta(0)
+        for year in range(first_year, last_year + 1)
+        for month in (1, 7)
+    )
@@ -0,0 +1,226 @@
+"""
+Streaming per-metric baselines for O(1) anomaly scoring
+
+Each (user, metric type) keeps Welford moments over all samples and an
+exponentially weighted mean/variance (span BASELINE_EWMA_SPAN samples) that
+follows recent behaviour. Ingest folds newly inserted samples in, so scoring
+a value never rescans history. Postgres (metric_baselines) is the source of
+truth, updated in the ingest transaction under a row lock; Redis holds a copy
+for reads.
+
+The span counts samples, not time, so how far back the recent baseline
+reaches depends on how often a metric is sampled: 30 samples is about half
+an hour of minute-level heart rate but a month of daily steps.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, Optional, Tuple
+from datetime import datetime, timezone
+import json
+import logging
+import math
+import numpy as np
+
+from api.cache import get_redis
+from api.config import settings
+from api.models.metric import MetricBaseline
+from services.kernels import welford_merge, ewma_update
+
+logger = logging.getLogger(__name__)
+
+# Sets each field only if the incoming state has seen at least as many
+# samples as the cached one, so a slow writer can't regress the cache.
+_UPDATE_SCRIPT = """
+local key = KEYS[1]
+local ttl = tonumber(ARGV[1])
+for i = 2, #ARGV, 2 do
+  local current = redis.call('HGET', key, ARGV[i])
+  if not current or cjson.decode(current)['count'] <= cjson.decode(ARGV[i + 1])['count'] then
+    redis.call('HSET', key, ARGV[i], ARGV[i + 1])
+  end
+end
+if ttl > 0 then
+  redis.call('EXPIRE', key, ttl)
+end
+return 1
+"""
+
+# New samples per metric type: (epoch seconds, values), both float64
+Samples = Dict[str, Tuple[np.ndarray, np.ndarray]]
+
+
+def _state(row: MetricBaseline) -> dict:
+    """Serializable snapshot of a baseline row"""
+    return {
+        "count": int(row.sample_count),
+        "mean": row.mean,
+        "m2": row.m2,
+        "ewma_mean": row.ewma_mean,
+        "ewma_var": row.ewma_var,
+        "last_epoch": row.last_timestamp.timestamp() if row.last_timestamp else None,
+        "last_value": row.last_value,
+        "last_z": row.last_z,
+    }
+
+
+def baseline_summary(state: dict) -> dict:
+    """Public view of a baseline state"""
+    count = state["count"]
+    return {
+        "sample_count": count,
+        "mean": state["mean"] if count else None,
+        "std": math.sqrt(state["m2"] / (count - 1)) if count > 1 else None,
+        "ewma_mean": state["ewma_mean"],
+        "ewma_std": math.sqrt(state["ewma_var"]) if state["ewma_var"] is not None else None,
+        "last_timestamp": (
+            datetime.fromtimestamp(state["last_epoch"], tz=timezone.utc).isoformat()
+            if state["last_epoch"] is not None else None
+        ),
+        "last_value": state["last_value"],
+        "last_z_score": state["last_z"],
+    }
+
+
+class BaselineCache:
+    """Redis hash of baseline states, keyed per user with one field per metric type"""
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"metrics:baseline:{user_id}"
+
+    @staticmethod
+    async def get(user_id: int, metric_type: str) -> Optional[dict]:
+        try:
+            payload = await get_redis().hget(BaselineCache._key(user_id), metric_type)
+        except Exception as e:
+            logger.warning(f"Baseline cache read failed for user {user_id}: {e}")
+            return None
+        return json.loads(payload) if payload else None
+
+    @staticmethod
+    async def update(user_id: int, states: Dict[str, dict]):
+        """Store states, keeping whichever has seen more samples"""
+        if not states:
+            return
+
+        args = [settings.BASELINE_CACHE_TTL_SECONDS]
+        for metric_type, state in states.items():
+            args.extend([metric_type, json.dumps(state)])
+
+        try:
+            await get_redis().eval(_UPDATE_SCRIPT, 1, BaselineCache._key(user_id), *args)
+        except Exception as e:
+            logger.warning(f"Baseline cache update failed for user {user_id}: {e}")
+            try:
+                await get_redis().delete(BaselineCache._key(user_id))
+            except Exception:
+                pass
+
+
+class BaselineService:
+    """Service for streaming anomaly baselines"""
+
+    @staticmethod
+    async def update(
+        db: AsyncSession,
+        user_id: int,
+        samples: Samples
+    ) -> Dict[str, dict]:
+        """
+        Fold newly inserted samples into their baselines, in the caller's transaction
+
+        Welford moments take every sample. The EWMA only takes samples newer
+        than the last one it has seen, in time order; a backfill of older
+        data updates the lifetime moments but not the recent baseline.
+
+        Returns the new states, for BaselineCache.update once committed.
+        """
+        samples = {metric_type: pair for metric_type, pair in samples.items() if len(pair[1])}
+        if not samples:
+            return {}
+
+        # Make sure every row exists, then lock them: concurrent ingests for
+        # the same metric serialize here instead of losing updates
+        await db.execute(
+            pg_insert(MetricBaseline).values([
+                {"user_id": user_id, "metric_type": metric_type, "sample_count": 0, "mean": 0.0, "m2": 0.0}
+                for metric_type in samples
+            ]).on_conflict_do_nothing(index_elements=["user_id", "metric_type"])
+        )
+        result = await db.execute(
+            select(MetricBaseline).where(
+                and_(
+                    MetricBaseline.user_id == user_id,
+                    MetricBaseline.metric_type.in_(list(samples))
+                )
+            ).with_for_update()
+        )
+        rows = {row.metric_type: row for row in result.scalars()}
+
+        alpha = 2.0 / (settings.BASELINE_EWMA_SPAN + 1)
+        now = datetime.now(timezone.utc)
+        states = {}
+
+        for metric_type, (epochs, values) in samples.items():
+            row = rows[metric_type]
+            count, mean, m2 = welford_merge(row.sample_count, row.mean, row.m2, values)
+            changes = {"sample_count": count, "mean": mean, "m2": m2, "updated_at": now}
+
+            last_epoch = row.last_timestamp.timestamp() if row.last_timestamp else -math.inf
+            newer = epochs > last_epoch
+            if newer.any():
+                order = np.argsort(epochs[newer], kind="stable")
+                ordered = values[newer][order]
+                ewma_mean, ewma_var, z_scores = ewma_update(row.ewma_mean, row.ewma_var, ordered, alpha)
+                last_z = float(z_scores[-1])
+                changes.update({
+                    "ewma_mean": ewma_mean,
+                    "ewma_var": ewma_var,
+                    "last_timestamp": datetime.fromtimestamp(
+                        float(epochs[newer][order][-1]), tz=timezone.utc
+                    ),
+                    "last_value": float(ordered[-1]),
+                    "last_z": last_z if math.isfinite(last_z) else None,
+                })
+
+            await db.execute(
+                update(MetricBaseline).where(
+                    and_(
+                        MetricBaseline.user_id == user_id,
+                        MetricBaseline.metric_type == metric_type
+                    )
+                ).values(**changes)
+            )
+            for column, value in changes.items():
+                setattr(row, column, value)
+            states[metric_type] = _state(row)
+
+        return states
+
+    @staticmethod
+    async def get(
+        db: AsyncSession,
+        user_id: int,
+        metric_type: str
+    ) -> Optional[dict]:
+        """Current baseline state from Redis, falling back to Postgres"""
+        state = await BaselineCache.get(user_id, metric_type)
+        if state is not None:
+            return state
+
+        result = await db.execute(
+            select(MetricBaseline).where(
+                and_(
+                    MetricBaseline.user_id == user_id,
+                    MetricBaseline.metric_type == metric_type
+                )
+            )
+        )
+        row = result.scalar_one_or_none()
+        if row is None:
+            return None
+
+        state = _state(row)
+        await BaselineCache.update(user_id, {metric_type: state})
+        return state
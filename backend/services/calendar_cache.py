@@ -0,0 +1,94 @@
+"""
+Redis cache of calendar heatmaps for past years
+
+A past year's daily means only change when a backfill writes into it, so
+they are cached without expiry and invalidated per (metric type, year) by
+the writes that touch that year. Each entry carries a generation that
+invalidation increments; a result computed before an invalidation is
+refused when stored, so a read racing a backfill can't pin stale days.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import date, datetime, timezone
+import json
+import logging
+
+from api.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Store the days only if no invalidation happened since the read
+_SET_SCRIPT = """
+local generation = redis.call('HGET', KEYS[1], 'generation') or '0'
+if generation == ARGV[1] then
+  redis.call('HSET', KEYS[1], 'days', ARGV[2])
+  return 1
+end
+return 0
+"""
+
+Days = List[Optional[float]]
+
+
+def cacheable_year(year: int) -> bool:
+    """Only finished years are cached; the current one changes with every sync"""
+    return year < datetime.now(timezone.utc).year
+
+
+class CalendarCache:
+    """One Redis hash per user, metric type and year: generation and dense days"""
+
+    @staticmethod
+    def _key(user_id: int, metric_type: str, year: int) -> str:
+        return f"metrics:calendar:{user_id}:{metric_type}:{year}"
+
+    @staticmethod
+    async def get(user_id: int, metric_type: str, year: int) -> Tuple[Optional[str], Optional[Days]]:
+        """
+        Cached days and the generation they belong to
+
+        Returns (generation, None) on a miss, to be passed to set(), and
+        (None, None) if Redis is unavailable.
+        """
+        try:
+            generation, days = await get_redis().hmget(
+                CalendarCache._key(user_id, metric_type, year), "generation", "days"
+            )
+        except Exception as e:
+            logger.warning(f"Calendar cache read failed for user {user_id}: {e}")
+            return None, None
+        return generation or "0", json.loads(days) if days else None
+
+    @staticmethod
+    async def set(user_id: int, metric_type: str, year: int, generation: str, days: Days):
+        """Store days read at ``generation``"""
+        try:
+            await get_redis().eval(
+                _SET_SCRIPT,
+                1,
+                CalendarCache._key(user_id, metric_type, year),
+                generation,
+                json.dumps(days)
+            )
+        except Exception as e:
+            logger.warning(f"Calendar cache update failed for user {user_id}: {e}")
+
+    @staticmethod
+    async def invalidate(user_id: int, touched: Dict[str, Set[date]]):
+        """Drop the past years a write touched; call after commit"""
+        years = {
+            (metric_type, day.year)
+            for metric_type, days in touched.items()
+            for day in days
+            if cacheable_year(day.year)
+        }
+        if not years:
+            return
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                for metric_type, year in years:
+                    key = CalendarCache._key(user_id, metric_type, year)
+                    pipe.hincrby(key, "generation", 1)
+                    pipe.hdel(key, "days")
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Calendar cache invalidation failed for user {user_id}: {e}")
@@ -0,0 +1,321 @@
+"""
+Process pool for CPU-bound analytics
+
+NumPy/SciPy kernels release the GIL only in places, and a large correlation
+or regression run inside an ``async def`` handler stalls every other request
+on the worker. ComputePool dispatches such calls to worker processes:
+
+- the number of in-flight tasks is bounded; callers beyond the bound get
+  ComputePoolBusy instead of an ever-growing queue
+- every task has a timeout; a task that times out or whose caller goes away
+  is dropped from the queue, or if already running, killed together with its
+  worker process, which is replaced at once
+- NumPy array arguments are copied once into shared memory instead of being
+  pickled through the worker's pipe; workers map that block without a
+  further copy
+
+The pool is started from the API lifespan. Where it isn't (Celery workers,
+scripts), and for small inputs, calls simply run inline.
+"""
+from multiprocessing import get_context, shared_memory
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+import asyncio
+import logging
+import pickle
+import statistics
+import time
+
+import numpy as np
+
+from api.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ComputePoolBusy(Exception):
+    """Raised when the pool already holds its maximum number of tasks"""
+
+
+class ComputeTimeout(Exception):
+    """Raised when a task does not finish within its timeout"""
+
+
+@dataclass(frozen=True)
+class _SharedArray:
+    """Picklable handle to an array placed in a shared memory block"""
+    name: str
+    shape: tuple
+    dtype: str
+
+
+def _invoke(fn: Callable, args: tuple, kwargs: dict, submitted_at: float) -> tuple:
+    """
+    Worker-side entry point: map shared arrays, run the kernel, time it
+
+    The result is pickled here, while the shared blocks are still mapped, so
+    a result that is a view of an input is copied out before they close.
+    """
+    started_at = time.time()
+    blocks = []
+
+    def attach(value):
+        if not isinstance(value, _SharedArray):
+            return value
+        # Spawned workers share the parent's resource tracker, which unlinks
+        # the block once, when the parent releases it
+        block = shared_memory.SharedMemory(name=value.name)
+        blocks.append(block)
+        return np.ndarray(value.shape, dtype=value.dtype, buffer=block.buf)
+
+    try:
+        args = tuple(attach(arg) for arg in args)
+        kwargs = {key: attach(value) for key, value in kwargs.items()}
+        payload = pickle.dumps(fn(*args, **kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        args = kwargs = None
+        for block in blocks:
+            block.close()
+
+    finished_at = time.time()
+    return payload, started_at - submitted_at, finished_at - started_at
+
+
+class _Worker:
+    """A worker process and the parent's end of its pipe"""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.busy = False
+
+    def kill(self) -> None:
+        # The pipe is left open: the thread polling it sees EOF once the
+        # process is gone, and it is closed with this object
+        self.process.kill()
+
+
+def _worker_main(conn) -> None:
+    """Worker loop: run tasks from the pipe until it closes"""
+    while True:
+        try:
+            fn, args, kwargs, submitted_at = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            reply = (True, *_invoke(fn, args, kwargs, submitted_at))
+        except BaseException as e:
+            reply = (False, _picklable(e), None, None)
+        conn.send(reply)
+
+
+def _picklable(error: BaseException) -> BaseException:
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(repr(error))
+
+
+class ComputePool:
+    """Bounded pool of killable worker processes with timeouts and execution metrics"""
+
+    def __init__(self):
+        self._context = get_context("spawn")
+        self._workers: list = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._in_flight: set = set()
+        self._exec_seconds: deque = deque(maxlen=1000)
+        self._wait_seconds: deque = deque(maxlen=1000)
+        self._counts = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "rejected": 0,
+            "inline": 0,
+            "workers_replaced": 0,
+        }
+
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
+
+    def start(self, max_workers: Optional[int] = None) -> None:
+        """Start the worker processes (spawned, so no event loop state is forked)"""
+        workers = settings.COMPUTE_POOL_WORKERS if max_workers is None else max_workers
+        if self._idle is not None or workers <= 0:
+            return
+        self._idle = asyncio.Queue()
+        for _ in range(workers):
+            worker = _Worker(self._context)
+            self._workers.append(worker)
+            self._idle.put_nowait(worker)
+        logger.info(f"Compute pool started with {workers} workers")
+
+    async def shutdown(self) -> None:
+        """Stop the workers; idle ones exit, tasks still running are killed"""
+        workers, self._workers, self._idle = self._workers, [], None
+        for worker in workers:
+            if worker.busy:
+                worker.kill()
+            else:
+                worker.conn.close()
+        await asyncio.to_thread(lambda: [worker.process.join() for worker in workers])
+        if workers:
+            logger.info("Compute pool stopped")
+
+    async def run(
+        self,
+        fn: Callable,
+        *args,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` in a worker process and await its result
+
+        ``fn`` must be a module-level function. Calls run inline when the
+        pool isn't started or the array arguments total less than
+        COMPUTE_INLINE_MAX_BYTES, where dispatch would cost more than it saves.
+
+        Raises ComputePoolBusy when COMPUTE_POOL_MAX_PENDING tasks are already
+        queued or running, and ComputeTimeout after ``timeout`` seconds
+        (COMPUTE_TASK_TIMEOUT_SECONDS by default). A task that times out or
+        whose caller goes away is killed with its worker process, which is
+        replaced, so a runaway kernel never holds a worker or a slot.
+        """
+        if self._idle is None or _array_bytes(args, kwargs) < settings.COMPUTE_INLINE_MAX_BYTES:
+            self._counts["inline"] += 1
+            return fn(*args, **kwargs)
+
+        if len(self._in_flight) >= settings.COMPUTE_POOL_MAX_PENDING:
+            self._counts["rejected"] += 1
+            raise ComputePoolBusy("Analytics workers are busy, try again shortly")
+
+        blocks = []
+        token = object()
+        self._in_flight.add(token)
+        try:
+            shared_args = tuple(_share(arg, blocks) for arg in args)
+            shared_kwargs = {key: _share(value, blocks) for key, value in kwargs.items()}
+            self._counts["submitted"] += 1
+
+            timeout = settings.COMPUTE_TASK_TIMEOUT_SECONDS if timeout is None else timeout
+            try:
+                ok, payload, wait_seconds, exec_seconds = await asyncio.wait_for(
+                    self._dispatch(fn, shared_args, shared_kwargs), timeout
+                )
+            except asyncio.TimeoutError:
+                self._counts["timed_out"] += 1
+                raise ComputeTimeout(f"{_name(fn)} did not finish within {timeout:g}s")
+        finally:
+            self._in_flight.discard(token)
+            _release(blocks)
+
+        if not ok:
+            self._counts["failed"] += 1
+            logger.error(f"Compute task failed: {payload!r}")
+            raise payload
+
+        self._counts["completed"] += 1
+        self._wait_seconds.append(wait_seconds)
+        self._exec_seconds.append(exec_seconds)
+        return pickle.loads(payload)
+
+    async def _dispatch(self, fn: Callable, args: tuple, kwargs: dict) -> tuple:
+        """Run a task on the next idle worker, replacing the worker if the task doesn't complete"""
+        idle = self._idle
+        worker = await idle.get()
+        worker.busy = True
+        try:
+            worker.conn.send((fn, args, kwargs, time.time()))
+            # The thread's poll returns as soon as the worker replies or dies
+            await asyncio.to_thread(worker.conn.poll, None)
+            reply = worker.conn.recv()
+        except EOFError:
+            # The worker died mid-task (e.g. killed for memory)
+            self._replace(worker, idle)
+            return False, RuntimeError(f"Compute worker exited running {_name(fn)}"), None, None
+        except BaseException:
+            # Timed out or cancelled (client went away)
+            self._replace(worker, idle)
+            raise
+        worker.busy = False
+        idle.put_nowait(worker)
+        return reply
+
+    def _replace(self, worker: _Worker, idle: asyncio.Queue) -> None:
+        """Kill a worker mid-task and put a fresh one in its place"""
+        worker.kill()
+        self._counts["workers_replaced"] += 1
+        if idle is not self._idle or worker not in self._workers:
+            return  # Shut down meanwhile
+        replacement = _Worker(self._context)
+        self._workers[self._workers.index(worker)] = replacement
+        idle.put_nowait(replacement)
+
+    def stats(self) -> dict:
+        """Queue depth, task counters and execution-time percentiles"""
+        running = sum(1 for worker in self._workers if worker.busy)
+        return {
+            "started": self.started,
+            "workers": len(self._workers),
+            "max_pending": settings.COMPUTE_POOL_MAX_PENDING,
+            "in_flight": len(self._in_flight),
+            "running": running,
+            "queue_depth": len(self._in_flight) - running,
+            **self._counts,
+            "wait_ms": _percentiles(self._wait_seconds),
+            "execution_ms": _percentiles(self._exec_seconds),
+        }
+
+
+def _share(value: Any, blocks: list) -> Any:
+    """Copy an array argument into a new shared memory block"""
+    if not isinstance(value, np.ndarray) or value.dtype.hasobject or value.nbytes == 0:
+        return value
+    block = shared_memory.SharedMemory(create=True, size=value.nbytes)
+    blocks.append(block)
+    np.ndarray(value.shape, dtype=value.dtype, buffer=block.buf)[...] = value
+    return _SharedArray(block.name, value.shape, value.dtype.str)
+
+
+def _release(blocks: list) -> None:
+    for block in blocks:
+        try:
+            block.close()
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _array_bytes(args: tuple, kwargs: dict) -> int:
+    return sum(
+        value.nbytes
+        for value in (*args, *kwargs.values())
+        if isinstance(value, np.ndarray)
+    )
+
+
+def _percentiles(samples: deque) -> dict:
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "max": None}
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "p50": round(statistics.median(values) * 1000, 2),
+        "p95": round(values[int(0.95 * (len(values) - 1))] * 1000, 2),
+        "max": round(values[-1] * 1000, 2),
+    }
+
+
+def _name(fn: Callable) -> str:
+    return getattr(fn, "__qualname__", repr(fn))
+
+
+# Process-wide pool, started and stopped by the API lifespan
+compute_pool = ComputePool()
@@ -0,0 +1,150 @@
+"""
+Per-day sufficient statistics (n, sum, sum of squares) for every metric
+
+The metric_daily_stats table holds one row per user, metric type and UTC day.
+It is refreshed for the days an ingest touches, so day-aligned questions
+(daily means, correlations between daily means) read a few hundred rows
+instead of scanning raw samples.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text, func, and_
+from typing import Dict, Iterable, Optional, Set, Tuple
+from datetime import date, datetime, timedelta, timezone
+import logging
+
+from api.config import settings
+from api.models.metric import MetricDailyStat
+from services.tiers import Tier, choose_tier
+
+logger = logging.getLogger(__name__)
+
+# Recompute touched days from raw rows. Recomputing (rather than adding
+# deltas) keeps the refresh idempotent and correct for updates and deletes;
+# days left without samples lose their row.
+_REFRESH_SQL = text("""
+    WITH touched AS (
+        SELECT DISTINCT t.metric_type, t.day
+        FROM unnest(CAST(:metric_types AS varchar[]), CAST(:days AS date[])) AS t(metric_type, day)
+        WHERE t.day >= CAST(:since AS date)
+    ),
+    fresh AS (
+        SELECT
+            t.metric_type,
+            t.day,
+            count(m.value) AS value_count,
+            coalesce(sum(m.value), 0) AS value_sum,
+            coalesce(sum(m.value * m.value), 0) AS value_sum_sq
+        FROM touched t
+        LEFT JOIN metrics m
+            ON m.user_id = :user_id
+            AND m.metric_type = t.metric_type
+            AND m.timestamp >= t.day::timestamp AT TIME ZONE 'UTC'
+            AND m.timestamp < (t.day + 1)::timestamp AT TIME ZONE 'UTC'
+        GROUP BY t.metric_type, t.day
+    ),
+    emptied AS (
+        DELETE FROM metric_daily_stats s
+        USING fresh f
+        WHERE s.user_id = :user_id
+            AND s.metric_type = f.metric_type
+            AND s.day = f.day
+            AND f.value_count = 0
+    )
+    INSERT INTO metric_daily_stats (user_id, metric_type, day, value_count, value_sum, value_sum_sq)
+    SELECT CAST(:user_id AS integer), metric_type, day, value_count, value_sum, value_sum_sq
+    FROM fresh
+    WHERE value_count > 0
+    ON CONFLICT (user_id, metric_type, day) DO UPDATE SET
+        value_count = EXCLUDED.value_count,
+        value_sum = EXCLUDED.value_sum,
+        value_sum_sq = EXCLUDED.value_sum_sq
+""")
+
+TouchedDays = Dict[str, Set[date]]
+
+
+def touched_days(samples: Iterable[Tuple[str, datetime]]) -> TouchedDays:
+    """Group (metric_type, timestamp) pairs into the UTC days they fall on"""
+    touched: TouchedDays = {}
+    for metric_type, timestamp in samples:
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc)
+        touched.setdefault(metric_type, set()).add(timestamp.date())
+    return touched
+
+
+def day_aligned(start_date: Optional[datetime], end_date: Optional[datetime]) -> bool:
+    """Whether an inclusive range covers whole UTC days, so daily stats answer it exactly"""
+    return choose_tier(start_date, end_date, interval="day") == Tier.DAILY
+
+
+class DailyStatsService:
+    """Service for the per-day sufficient statistics store"""
+
+    @staticmethod
+    async def refresh(
+        db: AsyncSession,
+        user_id: int,
+        touched: TouchedDays
+    ) -> None:
+        """
+        Recompute the stats of touched days within the current transaction
+
+        Days older than the raw retention window are left alone: their raw
+        rows may already be gone, so a recompute would undercount them.
+        """
+        if not touched:
+            return
+
+        metric_types = []
+        days = []
+        for metric_type, metric_days in touched.items():
+            metric_types.extend([metric_type] * len(metric_days))
+            days.extend(metric_days)
+
+        since = datetime.now(timezone.utc).date() - timedelta(days=settings.RAW_DATA_RETENTION_DAYS)
+        await db.execute(_REFRESH_SQL, {
+            "user_id": user_id,
+            "metric_types": metric_types,
+            "days": days,
+            "since": since
+        })
+
+    @staticmethod
+    async def pearson(
+        db: AsyncSession,
+        user_id: int,
+        metric_x: str,
+        metric_y: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Tuple[Optional[float], int]:
+        """
+        Pearson correlation of two metrics' daily means over their common days
+
+        Returns ``(r, n)``; r is None with fewer than two common days or a
+        constant series, as Postgres corr() reports.
+        """
+        def daily_means(metric_type: str):
+            conditions = [
+                MetricDailyStat.user_id == user_id,
+                MetricDailyStat.metric_type == metric_type
+            ]
+            if start_date:
+                conditions.append(MetricDailyStat.day >= start_date.date())
+            if end_date:
+                conditions.append(MetricDailyStat.day <= end_date.date())
+            return select(
+                MetricDailyStat.day,
+                (MetricDailyStat.value_sum / MetricDailyStat.value_count).label("mean")
+            ).where(and_(*conditions)).subquery()
+
+        x = daily_means(metric_x)
+        y = daily_means(metric_y)
+        query = select(
+            func.corr(x.c.mean, y.c.mean).label("r"),
+            func.count().label("n")
+        ).select_from(x.join(y, x.c.day == y.c.day))
+
+        row = (await db.execute(query)).one()
+        return row.r, int(row.n)
@@ -0,0 +1,307 @@
+"""
+Export service: stream a user's metrics into a Parquet, CSV or NDJSON file
+
+Exports run as Celery tasks. Rows are read through a server-side cursor in
+chunks of EXPORT_CHUNK_SIZE and written to the file chunk by chunk, so
+memory use is bounded by the chunk size, not by the length of the export.
+Jobs and their files are removed EXPORT_RETENTION_DAYS after they finish.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, and_, or_, type_coerce, String
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+import csv
+import gzip
+import json
+import logging
+import os
+
+from api.config import settings
+from api.models.export import ExportJob
+from api.models.metric import Metric, MetricDailyStat
+from api.models.user import User
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = ["timestamp", "metric_type", "source", "value", "unit", "quality_score", "is_manual"]
+
+# File extension and media type per format
+EXPORT_FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "csv": (".csv.gz", "application/gzip"),
+    "ndjson": (".ndjson", "application/x-ndjson"),
+}
+
+
+class ExportService:
+    """Service for export job operations"""
+
+    @staticmethod
+    async def create_job(
+        db: AsyncSession,
+        user: User,
+        format: str = "parquet",
+        metric_types: Optional[List[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> ExportJob:
+        """Record a pending export job; raises ValueError for an unknown format"""
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {format}")
+
+        job = ExportJob(
+            user_id=user.id,
+            format=format,
+            metric_types=metric_types or None,
+            start_date=start_date,
+            end_date=end_date,
+            status="pending",
+            rows_written=0
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    @staticmethod
+    async def get_job(
+        db: AsyncSession,
+        user: User,
+        job_id: int
+    ) -> Optional[ExportJob]:
+        """An export job owned by the user"""
+        result = await db.execute(
+            select(ExportJob).where(
+                and_(
+                    ExportJob.id == job_id,
+                    ExportJob.user_id == user.id
+                )
+            )
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def run(
+        db: AsyncSession,
+        progress_db: AsyncSession,
+        job_id: int
+    ) -> ExportJob:
+        """
+        Write an export job's file
+
+        ``db`` holds the server-side cursor for its whole transaction, so
+        progress (rows_written after every chunk) is committed through the
+        separate ``progress_db``. rows_total is estimated from the daily
+        stats rather than counted, and may overshoot when the range starts or
+        ends mid-day. The file is written under a .part name and renamed once
+        complete; a failure marks the job failed and removes it.
+        """
+        job = await progress_db.get(ExportJob, job_id)
+        if job is None:
+            raise ValueError(f"Unknown export job: {job_id}")
+
+        conditions = [Metric.user_id == job.user_id]
+        if job.metric_types:
+            conditions.append(Metric.metric_type.in_(job.metric_types))
+        if job.start_date:
+            conditions.append(Metric.timestamp >= job.start_date)
+        if job.end_date:
+            conditions.append(Metric.timestamp <= job.end_date)
+        condition = and_(*conditions)
+
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        job.rows_written = 0
+        job.rows_total = await _estimate_rows(db, job)
+        await progress_db.commit()
+
+        relative_path = _relative_path(job)
+        path = os.path.join(settings.EXPORT_DIR, relative_path)
+        partial_path = f"{path}.part"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Ordered along idx_user_metric_time, so the cursor walks the index
+        query = select(
+            Metric.timestamp,
+            type_coerce(Metric.metric_type, String),
+            Metric.source,
+            Metric.value,
+            Metric.unit,
+            Metric.quality_score,
+            Metric.is_manual
+        ).where(condition).order_by(Metric.metric_type, Metric.timestamp)
+
+        try:
+            writer = _WRITERS[job.format](partial_path)
+            try:
+                result = await db.stream(
+                    query.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE)
+                )
+                async for rows in result.partitions():
+                    writer.write(rows)
+                    job.rows_written += len(rows)
+                    await progress_db.commit()
+            finally:
+                writer.close()
+            os.replace(partial_path, path)
+        except Exception as e:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            job.status = "failed"
+            job.error = str(e)
+            job.completed_at = datetime.now(timezone.utc)
+            await progress_db.commit()
+            raise
+
+        job.status = "completed"
+        job.file_path = relative_path
+        job.file_size = os.path.getsize(path)
+        job.completed_at = datetime.now(timezone.utc)
+        await progress_db.commit()
+
+        logger.info(f"Export {job.id} for user {job.user_id}: {job.rows_written} rows, {job.file_size} bytes")
+        return job
+
+    @staticmethod
+    async def expire(
+        db: AsyncSession,
+        now: Optional[datetime] = None
+    ) -> int:
+        """
+        Delete jobs, and their files, that finished over EXPORT_RETENTION_DAYS ago
+
+        Jobs that never finished (a worker lost mid-export) expire by their
+        creation time, which is far beyond the export task's time limit.
+        Returns the number of jobs removed.
+        """
+        now = now or datetime.now(timezone.utc)
+        cutoff = now - timedelta(days=settings.EXPORT_RETENTION_DAYS)
+        expired = or_(
+            ExportJob.completed_at < cutoff,
+            and_(ExportJob.completed_at.is_(None), ExportJob.created_at < cutoff)
+        )
+
+        jobs = (await db.execute(select(ExportJob).where(expired))).scalars().all()
+        for job in jobs:
+            path = os.path.join(settings.EXPORT_DIR, _relative_path(job))
+            for leftover in (path, f"{path}.part"):
+                try:
+                    os.remove(leftover)
+                except FileNotFoundError:
+                    pass
+
+        if jobs:
+            await db.execute(
+                delete(ExportJob).where(ExportJob.id.in_([job.id for job in jobs]))
+            )
+            await db.commit()
+            logger.info(f"Expired {len(jobs)} exports")
+        return len(jobs)
+
+
+def export_file_path(job: ExportJob) -> Optional[str]:
+    """Absolute path of a completed export's file, if it is still on disk"""
+    if job.status != "completed" or not job.file_path:
+        return None
+    path = os.path.join(settings.EXPORT_DIR, job.file_path)
+    return path if os.path.exists(path) else None
+
+
+def _relative_path(job: ExportJob) -> str:
+    extension, _ = EXPORT_FORMATS[job.format]
+    return os.path.join(str(job.user_id), f"{job.id}{extension}")
+
+
+async def _estimate_rows(db: AsyncSession, job: ExportJob) -> int:
+    """
+    Rows an export will write, from the daily stats of the days it spans
+
+    Days past raw retention still have stats but no rows, so they are left out.
+    """
+    since = datetime.now(timezone.utc).date() - timedelta(days=settings.RAW_DATA_RETENTION_DAYS)
+    conditions = [MetricDailyStat.user_id == job.user_id, MetricDailyStat.day >= since]
+    if job.metric_types:
+        conditions.append(MetricDailyStat.metric_type.in_(job.metric_types))
+    if job.start_date:
+        conditions.append(MetricDailyStat.day >= job.start_date.astimezone(timezone.utc).date())
+    if job.end_date:
+        conditions.append(MetricDailyStat.day <= job.end_date.astimezone(timezone.utc).date())
+
+    result = await db.execute(
+        select(func.coalesce(func.sum(MetricDailyStat.value_count), 0)).where(and_(*conditions))
+    )
+    return int(result.scalar())
+
+
+def _row_dict(row) -> dict:
+    record = dict(zip(EXPORT_COLUMNS, row))
+    record["timestamp"] = record["timestamp"].isoformat()
+    return record
+
+
+class _CsvWriter:
+    """Gzip-compressed CSV with a header row"""
+
+    def __init__(self, path: str):
+        self.file = gzip.open(path, "wt", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(
+            (row[0].isoformat(), *row[1:]) for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class _NdjsonWriter:
+    """One JSON object per line"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        self.file.writelines(json.dumps(_row_dict(row)) + "\n" for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    """Zstd-compressed Parquet, one row group per chunk"""
+
+    def __init__(self, path: str):
+        # Imported here so only the export worker loads pyarrow
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("metric_type", pa.string()),
+            ("source", pa.string()),
+            ("value", pa.float64()),
+            ("unit", pa.string()),
+            ("quality_score", pa.float64()),
+            ("is_manual", pa.int32()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema
+        ))
+
+    def close(self):
+        self.writer.close()
+
+
+_WRITERS = {
+    "parquet": _ParquetWriter,
+    "csv": _CsvWriter,
+    "ndjson": _NdjsonWriter,
+}
@@ -0,0 +1,211 @@
+"""
+Insights service: ranked findings precomputed by a scheduled job
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+from api.config import settings
+from api.models.insight import Insight
+from api.models.user import User
+from services.kernels import column_trends, correlation_matrix, correlation_p_values, latest_zscores
+from services.timeseries import DailyMatrix, load_daily_matrix
+
+# Days of data a metric (or pair of metrics) needs before it yields insights
+INSIGHT_MIN_DAYS = 14
+
+# Significance level for correlations and trends
+INSIGHT_MAX_P_VALUE = 0.01
+
+INSIGHT_MIN_CORRELATION = 0.5
+
+# |z| of the latest day from which it is reported, and at which it scores 1
+ANOMALY_MIN_Z = 2.5
+ANOMALY_FULL_SCORE_Z = 5.0
+
+# Only anomalies on one of the most recent days are news
+ANOMALY_MAX_AGE_DAYS = 2
+
+# Net change over the window (in percent of the mean) below which a trend is not reported
+TREND_MIN_CHANGE_PCT = 5.0
+
+
+class InsightsService:
+    """Service for insight operations"""
+
+    @staticmethod
+    async def get_insights(
+        db: AsyncSession,
+        user: User,
+        limit: int = 10
+    ) -> List[Insight]:
+        """Latest generated insights, best first"""
+        result = await db.execute(
+            select(Insight)
+            .where(Insight.user_id == user.id)
+            .order_by(Insight.score.desc())
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def active_user_ids(
+        db: AsyncSession
+    ) -> List[int]:
+        """Users the insights job runs for"""
+        result = await db.execute(
+            select(User.id).where(User.is_active == True).order_by(User.id)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def generate(
+        db: AsyncSession,
+        user_id: int,
+        now: Optional[datetime] = None
+    ) -> int:
+        """
+        Regenerate a user's insights
+
+        One load of daily means over the last INSIGHTS_LOOKBACK_DAYS complete
+        UTC days feeds every analysis (correlations, latest-day anomalies,
+        trends); the best INSIGHTS_PER_USER findings replace the previous set
+        in one transaction. Returns the number stored.
+        """
+        now = now or datetime.now(timezone.utc)
+        # Whole UTC days up to the last complete one: the daily stats answer
+        # it, and today's partial mean is never judged against full days
+        today = now.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        start = today - timedelta(days=settings.INSIGHTS_LOOKBACK_DAYS)
+        end = today - timedelta(microseconds=1)
+        daily = await load_daily_matrix(db, user_id, start, end)
+
+        insights = derive_insights(daily.dense(), now)
+        insights.sort(key=lambda insight: insight["score"], reverse=True)
+        insights = insights[:settings.INSIGHTS_PER_USER]
+
+        await db.execute(delete(Insight).where(Insight.user_id == user_id))
+        if insights:
+            db.add_all([
+                Insight(user_id=user_id, generated_at=now, **insight)
+                for insight in insights
+            ])
+        await db.commit()
+
+        return len(insights)
+
+
+def derive_insights(daily: DailyMatrix, now: datetime) -> List[dict]:
+    """All correlation, anomaly and trend findings in a dense daily matrix, unranked"""
+    if len(daily.days) < INSIGHT_MIN_DAYS or not daily.metric_types:
+        return []
+    return (
+        _correlation_insights(daily)
+        + _anomaly_insights(daily, now)
+        + _trend_insights(daily)
+    )
+
+
+def _correlation_insights(daily: DailyMatrix) -> List[dict]:
+    r, n, p = correlation_matrix(daily.values, "pearson")
+    names = daily.metric_types
+    insights = []
+
+    rows, columns = np.triu_indices(len(names), k=1)
+    strong = (
+        (n[rows, columns] >= INSIGHT_MIN_DAYS)
+        & (np.abs(r[rows, columns]) >= INSIGHT_MIN_CORRELATION)
+        & (p[rows, columns] < INSIGHT_MAX_P_VALUE)
+    )
+    for i, j in zip(rows[strong], columns[strong]):
+        correlation = float(r[i, j])
+        direction = "rise and fall together" if correlation > 0 else "move in opposite directions"
+        insights.append({
+            "insight_type": "correlation",
+            "metric_type": names[i],
+            "related_metric_type": names[j],
+            "title": f"{_display(names[i]).capitalize()} and {_display(names[j])} {direction}",
+            "description": (
+                f"Over {int(n[i, j])} days, daily {_display(names[i])} and "
+                f"{_display(names[j])} have a correlation of {correlation:.2f}."
+            ),
+            "score": abs(correlation),
+            "details": {
+                "correlation": correlation,
+                "p_value": float(p[i, j]),
+                "sample_size": int(n[i, j])
+            }
+        })
+    return insights
+
+
+def _anomaly_insights(daily: DailyMatrix, now: datetime) -> List[dict]:
+    z, last, n = latest_zscores(daily.values, INSIGHT_MIN_DAYS)
+    today = np.datetime64(now.date(), "D")
+    insights = []
+
+    for column, metric_type in enumerate(daily.metric_types):
+        score = z[column]
+        day = daily.days[last[column]]
+        if not abs(score) >= ANOMALY_MIN_Z or (today - day).astype(int) > ANOMALY_MAX_AGE_DAYS:
+            continue
+        value = float(daily.values[last[column], column])
+        direction = "high" if score > 0 else "low"
+        insights.append({
+            "insight_type": "anomaly",
+            "metric_type": metric_type,
+            "related_metric_type": None,
+            "title": f"Unusually {direction} {_display(metric_type)}",
+            "description": (
+                f"{_display(metric_type).capitalize()} averaged {value:.1f} on {day}, "
+                f"{abs(score):.1f} standard deviations {'above' if score > 0 else 'below'} "
+                f"the previous {int(n[column])} days."
+            ),
+            "score": min(abs(float(score)) / ANOMALY_FULL_SCORE_Z, 1.0),
+            "details": {"day": str(day), "value": value, "z_score": float(score)}
+        })
+    return insights
+
+
+def _trend_insights(daily: DailyMatrix) -> List[dict]:
+    slope, r, n = column_trends(daily.values)
+    # Testing the correlation with time is testing the regression slope
+    p = correlation_p_values(np.nan_to_num(r), n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.nansum(daily.values, axis=0) / n
+        change_pct = slope * (len(daily.days) - 1) / np.abs(means) * 100
+    insights = []
+
+    for column, metric_type in enumerate(daily.metric_types):
+        if not (
+            n[column] >= INSIGHT_MIN_DAYS
+            and p[column] < INSIGHT_MAX_P_VALUE
+            and abs(change_pct[column]) >= TREND_MIN_CHANGE_PCT
+        ):
+            continue
+        direction = "rising" if slope[column] > 0 else "falling"
+        insights.append({
+            "insight_type": "trend",
+            "metric_type": metric_type,
+            "related_metric_type": None,
+            "title": f"{_display(metric_type).capitalize()} is {direction}",
+            "description": (
+                f"{_display(metric_type).capitalize()} changed by {change_pct[column]:+.1f}% "
+                f"over the last {len(daily.days)} days."
+            ),
+            "score": abs(float(r[column])),
+            "details": {
+                "slope_per_day": float(slope[column]),
+                "change_percentage": float(change_pct[column]),
+                "p_value": float(p[column]),
+                "sample_size": int(n[column])
+            }
+        })
+    return insights
+
+
+def _display(metric_type: str) -> str:
+    """heart_rate -> heart rate"""
+    return metric_type.replace("_", " ")
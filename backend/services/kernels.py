@@ -0,0 +1,646 @@
+"""
+Vectorized numerical kernels used by the services
+
+Kernels take and return NumPy arrays only (no ORM objects, no sessions), so
+they can run inline or be dispatched to worker processes unchanged.
+"""
+from typing import Optional
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Selects ``threshold`` points that preserve the visual shape of the series,
+    peaks and troughs included. The first and last points are always kept;
+    the rest are split into ``threshold - 2`` equal-count buckets and each
+    bucket keeps the point forming the largest triangle with the previously
+    selected point and the mean of the next bucket.
+
+    Args:
+        x: Monotonic x values (numeric; convert datetime64 with ``.view('i8')``)
+        y: Values, same length as ``x``
+        threshold: Number of points to keep
+
+    Returns:
+        Sorted integer indices into ``x``/``y``
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket boundaries over the interior points [1, n - 1)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+
+    # Mean of every bucket in one pass; the "next" average for the final
+    # bucket is the last point itself
+    avg_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    next_x = np.append(avg_x[1:], x[n - 1])
+    next_y = np.append(avg_y[1:], y[n - 1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx = x[lo:hi]
+        by = y[lo:hi]
+        # Twice the triangle area; the constant factor doesn't change argmax
+        area = np.abs(
+            (x[a] - next_x[i]) * (by - y[a])
+            - (x[a] - bx) * (next_y[i] - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def pairwise_pearson(matrix: np.ndarray) -> tuple:
+    """
+    Pearson coefficients between all columns, using pairwise-complete rows
+
+    Every pair only uses the rows where both columns are present (non-NaN),
+    which is what aligning two series on their common days gives. All the
+    pairwise sums come out of a handful of matrix products.
+
+    Args:
+        matrix: (observations x variables) array with NaN for missing values
+
+    Returns:
+        ``(r, n)``: coefficient and overlap-count matrices, both
+        (variables x variables); r is NaN where either column is constant
+        over the overlap or fewer than two rows overlap
+    """
+    present = ~np.isnan(matrix)
+    weights = present.astype(np.float64)
+    # Center each column first; correlation is shift-invariant and the
+    # smaller magnitudes keep the sum-of-squares differences well conditioned
+    centered = np.where(present, matrix - np.nanmean(matrix, axis=0), 0.0)
+
+    n = weights.T @ weights
+    sum_x = centered.T @ weights          # [i, j]: sum of x_i over rows where j is present
+    sum_xx = (centered * centered).T @ weights
+    sum_xy = centered.T @ centered
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sum_xy - sum_x * sum_x.T / n
+        var_x = sum_xx - sum_x * sum_x / n
+        var_y = var_x.T
+        r = cov / np.sqrt(var_x * var_y)
+
+    r = np.clip(r, -1.0, 1.0)
+    r[n < 2] = np.nan
+    return r, n.astype(np.int64)
+
+
+def rank_columns(matrix: np.ndarray) -> np.ndarray:
+    """Average (tie-aware) ranks of every column, ignoring NaN, which stays NaN"""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    rows = matrix.shape[0]
+    order = np.argsort(matrix, axis=0, kind="mergesort")  # NaN sorts last
+    ordered = np.take_along_axis(matrix, order, axis=0)
+
+    positions = np.broadcast_to(np.arange(1, rows + 1)[:, None], ordered.shape)
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    ends = np.ones(ordered.shape, dtype=bool)
+    ends[:-1] = starts[1:]
+
+    # First and last position of each run of ties, spread over the run
+    first = np.maximum.accumulate(np.where(starts, positions, 0), axis=0)
+    last = np.minimum.accumulate(np.where(ends, positions, rows + 1)[::-1], axis=0)[::-1]
+    average = (first + last) / 2.0
+    average[np.isnan(ordered)] = np.nan
+
+    ranks = np.empty_like(average)
+    np.put_along_axis(ranks, order, average, axis=0)
+    return ranks
+
+
+def pairwise_spearman(matrix: np.ndarray) -> tuple:
+    """
+    Spearman coefficients between all columns, using pairwise-complete rows
+
+    Ranks depend on which rows a pair shares, so each column is re-ranked
+    against the overlap with every other column at once: one vectorized
+    pass per column rather than one per pair.
+
+    Returns:
+        ``(r, n)`` as for pairwise_pearson
+    """
+    present = ~np.isnan(matrix)
+    variables = matrix.shape[1]
+    r = np.full((variables, variables), np.nan)
+
+    for i in range(variables):
+        # r is symmetric, so only columns i.. are needed, over the rows i has
+        rows = present[:, i]
+        block = matrix[rows, i:]
+        overlap = present[rows, i:]
+        ranks_x = rank_columns(np.where(overlap, block[:, [0]], np.nan))
+        ranks_y = rank_columns(np.where(overlap, block, np.nan))
+
+        # Column-wise Pearson on the ranks; both share the same overlap rows
+        dx = ranks_x - np.nanmean(ranks_x, axis=0)
+        dy = ranks_y - np.nanmean(ranks_y, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r[i, i:] = np.nansum(dx * dy, axis=0) / np.sqrt(
+                np.nansum(dx * dx, axis=0) * np.nansum(dy * dy, axis=0)
+            )
+        r[i:, i] = r[i, i:]
+
+    n = present.T.astype(np.float64) @ present.astype(np.float64)
+    r = np.clip(r, -1.0, 1.0)
+    r[n < 2] = np.nan
+    return r, n.astype(np.int64)
+
+
+def correlation_p_values(r: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """
+    Two-sided p-values for correlation coefficients via Student's t
+
+    Matches scipy.stats.pearsonr/spearmanr, including p = 1 for two samples.
+    """
+    from scipy import stats
+
+    r = np.asarray(r, dtype=np.float64)
+    dof = np.asarray(n, dtype=np.float64) - 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.abs(r) * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+        p = 2 * stats.t.sf(t, dof)
+    p = np.where(np.abs(r) == 1.0, 0.0, p)
+    p = np.where(dof == 0, 1.0, p)
+    return np.where(np.isnan(r), np.nan, p)
+
+
+def lagged_pearson(x: np.ndarray, y: np.ndarray, max_lag: int) -> tuple:
+    """
+    Pearson correlation of ``x[t]`` with ``y[t + lag]`` for every lag at once
+
+    Inputs are equally spaced series with NaN for missing samples; each lag
+    uses only the pairs where both are present. The six pairwise sums every
+    lag needs (overlap count, sums, sums of squares, cross products) are
+    cross-correlations of masked series, so each takes one FFT product for
+    all lags together.
+
+    Args:
+        x, y: Equal-length series on the same grid
+        max_lag: Largest shift, in samples, in either direction
+
+    Returns:
+        ``(lags, r, n)`` for lags ``-max_lag..max_lag``; a positive lag means
+        ``y`` follows ``x``. r is NaN where fewer than two pairs overlap or
+        either side is constant over the overlap.
+    """
+    from scipy import fft
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    length = len(x)
+    max_lag = min(max_lag, length - 1)
+    lags = np.arange(-max_lag, max_lag + 1)
+
+    present_x = ~np.isnan(x)
+    present_y = ~np.isnan(y)
+    wx = present_x.astype(np.float64)
+    wy = present_y.astype(np.float64)
+    # Centering keeps the moment differences well conditioned
+    x0 = np.where(present_x, x - np.nanmean(x), 0.0) if present_x.any() else wx
+    y0 = np.where(present_y, y - np.nanmean(y), 0.0) if present_y.any() else wy
+
+    # Zero padding to 2n - 1 keeps the circular correlation from wrapping
+    size = fft.next_fast_len(2 * length - 1, real=True)
+
+    def xcorr(a, b):
+        # c[k] = sum_t a[t] * b[t + k]; negative k wrap to the end of the buffer
+        full = fft.irfft(np.conj(fft.rfft(a, size)) * fft.rfft(b, size), size)
+        return full[lags % size]
+
+    n = np.rint(xcorr(wx, wy))
+    sum_x = xcorr(x0, wy)
+    sum_y = xcorr(wx, y0)
+    sum_xx = xcorr(x0 * x0, wy)
+    sum_yy = xcorr(wx, y0 * y0)
+    sum_xy = xcorr(x0, y0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sum_xy - sum_x * sum_y / n
+        var_x = sum_xx - sum_x * sum_x / n
+        var_y = sum_yy - sum_y * sum_y / n
+        r = cov / np.sqrt(var_x * var_y)
+
+    # FFT round-off leaves tiny nonzero variances where a side is constant
+    scale = np.maximum(np.abs(sum_xx) + np.abs(sum_yy), 1.0)
+    r[(var_x <= 1e-12 * scale) | (var_y <= 1e-12 * scale)] = np.nan
+    r[n < 2] = np.nan
+    return lags, np.clip(r, -1.0, 1.0), n.astype(np.int64)
+
+
+def correlation_matrix(matrix: np.ndarray, method: str = "pearson") -> tuple:
+    """
+    All pairwise coefficients, overlap counts and p-values of a matrix's columns
+
+    Returns:
+        ``(r, n, p)`` (variables x variables) arrays
+    """
+    if method == "pearson":
+        r, n = pairwise_pearson(matrix)
+    else:  # spearman
+        r, n = pairwise_spearman(matrix)
+    return r, n, correlation_p_values(r, n)
+
+
+def daily_correlation(
+    timestamps_x: np.ndarray,
+    values_x: np.ndarray,
+    timestamps_y: np.ndarray,
+    values_y: np.ndarray,
+    method: str = "pearson"
+) -> tuple:
+    """
+    Correlate two series' UTC daily means over the days both have
+
+    Returns:
+        ``(r, p, n)``; r and p are None with fewer than two common days
+    """
+    from scipy import stats
+
+    days_x, means_x = daily_means(timestamps_x, values_x)
+    days_y, means_y = daily_means(timestamps_y, values_y)
+    _, index_x, index_y = np.intersect1d(days_x, days_y, assume_unique=True, return_indices=True)
+    n = len(index_x)
+    if n < 2:
+        return None, None, n
+
+    if method == "pearson":
+        r, p = stats.pearsonr(means_x[index_x], means_y[index_y])
+    else:  # spearman
+        r, p = stats.spearmanr(means_x[index_x], means_y[index_y])
+    return float(r), float(p), n
+
+
+def daily_means(timestamps: np.ndarray, values: np.ndarray) -> tuple:
+    """Mean value per UTC day, as (datetime64[D] days, float64 means)"""
+    days, codes = np.unique(timestamps.astype("datetime64[D]"), return_inverse=True)
+    sums = np.bincount(codes, weights=values, minlength=len(days))
+    counts = np.bincount(codes, minlength=len(days))
+    return days, sums / counts
+
+
+def binned_means(epoch_seconds: np.ndarray, values: np.ndarray, width: float) -> tuple:
+    """Mean value per fixed-width time bin, as (bin centers in seconds, means); empty bins are dropped"""
+    bins, codes = np.unique(np.floor(epoch_seconds / width), return_inverse=True)
+    sums = np.bincount(codes, weights=values, minlength=len(bins))
+    counts = np.bincount(codes, minlength=len(bins))
+    return (bins + 0.5) * width, sums / counts
+
+
+def lomb_scargle(t: np.ndarray, y: np.ndarray, angular_frequencies: np.ndarray, block: int = 256) -> np.ndarray:
+    """
+    Classical Lomb-Scargle periodogram of a mean-centered series
+
+    Evaluated for a block of frequencies at a time from the four trigonometric
+    sums per frequency (Press & Rybicki), so memory stays at ``block`` x N.
+    """
+    n = len(y)
+    power = np.empty(len(angular_frequencies))
+    for start in range(0, len(angular_frequencies), block):
+        phase = np.outer(angular_frequencies[start:start + block], t)
+        cos, sin = np.cos(phase), np.sin(phase)
+        yc, ys = cos @ y, sin @ y
+        c2 = 2 * np.einsum("ij,ij->i", cos, cos) - n
+        s2 = 2 * np.einsum("ij,ij->i", cos, sin)
+
+        # Time offset tau that makes the sine and cosine terms orthogonal
+        tau = 0.5 * np.arctan2(s2, c2)
+        ct, st = np.cos(tau), np.sin(tau)
+        cc = (n + c2) / 2
+        ss = (n - c2) / 2
+        cs = s2 / 2
+        yc_tau = yc * ct + ys * st
+        ys_tau = ys * ct - yc * st
+        cc_tau = ct * ct * cc + 2 * ct * st * cs + st * st * ss
+        ss_tau = st * st * cc - 2 * ct * st * cs + ct * ct * ss
+        with np.errstate(invalid="ignore", divide="ignore"):
+            block_power = 0.5 * (yc_tau * yc_tau / cc_tau + ys_tau * ys_tau / ss_tau)
+        power[start:start + block] = np.nan_to_num(block_power)
+    return power
+
+
+def periodic_components(
+    t: np.ndarray,
+    values: np.ndarray,
+    min_period: float,
+    max_period: float,
+    max_peaks: int = 5,
+    max_false_alarm: float = 0.01,
+    min_power: float = 0.01,
+    oversample: int = 5,
+    max_frequencies: int = 5000
+) -> tuple:
+    """
+    Significant periodicities of an irregularly sampled series (Lomb-Scargle)
+
+    The periodogram is evaluated on a uniform frequency grid between
+    1/max_period and 1/min_period, ``oversample`` points per 1/span, capped at
+    ``max_frequencies``. Periods longer than half the span (fewer than two
+    full cycles) are not searched. The strongest peak is kept while its false
+    alarm probability, 1 - (1 - exp(-z))^M for Scargle's normalized power z
+    and M independent frequencies in the band, is below ``max_false_alarm``;
+    its fitted sinusoid is then subtracted and the search repeated, so a
+    strong cycle's side lobes are not reported as cycles of their own.
+    Components explaining less than ``min_power`` of the variance end the
+    search: with many samples even negligible cycles are significant.
+
+    Args:
+        t: Sample times, in the unit periods are given in
+        values: Sample values
+        min_period, max_period: Band of periods to search
+
+    Returns:
+        ``(periods, power, amplitude, false_alarm)`` per component, strongest
+        first; power is the fraction of the series' variance the component
+        explains, amplitude its semi-amplitude in the values' unit
+    """
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(values, dtype=np.float64)
+    none = tuple(np.empty(0) for _ in range(4))
+    n = len(y)
+    if n < 8:
+        return none
+
+    t = t - t.min()
+    residual = y - y.mean()
+    total_sq = float(np.dot(residual, residual))
+    span = float(t.max())
+    max_period = min(max_period, span / 2)
+    if total_sq == 0 or max_period <= min_period:
+        return none
+
+    low, high = 1.0 / max_period, 1.0 / min_period
+    count = int(min(max_frequencies, max(3, np.ceil((high - low) * span * oversample) + 1)))
+    frequencies = np.linspace(low, high, count)
+    independent = max(1.0, min((high - low) * span, n))
+
+    components = []
+    for _ in range(max_peaks):
+        power = lomb_scargle(t, residual, 2 * np.pi * frequencies)
+        best = int(np.argmax(power))
+        residual_sq = float(np.dot(residual, residual))
+        z = power[best] / (residual_sq / (n - 1))
+        false_alarm = float(-np.expm1(independent * np.log1p(-np.exp(-z))))
+        if not false_alarm < max_false_alarm:
+            break
+
+        # Least-squares sinusoid (with offset) at the peak frequency
+        phase = 2 * np.pi * frequencies[best] * t
+        design = np.column_stack((np.cos(phase), np.sin(phase), np.ones(n)))
+        coefficients = np.linalg.lstsq(design, residual, rcond=None)[0]
+        fitted = design @ coefficients
+        explained = residual_sq - float(np.dot(residual - fitted, residual - fitted))
+        if explained < min_power * total_sq:
+            break
+        residual = residual - fitted
+
+        components.append((
+            1.0 / frequencies[best],
+            explained / total_sq,
+            float(np.hypot(coefficients[0], coefficients[1])),
+            false_alarm,
+        ))
+
+    if not components:
+        return none
+    components.sort(key=lambda component: component[1], reverse=True)
+    return tuple(np.array(column) for column in zip(*components))
+
+
+def zscore_outliers(values: np.ndarray, sensitivity: float) -> tuple:
+    """
+    Values more than ``sensitivity`` sample standard deviations from the mean
+
+    Returns:
+        ``(indices, z_scores, mean, std)``, with z-scores of the flagged
+        values only; std is NaN for a single value, which flags nothing
+    """
+    values = np.asarray(values, dtype=np.float64)
+    mean = values.mean()
+    std = values.std(ddof=1) if len(values) > 1 else np.nan
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z_scores = (values - mean) / std
+    indices = np.flatnonzero(np.abs(z_scores) > sensitivity)
+    return indices, z_scores[indices], float(mean), float(std)
+
+
+def linear_slope(x: np.ndarray, y: np.ndarray) -> float:
+    """Least-squares slope of y over x"""
+    from scipy import stats
+
+    return float(stats.linregress(x, y).slope)
+
+
+def column_trends(matrix: np.ndarray) -> tuple:
+    """
+    Least-squares slope per row, and correlation with the row index, of every column
+
+    Rows are equally spaced (e.g. a dense day grid); NaN cells are skipped.
+
+    Returns:
+        ``(slope, r, n)`` arrays, one entry per column; NaN where a column
+        has fewer than two values or no variation
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    present = np.isfinite(matrix)
+    x = np.arange(len(matrix), dtype=np.float64)[:, None]
+    n = present.sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.where(present, x, 0.0).sum(axis=0) / n
+        mean_y = np.where(present, matrix, 0.0).sum(axis=0) / n
+        dx = np.where(present, x - mean_x, 0.0)
+        dy = np.where(present, matrix - mean_y, 0.0)
+        sxx = (dx * dx).sum(axis=0)
+        syy = (dy * dy).sum(axis=0)
+        sxy = (dx * dy).sum(axis=0)
+        slope = sxy / sxx
+        r = sxy / np.sqrt(sxx * syy)
+
+    return slope, r, n
+
+
+def latest_zscores(matrix: np.ndarray, min_history: int) -> tuple:
+    """
+    z-score of every column's last value against the values before it
+
+    Returns:
+        ``(z, row, n)``: the score, the row of the last value and the number
+        of earlier values; z is NaN with fewer than ``min_history`` of them
+        or no variation
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    rows, columns = matrix.shape
+    present = np.isfinite(matrix)
+    last = rows - 1 - np.argmax(present[::-1], axis=0)
+    latest = matrix[last, np.arange(columns)]
+    before = present & (np.arange(rows)[:, None] < last)
+    n = before.sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(before, matrix, 0.0).sum(axis=0) / n
+        deviation = np.where(before, matrix - mean, 0.0)
+        std = np.sqrt((deviation * deviation).sum(axis=0) / (n - 1))
+        z = (latest - mean) / std
+    z[(n < min_history) | ~present.any(axis=0) | ~(std > 0)] = np.nan
+
+    return z, last, n
+
+
+# Scales a median absolute deviation to a standard deviation for normal data
+MAD_TO_STD = 1.4826
+
+
+def rolling_median_baseline(values: np.ndarray, window: int) -> tuple:
+    """
+    Robust trailing baseline: median and scaled MAD of the preceding points
+
+    Each point is compared with the ``window`` points before it (itself
+    excluded), so an outlier can't mask itself and a single spike moves the
+    baseline of later points very little. The window is rounded up to an odd
+    size so its median is a sample value. The MAD is the rolling median of
+    each point's deviation from its own window median, which approximates the
+    per-window MAD with two passes of a sorted-window median filter.
+
+    Returns:
+        ``(center, scale)``, NaN for the first ``window`` points
+    """
+    from scipy import ndimage
+
+    values = np.asarray(values, dtype=np.float64)
+    window = max(int(window), 3) | 1
+    origin = (window - 1) // 2  # window [i - window + 1, i]
+
+    inclusive = ndimage.median_filter(values, size=window, origin=origin, mode="nearest")
+    deviation = ndimage.median_filter(np.abs(values - inclusive), size=window, origin=origin, mode="nearest")
+
+    center = np.full(len(values), np.nan)
+    scale = np.full(len(values), np.nan)
+    center[window:] = inclusive[window - 1:-1]
+    scale[window:] = MAD_TO_STD * deviation[window - 1:-1]
+    return center, scale
+
+
+def ewma_baseline(values: np.ndarray, span: int) -> tuple:
+    """
+    Exponentially weighted trailing mean and standard deviation
+
+    Uses smoothing factor ``2 / (span + 1)`` and the incremental EW variance
+    ``v_t = (1 - a) * (v_(t-1) + a * (x_t - m_(t-1))^2)``; both recursions
+    run as linear filters. Each point is scored against the state before it.
+
+    Returns:
+        ``(center, scale)``, NaN for the first ``span`` points
+    """
+    from scipy.signal import lfilter
+
+    values = np.asarray(values, dtype=np.float64)
+    alpha = 2.0 / (max(int(span), 1) + 1)
+    decay = [1.0, alpha - 1.0]
+
+    mean, _ = lfilter([alpha], decay, values, zi=[(1.0 - alpha) * values[0]])
+    previous_mean = np.concatenate(([values[0]], mean[:-1]))
+    deviation = values - previous_mean
+    variance, _ = lfilter([alpha * (1.0 - alpha)], decay, deviation * deviation, zi=[0.0])
+
+    center = np.full(len(values), np.nan)
+    scale = np.full(len(values), np.nan)
+    center[span:] = mean[span - 1:-1]
+    scale[span:] = np.sqrt(variance[span - 1:-1])
+    return center, scale
+
+
+def rolling_outliers(values: np.ndarray, sensitivity: float, method: str, window: int) -> tuple:
+    """
+    Values more than ``sensitivity`` baseline deviations from their baseline
+
+    Args:
+        method: "rolling_mad" (rolling_median_baseline) or "ewma" (ewma_baseline)
+        window: Trailing window, or EWMA span, in points
+
+    Returns:
+        ``(indices, z_scores, centers, latest_center, latest_scale)``;
+        z-scores and centers are for the flagged values only, and the latest
+        baseline is the one the most recent value was scored against
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if method == "rolling_mad":
+        center, scale = rolling_median_baseline(values, window)
+    else:  # ewma
+        center, scale = ewma_baseline(values, window)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z_scores = (values - center) / np.where(scale > 0, scale, np.nan)
+    indices = np.flatnonzero(np.abs(z_scores) > sensitivity)
+
+    return indices, z_scores[indices], center[indices], float(center[-1]), float(scale[-1])
+
+
+def welford_merge(count: int, mean: float, m2: float, values: np.ndarray) -> tuple:
+    """
+    Fold new values into a running (count, mean, M2) state
+
+    Uses the parallel combination of Chan et al., so a batch costs one pass
+    and the result doesn't depend on the order values arrive in. The sample
+    variance is ``M2 / (count - 1)``.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    batch = len(values)
+    if batch == 0:
+        return count, mean, m2
+
+    batch_mean = float(values.mean())
+    batch_m2 = float(np.square(values - batch_mean).sum())
+    total = count + batch
+    delta = batch_mean - mean
+    return (
+        total,
+        mean + delta * batch / total,
+        m2 + batch_m2 + delta * delta * count * batch / total,
+    )
+
+
+def ewma_update(mean: Optional[float], variance: Optional[float], values: np.ndarray, alpha: float) -> tuple:
+    """
+    Advance an exponentially weighted mean/variance over new values in time order
+
+    Same recursions as ewma_baseline, started from a stored state rather than
+    the first value; a missing state is seeded with the first value.
+
+    Returns:
+        ``(mean, variance, z_scores)``: the new state and each value's score
+        against the state just before it (NaN while the variance is zero)
+    """
+    from scipy.signal import lfilter
+
+    values = np.asarray(values, dtype=np.float64)
+    if mean is None or variance is None:
+        mean, variance = float(values[0]), 0.0
+    decay = [1.0, alpha - 1.0]
+
+    means, _ = lfilter([alpha], decay, values, zi=[(1.0 - alpha) * mean])
+    previous_means = np.concatenate(([mean], means[:-1]))
+    deviation = values - previous_means
+    variances, _ = lfilter([alpha * (1.0 - alpha)], decay, deviation * deviation, zi=[(1.0 - alpha) * variance])
+    previous_variances = np.concatenate(([variance], variances[:-1]))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z_scores = deviation / np.sqrt(np.where(previous_variances > 0, previous_variances, np.nan))
+    return float(means[-1]), float(variances[-1]), z_scores
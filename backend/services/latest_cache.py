@@ -0,0 +1,117 @@
+"""
+Write-through Redis cache of the latest value per metric type
+"""
+from typing import Dict, Optional
+from datetime import datetime, timezone
+import json
+import logging
+
+from api.cache import get_redis
+from api.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sets each field only if the incoming sample is at least as new as the
+# cached one, so concurrent writers and cache warm-ups can't regress a value.
+_UPDATE_SCRIPT = """
+local key = KEYS[1]
+local ttl = tonumber(ARGV[1])
+if ARGV[2] == '1' then
+  redis.call('HSET', key, '__complete__', '1')
+end
+for i = 3, #ARGV, 2 do
+  local current = redis.call('HGET', key, ARGV[i])
+  if not current or cjson.decode(current)['epoch'] <= cjson.decode(ARGV[i + 1])['epoch'] then
+    redis.call('HSET', key, ARGV[i], ARGV[i + 1])
+  end
+end
+if ttl > 0 then
+  redis.call('EXPIRE', key, ttl)
+end
+return 1
+"""
+
+
+def _as_utc(timestamp: datetime) -> datetime:
+    """Treat naive timestamps as UTC, matching how they are stored"""
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def latest_entry(value: float, unit: str, timestamp: datetime, source: str) -> dict:
+    """Build the response entry for a single latest value"""
+    return {
+        "value": value,
+        "unit": unit,
+        "timestamp": _as_utc(timestamp).isoformat(),
+        "source": source
+    }
+
+
+class LatestValueCache:
+    """Redis hash of latest values, keyed per user with one field per metric type"""
+
+    COMPLETE_FIELD = "__complete__"
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"metrics:latest:{user_id}"
+
+    @staticmethod
+    async def get(user_id: int) -> Optional[Dict[str, dict]]:
+        """
+        Get all cached latest values for a user
+
+        Returns None unless the hash has been fully populated from the
+        database, so a partially written hash never hides metric types.
+        """
+        try:
+            cached = await get_redis().hgetall(LatestValueCache._key(user_id))
+        except Exception as e:
+            logger.warning(f"Latest value cache read failed for user {user_id}: {e}")
+            return None
+
+        if cached.pop(LatestValueCache.COMPLETE_FIELD, None) is None:
+            return None
+
+        result = {}
+        for metric_type, payload in cached.items():
+            entry = json.loads(payload)
+            entry.pop("epoch", None)
+            result[metric_type] = entry
+        return result
+
+    @staticmethod
+    async def update(
+        user_id: int,
+        entries: Dict[str, dict],
+        complete: bool = False
+    ):
+        """
+        Merge latest values into the cache, keeping whichever sample is newer
+
+        - **entries**: {metric_type: entry} as built by ``latest_entry``
+        - **complete**: Mark the hash as holding every metric type for the user
+        """
+        if not entries and not complete:
+            return
+
+        args = [settings.LATEST_CACHE_TTL_SECONDS, "1" if complete else "0"]
+        for metric_type, entry in entries.items():
+            epoch = datetime.fromisoformat(entry["timestamp"]).timestamp()
+            args.extend([metric_type, json.dumps({**entry, "epoch": epoch})])
+
+        try:
+            await get_redis().eval(_UPDATE_SCRIPT, 1, LatestValueCache._key(user_id), *args)
+        except Exception as e:
+            logger.warning(f"Latest value cache update failed for user {user_id}: {e}")
+            await LatestValueCache.invalidate(user_id)
+
+    @staticmethod
+    async def invalidate(user_id: int):
+        """Drop the cached hash so the next read reloads it from the database"""
+        try:
+            await get_redis().delete(LatestValueCache._key(user_id))
+        except Exception as e:
+            logger.warning(f"Latest value cache invalidation failed for user {user_id}: {e}")
@@ -0,0 +1,261 @@
+"""
+Maintenance service for storage administration
+"""
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
+from sqlalchemy import text
+from typing import Optional, Union
+from datetime import date, datetime, timedelta, timezone
+import logging
+import time
+
+from api.config import settings
+from services.tiers import timescaledb_available
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_VIEWS = {
+    "metrics_hourly": "hour",
+    "metrics_daily": "day",
+}
+
+
+class MaintenanceService:
+    """Service for storage maintenance operations"""
+
+    @staticmethod
+    async def compression_report(
+        db: AsyncSession
+    ) -> dict:
+        """Report compression ratio and per-chunk sizes for the metrics hypertable"""
+        if not await timescaledb_available(db):
+            return {
+                "hypertable": "metrics",
+                "compression_enabled": False,
+                "chunks": []
+            }
+
+        totals = (await db.execute(text("""
+            SELECT
+                total_chunks,
+                number_compressed_chunks,
+                before_compression_total_bytes,
+                after_compression_total_bytes
+            FROM hypertable_compression_stats('metrics')
+        """))).one_or_none()
+
+        chunk_rows = await db.execute(text("""
+            SELECT
+                c.chunk_name,
+                c.range_start,
+                c.range_end,
+                c.is_compressed,
+                s.total_bytes,
+                cs.before_compression_total_bytes,
+                cs.after_compression_total_bytes
+            FROM timescaledb_information.chunks c
+            JOIN chunks_detailed_size('metrics') s
+                ON s.chunk_name = c.chunk_name
+            LEFT JOIN chunk_compression_stats('metrics') cs
+                ON cs.chunk_name = c.chunk_name
+            WHERE c.hypertable_name = 'metrics'
+            ORDER BY c.range_start
+        """))
+
+        chunks = [
+            {
+                "chunk": row.chunk_name,
+                "range_start": row.range_start.isoformat(),
+                "range_end": row.range_end.isoformat(),
+                "is_compressed": row.is_compressed,
+                "total_bytes": row.total_bytes,
+                "compression_ratio": _ratio(
+                    row.before_compression_total_bytes,
+                    row.after_compression_total_bytes
+                )
+            }
+            for row in chunk_rows
+        ]
+
+        before = totals.before_compression_total_bytes if totals else None
+        after = totals.after_compression_total_bytes if totals else None
+
+        return {
+            "hypertable": "metrics",
+            "compression_enabled": True,
+            "total_chunks": totals.total_chunks if totals else len(chunks),
+            "compressed_chunks": totals.number_compressed_chunks if totals else 0,
+            "before_compression_bytes": before,
+            "after_compression_bytes": after,
+            "compression_ratio": _ratio(before, after),
+            "total_bytes": sum(chunk["total_bytes"] or 0 for chunk in chunks),
+            "chunks": chunks
+        }
+
+    @staticmethod
+    async def apply_retention(
+        db: AsyncSession,
+        now: Optional[datetime] = None
+    ) -> dict:
+        """
+        Enforce the data retention settings
+
+        - Raw metrics older than RAW_DATA_RETENTION_DAYS
+        - Hourly/daily rollups, daily stats and sketches older than AGGREGATED_DATA_RETENTION_DAYS
+        - Alert history older than ALERT_HISTORY_RETENTION_DAYS
+
+        Rollups covering expiring raw data are persisted first. On TimescaleDB
+        whole chunks are dropped with drop_chunks; on plain Postgres rows are
+        removed in small committed batches, never one long DELETE that bloats
+        and locks the table. Statements run in autocommit mode, which
+        refresh_continuous_aggregate requires.
+
+        Returns a report with rows and chunks reclaimed and time taken.
+        """
+        started = time.perf_counter()
+        now = now or datetime.now(timezone.utc)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # Day-aligned, so rollup buckets at the cutoff are complete
+        raw_cutoff = midnight - timedelta(days=settings.RAW_DATA_RETENTION_DAYS)
+        aggregate_cutoff = midnight - timedelta(days=settings.AGGREGATED_DATA_RETENTION_DAYS)
+        alert_cutoff = now - timedelta(days=settings.ALERT_HISTORY_RETENTION_DAYS)
+
+        conn = await db.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+        use_chunks = await timescaledb_available(db)
+
+        if use_chunks:
+            raw = await _drop_raw_chunks(conn, raw_cutoff)
+            aggregates = await _drop_rollup_chunks(conn, aggregate_cutoff)
+        else:
+            raw = await _delete_raw_rows(conn, raw_cutoff)
+            aggregates = {"chunks_dropped": 0, "rows_deleted": 0}
+            for view in ROLLUP_VIEWS:
+                aggregates["rows_deleted"] += await _batched_delete(
+                    conn, view, "bucket", aggregate_cutoff
+                )
+
+        aggregates["rows_deleted"] += await _batched_delete(
+            conn, "metric_daily_stats", "day", aggregate_cutoff.date()
+        )
+        aggregates["rows_deleted"] += await _batched_delete(
+            conn, "metric_daily_sketches", "day", aggregate_cutoff.date()
+        )
+
+        alert_history_deleted = await _batched_delete(
+            conn, "alert_history", "created_at", alert_cutoff
+        )
+
+        report = {
+            "mode": "drop_chunks" if use_chunks else "batched_delete",
+            "raw_cutoff": raw_cutoff.isoformat(),
+            "aggregate_cutoff": aggregate_cutoff.isoformat(),
+            "alert_cutoff": alert_cutoff.isoformat(),
+            "raw_chunks_dropped": raw["chunks_dropped"],
+            "raw_rows_reclaimed": raw["rows_deleted"],
+            "aggregate_chunks_dropped": aggregates["chunks_dropped"],
+            "aggregate_rows_reclaimed": aggregates["rows_deleted"],
+            "alert_history_deleted": alert_history_deleted,
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }
+        logger.info(f"Retention applied: {report}")
+        return report
+
+
+async def _drop_raw_chunks(conn: AsyncConnection, cutoff: datetime) -> dict:
+    """Materialize rollups up to the cutoff, then drop whole raw chunks before it"""
+    # Refreshing only recomputes invalidated buckets, so an open start is cheap.
+    # Once materialized, rollups outlive the raw chunks they came from.
+    for view in ROLLUP_VIEWS:
+        await conn.execute(
+            text(f"CALL refresh_continuous_aggregate('{view}', NULL, CAST(:cutoff AS timestamptz))"),
+            {"cutoff": cutoff}
+        )
+
+    # Row counts come from chunk statistics rather than scanning doomed data.
+    # The open-ended drop_chunks arguments are typed "any", hence the casts.
+    expiring = (await conn.execute(text("""
+        SELECT count(*) AS chunks, coalesce(sum(approximate_row_count(chunk)), 0) AS rows
+        FROM show_chunks('metrics', older_than => CAST(:cutoff AS timestamptz)) AS chunk
+    """), {"cutoff": cutoff})).one()
+
+    dropped = (await conn.execute(text(
+        "SELECT drop_chunks('metrics', older_than => CAST(:cutoff AS timestamptz))"
+    ), {"cutoff": cutoff})).all()
+
+    return {"chunks_dropped": len(dropped), "rows_deleted": int(expiring.rows)}
+
+
+async def _drop_rollup_chunks(conn: AsyncConnection, cutoff: datetime) -> dict:
+    """Drop rollup chunks older than the aggregated retention window"""
+    chunks_dropped = 0
+    for view in ROLLUP_VIEWS:
+        dropped = (await conn.execute(text(
+            f"SELECT drop_chunks('{view}', older_than => CAST(:cutoff AS timestamptz))"
+        ), {"cutoff": cutoff})).all()
+        chunks_dropped += len(dropped)
+
+    return {"chunks_dropped": chunks_dropped, "rows_deleted": 0}
+
+
+async def _delete_raw_rows(conn: AsyncConnection, cutoff: datetime) -> dict:
+    """Archive rollups of expiring raw rows, then delete them in batches (plain Postgres)"""
+    for view, unit in ROLLUP_VIEWS.items():
+        # DO NOTHING: a rerun after a partial delete must not overwrite a
+        # complete rollup with one computed from the remaining rows
+        await conn.execute(text(f"""
+            INSERT INTO {view} (
+                user_id, metric_type, bucket, value_count, value_sum,
+                value_sum_sq, value_avg, value_min, value_max, unit
+            )
+            SELECT
+                user_id,
+                metric_type,
+                date_trunc('{unit}', timestamp, 'UTC') AS bucket,
+                count(value),
+                sum(value),
+                sum(value * value),
+                avg(value),
+                min(value),
+                max(value),
+                max(unit)
+            FROM metrics
+            WHERE timestamp < :cutoff
+            GROUP BY user_id, metric_type, bucket
+            ON CONFLICT (user_id, metric_type, bucket) DO NOTHING
+        """), {"cutoff": cutoff})
+
+    rows_deleted = await _batched_delete(conn, "metrics", "timestamp", cutoff, key="id")
+    return {"chunks_dropped": 0, "rows_deleted": rows_deleted}
+
+
+async def _batched_delete(
+    conn: AsyncConnection,
+    table_name: str,
+    time_column: str,
+    cutoff: Union[datetime, date],
+    key: str = "ctid"
+) -> int:
+    """Delete rows older than the cutoff in autocommitted batches"""
+    batch_size = settings.RETENTION_DELETE_BATCH_SIZE
+    statement = text(f"""
+        DELETE FROM {table_name}
+        WHERE {key} IN (
+            SELECT {key} FROM {table_name}
+            WHERE {time_column} < :cutoff
+            LIMIT :batch_size
+        )
+    """)
+
+    deleted = 0
+    while True:
+        result = await conn.execute(statement, {"cutoff": cutoff, "batch_size": batch_size})
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+def _ratio(before, after):
+    """Uncompressed/compressed size ratio, or None when not compressed"""
+    if not before or not after:
+        return None
+    return round(before / after, 2)
@@ -2,13 +2,130 @@
 Metrics service for database operations
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from typing import List, Optional
-from datetime import datetime, timedelta
-import pandas as pd
+from sqlalchemy import select, delete, func, and_, or_, null, literal, literal_column, DateTime
+from sqlalchemy.dialects.postgresql import array as pg_array, insert as pg_insert
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+import base64
+import json
+import logging
+import math
+import numpy as np
 
-from api.models.metric import Metric, MetricType
+from api.config import settings
+from api.models.metric import Metric, MetricDailyStat, MetricType
 from api.models.user import User
+from services.kernels import lttb_indices
+from services.baselines import BaselineCache, BaselineService, Samples
+from services.calendar_cache import CalendarCache, cacheable_year
+from services.daily_stats import DailyStatsService, TouchedDays, day_aligned, touched_days
+from services.latest_cache import LatestValueCache, latest_entry
+from services.result_cache import DataVersions
+from services.sketches import SKETCH_RELATIVE_ACCURACY, SketchService
+from services.tiers import (
+    Tier,
+    ROLLUP_TABLES,
+    choose_tier,
+    refresh_rollups,
+    rollups_available,
+    timescaledb_available,
+)
+from services.timeseries import load_series
+
+logger = logging.getLogger(__name__)
+
+# Column order for COPY into the metrics hypertable (id comes from its sequence)
+METRIC_COPY_COLUMNS = [
+    "user_id",
+    "metric_type",
+    "source",
+    "value",
+    "unit",
+    "timestamp",
+    "metadata",
+    "quality_score",
+    "is_manual",
+    "synced_at",
+]
+
+TREND_INTERVALS = ("hour", "day", "week", "month")
+
+# Net change (in percent) below which a trend is reported as stable
+TREND_STABLE_THRESHOLD_PCT = 2.0
+
+# Percentiles reported by get_distribution
+DISTRIBUTION_PERCENTILES = (10, 25, 50, 75, 90)
+
+# Length of each period compared by compare_periods, in whole UTC days
+COMPARISON_PERIOD_DAYS = {"week": 7, "month": 30, "quarter": 91, "year": 365}
+
+METRIC_NATURAL_KEY = ["user_id", "metric_type", "source", "timestamp"]
+
+# Columns refreshed when a re-ingested sample collides with the natural key
+METRIC_UPSERT_UPDATE_COLUMNS = ["value", "unit", "metadata", "quality_score", "synced_at"]
+
+_STAGING_TABLE = "metrics_staging"
+
+_CREATE_STAGING_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {_STAGING_TABLE} (
+        user_id integer,
+        metric_type varchar,
+        source varchar,
+        value double precision,
+        unit varchar,
+        timestamp timestamptz,
+        metadata jsonb,
+        quality_score double precision,
+        is_manual integer,
+        synced_at timestamptz,
+        ordinal bigserial
+    ) ON COMMIT DROP
+"""
+
+# DISTINCT ON collapses duplicates within a batch, which ON CONFLICT DO UPDATE
+# rejects; ordinal numbers rows in COPY order, so the last occurrence of a key
+# wins. (xmax = 0) is true only for freshly inserted tuples.
+_STAGED_ROWS_SQL = f"""
+    INSERT INTO metrics ({", ".join(METRIC_COPY_COLUMNS)})
+    SELECT DISTINCT ON ({", ".join(METRIC_NATURAL_KEY)}) {", ".join(METRIC_COPY_COLUMNS)}
+    FROM {_STAGING_TABLE}
+    ORDER BY {", ".join(METRIC_NATURAL_KEY)}, ordinal DESC
+    ON CONFLICT ({", ".join(METRIC_NATURAL_KEY)})
+"""
+
+# Per metric type: write counts plus the newly inserted samples, which feed
+# the streaming baselines (updates replace a value and are not folded in)
+_INSERTED_SAMPLES_SQL = """
+    SELECT
+        metric_type,
+        count(*) FILTER (WHERE is_insert) AS inserted,
+        count(*) FILTER (WHERE NOT is_insert) AS updated,
+        array_agg(extract(epoch FROM timestamp)::float8) FILTER (WHERE is_insert) AS epochs,
+        array_agg(value) FILTER (WHERE is_insert) AS "values"
+    FROM upserted
+    GROUP BY metric_type
+"""
+
+_UPSERT_SQL = f"""
+    WITH upserted AS (
+        {_STAGED_ROWS_SQL}
+        DO UPDATE SET {", ".join(f"{c} = EXCLUDED.{c}" for c in METRIC_UPSERT_UPDATE_COLUMNS)}
+        WHERE (metrics.value, metrics.unit, metrics.metadata, metrics.quality_score)
+            IS DISTINCT FROM (EXCLUDED.value, EXCLUDED.unit, EXCLUDED.metadata, EXCLUDED.quality_score)
+        RETURNING metric_type, timestamp, value, (xmax = 0) AS is_insert
+    )
+    {_INSERTED_SAMPLES_SQL}
+"""
+
+_INSERT_IGNORE_SQL = f"""
+    WITH upserted AS (
+        {_STAGED_ROWS_SQL}
+        DO NOTHING
+        RETURNING metric_type, timestamp, value, true AS is_insert
+    )
+    {_INSERTED_SAMPLES_SQL}
+"""
 
 
 class MetricsService:
@@ -25,6 +142,33 @@ class MetricsService:
         limit: int = 1000
     ) -> List[Metric]:
         """Query metrics with filters"""
+        metrics, _ = await MetricsService.get_metrics_page(
+            db, user, metric_type, source, start_date, end_date, limit
+        )
+        return metrics
+
+    @staticmethod
+    async def get_metrics_page(
+        db: AsyncSession,
+        user: User,
+        metric_type: Optional[str] = None,
+        source: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 1000,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Metric], Optional[str]]:
+        """
+        Query one page of metrics, newest first, with keyset pagination
+
+        Pages seek on (timestamp, id) from the opaque ``cursor`` returned with
+        the previous page, so every page is an index range scan on
+        idx_user_metric_time (or idx_user_time without a metric type) and
+        page N costs the same as page 1. Never uses OFFSET.
+
+        Returns (metrics, next_cursor); next_cursor is None on the last page.
+        Raises ValueError for a malformed cursor.
+        """
         query = select(Metric).where(Metric.user_id == user.id)
 
         if metric_type:
@@ -39,98 +183,552 @@ class MetricsService:
         if end_date:
             query = query.where(Metric.timestamp <= end_date)
 
-        query = query.order_by(Metric.timestamp.desc()).limit(limit)
+        if cursor:
+            cursor_timestamp, cursor_id = decode_cursor(cursor)
+            # Spelled out rather than as a row comparison so the timestamp
+            # bound is usable as an index condition; id only breaks ties.
+            query = query.where(
+                and_(
+                    Metric.timestamp <= cursor_timestamp,
+                    or_(
+                        Metric.timestamp < cursor_timestamp,
+                        Metric.id < cursor_id
+                    )
+                )
+            )
+
+        # Fetch one extra row to learn whether another page exists
+        query = query.order_by(Metric.timestamp.desc(), Metric.id.desc()).limit(limit + 1)
 
         result = await db.execute(query)
-        return result.scalars().all()
+        metrics = list(result.scalars().all())
+
+        next_cursor = None
+        if len(metrics) > limit:
+            metrics = metrics[:limit]
+            next_cursor = encode_cursor(metrics[-1].timestamp, metrics[-1].id)
+
+        return metrics, next_cursor
 
     @staticmethod
-    async def get_metric_summary(
+    async def get_downsampled_metrics(
         db: AsyncSession,
         user: User,
         metric_type: str,
+        max_points: int,
+        source: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None
+    ) -> List[dict]:
+        """
+        Query a metric's full range reduced to at most ``max_points`` samples
+
+        Samples are picked with LTTB, so peaks survive while the payload size
+        stays flat regardless of the range. Returned newest first, like
+        get_metrics. Points carry the metric's unit and, when no source filter
+        is given, its most common source within the range.
+        """
+        series = await load_series(db, user.id, metric_type, start_date, end_date, source)
+        if not len(series):
+            return []
+
+        # Labels from the same window as the series, so cost follows the range
+        conditions = [
+            Metric.user_id == user.id,
+            Metric.metric_type == metric_type
+        ]
+        if start_date:
+            conditions.append(Metric.timestamp >= start_date)
+        if end_date:
+            conditions.append(Metric.timestamp <= end_date)
+        if source:
+            conditions.append(Metric.source == source)
+        labels = select(
+            func.min(Metric.unit).label("unit"),
+            func.mode().within_group(Metric.source).label("source")
+        ).where(and_(*conditions))
+        label_row = (await db.execute(labels)).one()
+
+        indices = lttb_indices(series.epoch_seconds(), series.values, max_points)
+        timestamps = series.timestamps[indices].tolist()
+
+        return [
+            {
+                "metric_type": metric_type,
+                "value": float(series.values[i]),
+                "unit": label_row.unit,
+                "timestamp": timestamps[n].replace(tzinfo=timezone.utc),
+                "source": source or label_row.source
+            }
+            for n, i in reversed(list(enumerate(indices)))
+        ]
+
+    @staticmethod
+    async def get_metric_summary(
+        db: AsyncSession,
+        user: User,
+        metric_type: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        include_median: bool = True
     ) -> dict:
-        """Calculate statistical summary for a metric"""
-        query = select(Metric).where(
-            and_(
-                Metric.user_id == user.id,
-                Metric.metric_type == metric_type
-            )
+        """
+        Calculate statistical summary for a metric in a single aggregate query
+
+        An exact median needs individual samples, so it pins the query to the
+        raw tier. Without it, count/mean/min/max/std are answered exactly from
+        the coarsest rollup tier the range aligns with, and median is None.
+        """
+        tier = choose_tier(
+            start_date,
+            end_date,
+            needs_raw_values=include_median,
+            available=await rollups_available(db)
         )
 
-        if start_date:
-            query = query.where(Metric.timestamp >= start_date)
+        if tier == Tier.RAW:
+            query = select(
+                func.count(Metric.value).label("count"),
+                func.avg(Metric.value).label("mean"),
+                func.min(Metric.value).label("min"),
+                func.max(Metric.value).label("max"),
+                func.stddev_samp(Metric.value).label("std"),
+                func.min(Metric.unit).label("unit"),
+                (
+                    func.percentile_cont(0.5).within_group(Metric.value)
+                    if include_median else null()
+                ).label("median")
+            ).where(
+                and_(
+                    Metric.user_id == user.id,
+                    Metric.metric_type == metric_type
+                )
+            )
 
-        if end_date:
-            query = query.where(Metric.timestamp <= end_date)
+            if start_date:
+                query = query.where(Metric.timestamp >= start_date)
 
-        result = await db.execute(query)
-        metrics = result.scalars().all()
+            if end_date:
+                query = query.where(Metric.timestamp <= end_date)
+
+            result = await db.execute(query)
+            row = result.one()
+            std = row.std
+        else:
+            rollup = ROLLUP_TABLES[tier]
+            query = select(
+                func.sum(rollup.c.value_count).label("count"),
+                (func.sum(rollup.c.value_sum) / func.sum(rollup.c.value_count)).label("mean"),
+                func.min(rollup.c.value_min).label("min"),
+                func.max(rollup.c.value_max).label("max"),
+                func.sum(rollup.c.value_sum).label("sum"),
+                func.sum(rollup.c.value_sum_sq).label("sum_sq"),
+                func.min(rollup.c.unit).label("unit"),
+                null().label("median")
+            ).where(
+                _rollup_filter(rollup, user, metric_type, start_date, end_date)
+            )
 
-        if not metrics:
+            result = await db.execute(query)
+            row = result.one()
+            std = _sample_std(row.count, row.sum, row.sum_sq)
+
+        if not row.count:
             return {
                 "metric_type": metric_type,
                 "count": 0,
                 "mean": 0.0,
-                "median": 0.0,
+                "median": 0.0 if include_median else None,
                 "min": 0.0,
                 "max": 0.0,
                 "std": 0.0,
                 "unit": ""
             }
 
-        values = [m.value for m in metrics]
-        df = pd.Series(values)
+        return {
+            "metric_type": metric_type,
+            "count": int(row.count),
+            "mean": float(row.mean),
+            "median": float(row.median) if include_median else None,
+            "min": float(row.min),
+            "max": float(row.max),
+            # The sample standard deviation is undefined for a single sample
+            "std": float(std) if std is not None else 0.0,
+            "unit": row.unit or ""
+        }
+
+    @staticmethod
+    async def get_trend(
+        db: AsyncSession,
+        user: User,
+        metric_type: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        interval: str = "day",
+        moving_average_window: int = 7
+    ) -> dict:
+        """
+        Bucket a metric by ``interval`` with a trailing moving average
+
+        One query does everything: buckets come from the coarsest tier that
+        answers the range and interval exactly, empty buckets are filled
+        (time_bucket_gapfill on TimescaleDB for a bounded range, otherwise a
+        generated series from the first to the last bucket) with a null
+        value, the moving average spans the last ``moving_average_window``
+        buckets, and trend_direction/change_percentage come from the
+        least-squares line (regr_slope) through the bucket values. Raises
+        ValueError for an unknown interval.
+        """
+        if interval not in TREND_INTERVALS:
+            raise ValueError(f"Unknown interval: {interval}")
+
+        tier = choose_tier(
+            start_date, end_date, interval, available=await rollups_available(db)
+        )
+        gapfill = start_date is not None and end_date is not None and await timescaledb_available(db)
+        unit = literal_column(f"'{interval}'")
+        width = literal_column(f"INTERVAL '1 {interval}'")
+        utc = literal_column("'UTC'")
+
+        if tier == Tier.RAW:
+            time_column = Metric.timestamp
+            value = func.avg(Metric.value)
+            unit_column = Metric.unit
+            conditions = [
+                Metric.user_id == user.id,
+                Metric.metric_type == metric_type
+            ]
+            if start_date:
+                conditions.append(Metric.timestamp >= start_date)
+            if end_date:
+                conditions.append(Metric.timestamp <= end_date)
+            condition = and_(*conditions)
+        else:
+            rollup = ROLLUP_TABLES[tier]
+            time_column = rollup.c.bucket
+            value = func.sum(rollup.c.value_sum) / func.sum(rollup.c.value_count)
+            unit_column = rollup.c.unit
+            condition = _rollup_filter(rollup, user, metric_type, start_date, end_date)
+
+        if gapfill:
+            bucket = func.time_bucket_gapfill(
+                width, time_column, _utc_literal(start_date), _utc_literal(end_date)
+            )
+        else:
+            bucket = func.date_trunc(unit, time_column, utc)
+
+        buckets = select(
+            bucket.label("bucket"),
+            value.label("value"),
+            func.max(unit_column).label("unit")
+        ).where(condition).group_by(bucket).cte("buckets")
+
+        if not gapfill:
+            # Step through UTC wall-clock time so month buckets land on month starts
+            first = (
+                func.date_trunc(unit, _utc_literal(start_date), utc) if start_date
+                else select(func.min(buckets.c.bucket)).scalar_subquery()
+            )
+            last = (
+                func.date_trunc(unit, _utc_literal(end_date), utc) if end_date
+                else select(func.max(buckets.c.bucket)).scalar_subquery()
+            )
+            series = select(
+                func.timezone(utc, func.generate_series(
+                    func.timezone(utc, first), func.timezone(utc, last), width
+                )).label("bucket")
+            ).subquery()
+            buckets = select(
+                series.c.bucket,
+                buckets.c.value,
+                buckets.c.unit
+            ).select_from(
+                series.outerjoin(buckets, buckets.c.bucket == series.c.bucket)
+            ).subquery()
+
+        # Regression against time in days; gaps (null values) are ignored
+        x = func.extract("epoch", buckets.c.bucket) / 86400.0
+        has_value = buckets.c.value.isnot(None)
+        query = select(
+            buckets.c.bucket,
+            buckets.c.value,
+            func.avg(buckets.c.value).over(
+                order_by=buckets.c.bucket,
+                rows=(-(moving_average_window - 1), 0)
+            ).label("moving_average"),
+            func.regr_slope(buckets.c.value, x).over().label("slope"),
+            func.regr_intercept(buckets.c.value, x).over().label("intercept"),
+            func.min(x).filter(has_value).over().label("first_x"),
+            func.max(x).filter(has_value).over().label("last_x"),
+            func.max(buckets.c.unit).over().label("unit")
+        ).order_by(buckets.c.bucket)
+
+        result = await db.execute(query)
+        rows = result.all()
+
+        data = [
+            {
+                "timestamp": row.bucket,
+                "value": float(row.value) if row.value is not None else None,
+                "moving_average": float(row.moving_average) if row.moving_average is not None else None
+            }
+            for row in rows
+        ]
+
+        # Change along the fitted line, relative to where it starts
+        change_percentage = 0.0
+        if rows and rows[0].slope is not None:
+            fit = rows[0]
+            fitted_start = fit.intercept + fit.slope * fit.first_x
+            if fitted_start:
+                change_percentage = fit.slope * (fit.last_x - fit.first_x) / abs(fitted_start) * 100
+
+        if change_percentage > TREND_STABLE_THRESHOLD_PCT:
+            direction = "increasing"
+        elif change_percentage < -TREND_STABLE_THRESHOLD_PCT:
+            direction = "decreasing"
+        else:
+            direction = "stable"
 
         return {
             "metric_type": metric_type,
-            "count": len(values),
-            "mean": float(df.mean()),
-            "median": float(df.median()),
-            "min": float(df.min()),
-            "max": float(df.max()),
-            "std": float(df.std()),
-            "unit": metrics[0].unit if metrics else ""
+            "data": data,
+            "trend_direction": direction,
+            "change_percentage": float(change_percentage),
+            "unit": (rows[0].unit if rows else None) or ""
+        }
+
+    @staticmethod
+    async def get_calendar(
+        db: AsyncSession,
+        user: User,
+        metric_type: str,
+        year: int
+    ) -> List[Optional[float]]:
+        """
+        Daily mean values for one calendar year (UTC days)
+
+        Returns one entry per day of the year starting on January 1, None
+        for days without data. Read from the daily stats store; past years
+        are cached until a write touches them.
+        """
+        type_key = _metric_type_key(metric_type)
+        generation = None
+        if cacheable_year(year):
+            generation, days = await CalendarCache.get(user.id, type_key, year)
+            if days is not None:
+                return days
+
+        first_day = date(year, 1, 1)
+        next_year = date(year + 1, 1, 1)
+        result = await db.execute(
+            select(
+                MetricDailyStat.day,
+                (MetricDailyStat.value_sum / MetricDailyStat.value_count).label("value")
+            ).where(
+                and_(
+                    MetricDailyStat.user_id == user.id,
+                    MetricDailyStat.metric_type == type_key,
+                    MetricDailyStat.day >= first_day,
+                    MetricDailyStat.day < next_year
+                )
+            )
+        )
+
+        days: List[Optional[float]] = [None] * (next_year - first_day).days
+        for row in result:
+            days[(row.day - first_day).days] = float(row.value)
+
+        if generation is not None:
+            await CalendarCache.set(user.id, type_key, year, generation, days)
+
+        return days
+
+    @staticmethod
+    async def get_distribution(
+        db: AsyncSession,
+        user: User,
+        metric_type: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        bins: int = 20,
+        exact: bool = False
+    ) -> dict:
+        """
+        Percentiles and an equal-width histogram of a metric's values
+
+        Whole-day ranges merge the per-day sketches in SQL, so the cost
+        depends on the number of days rather than samples; percentiles are
+        then within SKETCH_RELATIVE_ACCURACY of the exact values and the
+        minimum and maximum are exact. ``exact`` (or a range that splits
+        days) computes everything from raw rows instead.
+        """
+        type_key = _metric_type_key(metric_type)
+        exact = exact or not day_aligned(start_date, end_date)
+
+        if exact:
+            count, edges, histogram, percentiles = await _exact_distribution(
+                db, user, type_key, start_date, end_date, bins
+            )
+        else:
+            sketch = await SketchService.merged(
+                db,
+                user.id,
+                type_key,
+                start_date.date() if start_date else None,
+                end_date.date() if end_date else None
+            )
+            count = sketch.count
+            edges, histogram = sketch.histogram(bins)
+            percentiles = sketch.quantiles([p / 100 for p in DISTRIBUTION_PERCENTILES])
+
+        return {
+            "metric_type": type_key,
+            "count": count,
+            "exact": exact,
+            "relative_accuracy": None if exact else SKETCH_RELATIVE_ACCURACY,
+            "histogram": [
+                {"lower": float(edges[i]), "upper": float(edges[i + 1]), "count": int(histogram[i])}
+                for i in range(len(histogram))
+            ],
+            "percentiles": {
+                f"p{p}": float(percentiles[i]) if percentiles is not None else None
+                for i, p in enumerate(DISTRIBUTION_PERCENTILES)
+            }
         }
 
+    @staticmethod
+    async def compare_periods(
+        db: AsyncSession,
+        user: User,
+        period: str = "week",
+        metric_type: Optional[str] = None,
+        now: Optional[datetime] = None
+    ) -> List[dict]:
+        """
+        Mean of each metric over the current period against the one before it
+
+        The current period is the last COMPARISON_PERIOD_DAYS[period] UTC days
+        up to and including today, the previous period the same number of days
+        before that. Both means come from one pass over the contiguous range
+        (FILTER aggregates on either side of the boundary), read from the
+        daily rollup when it exists. Without ``metric_type`` every metric the
+        user has in either period is compared. Raises ValueError for an
+        unknown period.
+        """
+        if period not in COMPARISON_PERIOD_DAYS:
+            raise ValueError(f"Unknown period: {period}")
+
+        now = now or datetime.now(timezone.utc)
+        length = timedelta(days=COMPARISON_PERIOD_DAYS[period])
+        today = now.astimezone(timezone.utc).date()
+        end = datetime(today.year, today.month, today.day, tzinfo=timezone.utc) + timedelta(days=1)
+        boundary = end - length
+        start = boundary - length
+        last = end - timedelta(microseconds=1)
+
+        tier = choose_tier(start, last, "day", available=await rollups_available(db))
+
+        if tier == Tier.RAW:
+            type_column = Metric.metric_type
+            current = Metric.timestamp >= boundary
+            previous = Metric.timestamp < boundary
+            query = select(
+                type_column.label("metric_type"),
+                func.avg(Metric.value).filter(current).label("current_period"),
+                func.avg(Metric.value).filter(previous).label("previous_period"),
+                func.max(Metric.unit).label("unit")
+            ).where(
+                Metric.user_id == user.id,
+                Metric.timestamp >= start,
+                Metric.timestamp <= last
+            )
+            if metric_type:
+                query = query.where(Metric.metric_type == metric_type)
+        else:
+            rollup = ROLLUP_TABLES[tier]
+            type_column = rollup.c.metric_type
+            current = rollup.c.bucket >= boundary
+            previous = rollup.c.bucket < boundary
+            query = select(
+                type_column.label("metric_type"),
+                (
+                    func.sum(rollup.c.value_sum).filter(current)
+                    / func.sum(rollup.c.value_count).filter(current)
+                ).label("current_period"),
+                (
+                    func.sum(rollup.c.value_sum).filter(previous)
+                    / func.sum(rollup.c.value_count).filter(previous)
+                ).label("previous_period"),
+                func.max(rollup.c.unit).label("unit")
+            ).where(
+                rollup.c.user_id == user.id,
+                rollup.c.bucket >= start,
+                rollup.c.bucket <= last
+            )
+            if metric_type:
+                query = query.where(rollup.c.metric_type == _metric_type_key(metric_type))
+
+        result = await db.execute(query.group_by(type_column).order_by(type_column))
+
+        comparisons = []
+        for row in result:
+            current_value = float(row.current_period) if row.current_period is not None else None
+            previous_value = float(row.previous_period) if row.previous_period is not None else None
+            change = None
+            change_percentage = None
+            if current_value is not None and previous_value is not None:
+                change = current_value - previous_value
+                if previous_value:
+                    change_percentage = change / abs(previous_value) * 100
+            comparisons.append({
+                "metric_type": _metric_type_key(row.metric_type),
+                "current_period": current_value,
+                "previous_period": previous_value,
+                "change": change,
+                "change_percentage": change_percentage,
+                "unit": row.unit or ""
+            })
+
+        return comparisons
+
     @staticmethod
     async def get_latest_metrics(
         db: AsyncSession,
         user: User
     ) -> dict:
         """Get latest value for each metric type"""
-        # Query for latest metric of each type
-        from sqlalchemy.sql import distinct
-
-        result = {}
+        cached = await LatestValueCache.get(user.id)
+        if cached is not None:
+            return cached
 
-        # Get all metric types for user
-        metric_types_query = select(distinct(Metric.metric_type)).where(
+        # One DISTINCT ON pass over idx_user_metric_time; ordering both keys
+        # descending lets Postgres walk the index backwards without a sort.
+        query = select(
+            Metric.metric_type,
+            Metric.value,
+            Metric.unit,
+            Metric.timestamp,
+            Metric.source
+        ).where(
             Metric.user_id == user.id
+        ).distinct(
+            Metric.metric_type
+        ).order_by(
+            Metric.metric_type.desc(),
+            Metric.timestamp.desc()
         )
-        metric_types_result = await db.execute(metric_types_query)
-        metric_types = metric_types_result.scalars().all()
 
-        for metric_type in metric_types:
-            query = select(Metric).where(
-                and_(
-                    Metric.user_id == user.id,
-                    Metric.metric_type == metric_type
-                )
-            ).order_by(Metric.timestamp.desc()).limit(1)
+        rows = await db.execute(query)
 
-            latest_result = await db.execute(query)
-            latest_metric = latest_result.scalar_one_or_none()
+        result = {
+            _metric_type_key(row.metric_type): latest_entry(
+                row.value, row.unit, row.timestamp, row.source
+            )
+            for row in rows
+        }
 
-            if latest_metric:
-                result[metric_type] = {
-                    "value": latest_metric.value,
-                    "unit": latest_metric.unit,
-                    "timestamp": latest_metric.timestamp.isoformat(),
-                    "source": latest_metric.source
-                }
+        await LatestValueCache.update(user.id, result, complete=True)
 
         return result
 
@@ -145,22 +743,48 @@ class MetricsService:
         timestamp: Optional[datetime] = None,
         metadata: Optional[dict] = None
     ) -> Metric:
-        """Create a new metric"""
-        metric = Metric(
+        """Create a new metric, or update the existing sample with the same natural key"""
+        now = datetime.utcnow()
+        stmt = pg_insert(Metric).values(
             user_id=user.id,
             metric_type=metric_type,
             value=value,
             unit=unit,
             source=source,
-            timestamp=timestamp or datetime.utcnow(),
+            timestamp=timestamp or now,
             metadata=metadata,
             is_manual=1 if source == "manual" else 0,
-            synced_at=datetime.utcnow()
+            synced_at=now
         )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=METRIC_NATURAL_KEY,
+            set_={
+                column: stmt.excluded[column]
+                for column in METRIC_UPSERT_UPDATE_COLUMNS
+            }
+        ).returning(Metric, literal_column("(xmax = 0)").label("inserted"))
 
-        db.add(metric)
+        result = await db.execute(stmt)
+        metric, inserted = result.one()
+        type_key = _metric_type_key(metric.metric_type)
+        samples = {}
+        if inserted:
+            samples[type_key] = (
+                np.array([metric.timestamp.timestamp()]), np.array([metric.value], dtype=np.float64)
+            )
+        touched = touched_days([(type_key, metric.timestamp)])
+        baselines = await _after_ingest(db, user.id, touched, samples)
         await db.commit()
-        await db.refresh(metric)
+        await refresh_rollups(db, touched)
+
+        await LatestValueCache.update(user.id, {
+            type_key: latest_entry(
+                metric.value, metric.unit, metric.timestamp, metric.source
+            )
+        })
+        await BaselineCache.update(user.id, baselines)
+        await DataVersions.bump(user.id, [type_key])
+        await CalendarCache.invalidate(user.id, touched)
 
         return metric
 
@@ -168,18 +792,341 @@ class MetricsService:
     async def bulk_create_metrics(
         db: AsyncSession,
         user: User,
-        metrics_data: List[dict]
+        metrics_data: Iterable[dict]
     ) -> int:
         """Bulk create metrics"""
-        metrics = [
-            Metric(
-                user_id=user.id,
-                **metric_data
+        result = await MetricsService.bulk_load_metrics(db, user, metrics_data)
+        return result["inserted"]
+
+    @staticmethod
+    async def bulk_load_metrics(
+        db: AsyncSession,
+        user: User,
+        metrics_data: Iterable[dict],
+        chunk_size: Optional[int] = None,
+        on_conflict: str = "update"
+    ) -> dict:
+        """
+        Stream metrics into the metrics hypertable with binary COPY
+
+        Rows are converted to column tuples and sent in chunks of
+        ``chunk_size`` so memory stays bounded for long backfills; any
+        iterable (including a generator) is accepted. Each chunk is copied
+        into a temporary staging table and upserted on the natural key
+        (user_id, metric_type, source, timestamp), so re-running an
+        overlapping sync window is a no-op rather than table growth.
+
+        - **on_conflict**: "update" overwrites changed samples, "ignore" keeps existing ones
+
+        Returns {"inserted": int, "updated": int, "skipped": int}, where
+        skipped counts invalid rows plus duplicates that changed nothing.
+        """
+        if on_conflict not in ("update", "ignore"):
+            raise ValueError(f"Unknown on_conflict mode: {on_conflict}")
+
+        chunk_size = chunk_size or settings.BULK_INSERT_CHUNK_SIZE
+        synced_at = datetime.now(timezone.utc)
+        conn = await _driver_connection(db)
+        await conn.execute(_CREATE_STAGING_SQL)
+
+        upsert_sql = _UPSERT_SQL if on_conflict == "update" else _INSERT_IGNORE_SQL
+
+        inserted = 0
+        updated = 0
+        skipped = 0
+        newest: Dict[str, tuple] = {}
+        touched: TouchedDays = {}
+        baselines: Dict[str, dict] = {}
+
+        for chunk in _chunks(metrics_data, chunk_size):
+            records = []
+            for metric_data in chunk:
+                record = _copy_record(user.id, metric_data, synced_at)
+                if record is None:
+                    skipped += 1
+                    continue
+
+                records.append(record)
+                current = newest.get(record[1])
+                if current is None or record[5] >= current[5]:
+                    newest[record[1]] = record
+
+            if not records:
+                continue
+
+            await conn.copy_records_to_table(
+                _STAGING_TABLE,
+                records=records,
+                columns=METRIC_COPY_COLUMNS
             )
-            for metric_data in metrics_data
-        ]
+            written = await conn.fetch(upsert_sql)
+            await conn.execute(f"TRUNCATE {_STAGING_TABLE}")
+
+            for metric_type, days in touched_days((r[1], r[5]) for r in records).items():
+                touched.setdefault(metric_type, set()).update(days)
 
-        db.add_all(metrics)
+            # Fold this chunk's new samples into the baselines now, so memory
+            # stays bounded by the chunk rather than the whole load
+            baselines.update(await BaselineService.update(db, user.id, {
+                row["metric_type"]: (
+                    np.array(row["epochs"], dtype=np.float64),
+                    np.array(row["values"], dtype=np.float64)
+                )
+                for row in written
+                if row["inserted"]
+            }))
+
+            chunk_inserted = sum(row["inserted"] for row in written)
+            chunk_updated = sum(row["updated"] for row in written)
+            inserted += chunk_inserted
+            updated += chunk_updated
+            skipped += len(records) - chunk_inserted - chunk_updated
+
+        await _after_ingest(db, user.id, touched)
         await db.commit()
+        await refresh_rollups(db, touched)
+
+        await LatestValueCache.update(user.id, {
+            metric_type: latest_entry(record[3], record[4], record[5], record[2])
+            for metric_type, record in newest.items()
+        })
+        await BaselineCache.update(user.id, baselines)
+        await DataVersions.bump(user.id, newest)
+        await CalendarCache.invalidate(user.id, touched)
+
+        logger.info(
+            f"Bulk load for user {user.id}: {inserted} inserted, "
+            f"{updated} updated, {skipped} skipped"
+        )
+
+        return {"inserted": inserted, "updated": updated, "skipped": skipped}
+
+    @staticmethod
+    async def delete_metric(
+        db: AsyncSession,
+        user: User,
+        metric_id: int
+    ) -> bool:
+        """Delete a metric owned by the user"""
+        result = await db.execute(
+            delete(Metric).where(
+                and_(
+                    Metric.id == metric_id,
+                    Metric.user_id == user.id
+                )
+            ).returning(Metric.metric_type, Metric.timestamp)
+        )
+        deleted = result.all()
+        touched = touched_days(
+            (_metric_type_key(row.metric_type), row.timestamp) for row in deleted
+        )
+        await _after_ingest(db, user.id, touched)
+        await db.commit()
+
+        if not deleted:
+            return False
+
+        await refresh_rollups(db, touched)
+
+        # The deleted row may have been the latest of its type
+        await LatestValueCache.invalidate(user.id)
+        await DataVersions.bump(user.id, {_metric_type_key(row.metric_type) for row in deleted})
+        await CalendarCache.invalidate(user.id, touched)
+        return True
+
+
+async def _after_ingest(
+    db: AsyncSession,
+    user_id: int,
+    touched: TouchedDays,
+    samples: Optional[Samples] = None
+) -> Dict[str, dict]:
+    """
+    Bring derived state up to date with a write, before it commits
+
+    Every path that inserts, updates or deletes samples calls this with the
+    UTC days it touched, so derived stores can't drift from raw metrics.
+    Newly inserted ``samples`` are folded into the streaming baselines;
+    returns their new states for the cache once the write has committed.
+    """
+    await DailyStatsService.refresh(db, user_id, touched)
+    await SketchService.refresh(db, user_id, touched)
+    if not samples:
+        return {}
+    return await BaselineService.update(db, user_id, samples)
+
+
+async def _exact_distribution(
+    db: AsyncSession,
+    user: User,
+    metric_type: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    bins: int
+):
+    """Count, histogram edges and counts, and percentiles from raw rows"""
+    conditions = [
+        Metric.user_id == user.id,
+        Metric.metric_type == metric_type
+    ]
+    if start_date:
+        conditions.append(Metric.timestamp >= start_date)
+    if end_date:
+        conditions.append(Metric.timestamp <= end_date)
+
+    result = await db.execute(
+        select(
+            func.count(Metric.value),
+            func.min(Metric.value),
+            func.max(Metric.value),
+            func.percentile_cont(
+                pg_array([p / 100 for p in DISTRIBUTION_PERCENTILES])
+            ).within_group(Metric.value)
+        ).where(and_(*conditions))
+    )
+    count, low, high, percentiles = result.one()
+    if not count:
+        return 0, np.array([]), np.array([], dtype=np.int64), None
+    if low == high:
+        return count, np.array([low, high]), np.array([count]), percentiles
+
+    # width_bucket puts the maximum in bucket bins + 1; fold it into the last
+    bucket = func.least(func.width_bucket(Metric.value, low, high, bins), bins)
+    result = await db.execute(
+        select(bucket, func.count()).where(and_(*conditions)).group_by(bucket)
+    )
+    histogram = np.zeros(bins, dtype=np.int64)
+    for index, bucket_count in result:
+        histogram[index - 1] = bucket_count
+
+    return count, np.linspace(low, high, bins + 1), histogram, percentiles
+
+
+def _utc_literal(moment: datetime):
+    """A range boundary as a timestamptz parameter (naive values are UTC)"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return literal(moment, DateTime(timezone=True))
+
+
+def _rollup_filter(
+    rollup,
+    user: User,
+    metric_type: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+):
+    """WHERE clause selecting a user's metric buckets from a rollup tier"""
+    conditions = [
+        rollup.c.user_id == user.id,
+        rollup.c.metric_type == _metric_type_key(metric_type)
+    ]
+    if start_date:
+        conditions.append(rollup.c.bucket >= start_date)
+    if end_date:
+        conditions.append(rollup.c.bucket <= end_date)
+    return and_(*conditions)
+
+
+def _sample_std(count, total, total_sq) -> Optional[float]:
+    """Sample standard deviation from count, sum and sum of squares"""
+    if not count or count < 2:
+        return None
+    count = float(count)
+    variance = (float(total_sq) - float(total) ** 2 / count) / (count - 1)
+    return math.sqrt(max(variance, 0.0))
+
+
+def downsample_points(points: List[dict], max_points: Optional[int]) -> List[dict]:
+    """
+    Reduce chronologically ordered {"timestamp", "value", ...} dicts with LTTB
+
+    Points without a value (e.g. gap-filled buckets) are kept out of the
+    selection and dropped; the input is returned as-is when it already fits.
+    """
+    if not max_points or len(points) <= max_points:
+        return points
+
+    points = [point for point in points if point["value"] is not None]
+    if len(points) <= max_points:
+        return points
+
+    x = np.array([point["timestamp"].timestamp() for point in points], dtype=np.float64)
+    y = np.array([point["value"] for point in points], dtype=np.float64)
+
+    return [points[i] for i in lttb_indices(x, y, max_points)]
+
+
+def encode_cursor(timestamp: datetime, metric_id: int) -> str:
+    """Encode a (timestamp, id) keyset position as an opaque cursor"""
+    payload = json.dumps({"ts": timestamp.isoformat(), "id": metric_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["ts"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _metric_type_key(metric_type) -> str:
+    """Normalize a MetricType member or raw string to its value"""
+    return getattr(metric_type, "value", metric_type)
+
+
+async def _driver_connection(db: AsyncSession):
+    """Get the asyncpg connection behind a session, inside its transaction"""
+    connection = await db.connection()
+    # The asyncpg adapter opens its transaction lazily on the first
+    # statement; issue one so raw driver calls join the session transaction.
+    await connection.execute(select(1))
+    raw = await connection.get_raw_connection()
+    return raw.driver_connection
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    """Yield lists of at most ``size`` items from any iterable"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _copy_record(user_id: int, metric_data: dict, synced_at: datetime) -> Optional[tuple]:
+    """Convert a metric dict to a COPY tuple, or None if it is invalid"""
+    try:
+        metric_type = MetricType(metric_data["metric_type"]).value
+        value = float(metric_data["value"])
+        unit = metric_data["unit"]
+        source = metric_data.get("source") or "manual"
+        timestamp = metric_data["timestamp"]
+    except (KeyError, ValueError, TypeError):
+        return None
+
+    if not isinstance(timestamp, datetime) or unit is None or not math.isfinite(value):
+        return None
+
+    # asyncpg interprets naive datetimes in local time; stored times are UTC
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+    metadata = metric_data.get("metadata")
 
-        return len(metrics)
+    return (
+        user_id,
+        metric_type,
+        source,
+        value,
+        unit,
+        timestamp,
+        json.dumps(metadata) if metadata is not None else None,
+        metric_data.get("quality_score"),
+        metric_data.get("is_manual", 1 if source == "manual" else 0),
+        metric_data.get("synced_at") or synced_at
+    )
@@ -0,0 +1,118 @@
+"""
+Redis cache of derived analytics results, invalidated by data versions
+
+Every (user, metric type) has an opaque data version that ingest replaces
+after each committed write. A cached result is stored with the version it
+was computed from and is served only while that version is current, so a
+computation racing an ingest can never pin stale output.
+"""
+from typing import Iterable, Optional
+from datetime import datetime, timezone
+import json
+import logging
+import uuid
+
+from api.cache import get_redis
+from api.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _new_version() -> str:
+    return uuid.uuid4().hex
+
+
+class DataVersions:
+    """Redis hash of data versions, keyed per user with one field per metric type"""
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"metrics:versions:{user_id}"
+
+    @staticmethod
+    async def get(user_id: int, metric_type: str) -> Optional[str]:
+        """
+        Current data version of a metric, or None if Redis is unavailable
+
+        A missing version (never written, or lost with Redis) is created, so
+        it matches no result cached before.
+        """
+        key = DataVersions._key(user_id)
+        try:
+            await get_redis().hsetnx(key, metric_type, _new_version())
+            return await get_redis().hget(key, metric_type)
+        except Exception as e:
+            logger.warning(f"Data version read failed for user {user_id}: {e}")
+            return None
+
+    @staticmethod
+    async def bump(user_id: int, metric_types: Iterable[str]):
+        """Mark results derived from these metrics as stale; call after commit"""
+        mapping = {metric_type: _new_version() for metric_type in metric_types}
+        if not mapping:
+            return
+        try:
+            await get_redis().hset(DataVersions._key(user_id), mapping=mapping)
+        except Exception as e:
+            logger.warning(f"Data version bump failed for user {user_id}: {e}")
+            # Losing the whole hash also invalidates every cached result
+            try:
+                await get_redis().delete(DataVersions._key(user_id))
+            except Exception:
+                pass
+
+
+class ResultCache:
+    """Versioned results of one kind of analysis, per user, metric type and variant"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def _key(self, user_id: int, metric_type: str, variant: str) -> str:
+        return f"analytics:{self.name}:{user_id}:{metric_type}:{variant}"
+
+    async def get(self, user_id: int, metric_type: str, variant: str) -> Optional[dict]:
+        """Cached entry ({"version", "computed_at", "result"}), current or not"""
+        try:
+            payload = await get_redis().get(self._key(user_id, metric_type, variant))
+        except Exception as e:
+            logger.warning(f"{self.name} cache read failed for user {user_id}: {e}")
+            return None
+        return json.loads(payload) if payload else None
+
+    async def set(self, user_id: int, metric_type: str, variant: str, version: str, result):
+        """Store a result computed from data at ``version``"""
+        entry = {
+            "version": version,
+            "computed_at": datetime.now(timezone.utc).isoformat(),
+            "result": result
+        }
+        try:
+            await get_redis().set(
+                self._key(user_id, metric_type, variant),
+                json.dumps(entry),
+                ex=settings.RESULT_CACHE_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"{self.name} cache update failed for user {user_id}: {e}")
+
+    async def claim(self, user_id: int, metric_type: str, variant: str, version: str, seconds: int) -> bool:
+        """
+        Claim the computation of a version, so concurrent requests enqueue it once
+
+        The claim expires after ``seconds`` in case its worker dies. Without
+        Redis every request claims (and computes) on its own.
+        """
+        key = f"{self._key(user_id, metric_type, variant)}:pending:{version}"
+        try:
+            return bool(await get_redis().set(key, "1", nx=True, ex=seconds))
+        except Exception as e:
+            logger.warning(f"{self.name} cache claim failed for user {user_id}: {e}")
+            return True
+
+    async def release(self, user_id: int, metric_type: str, variant: str, version: str):
+        """Give up a claim, e.g. when the task could not be enqueued"""
+        try:
+            await get_redis().delete(f"{self._key(user_id, metric_type, variant)}:pending:{version}")
+        except Exception:
+            pass
@@ -0,0 +1,271 @@
+"""
+Mergeable per-day quantile sketches (DDSketch) for every metric
+
+A DDSketch counts values in logarithmic bins: x > 0 falls in bin
+ceil(log_gamma(x)) with gamma = (1 + alpha) / (1 - alpha), and a quantile is
+answered with the representative value of the bin holding its rank, which
+is within a relative error alpha of the exact order statistic. Negative
+values are binned by magnitude and values near zero counted apart. Sketches
+merge by adding counts per bin, so the sketches of the days in a range
+answer percentiles and histograms for the whole range.
+
+The metric_daily_sketches table holds one sketch per user, metric type and
+UTC day. Like the daily stats it is recomputed from raw rows for the days
+an ingest touches, with the binning done in SQL.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from typing import Optional, Sequence, Tuple
+from datetime import date, datetime, timedelta, timezone
+import logging
+import math
+import numpy as np
+
+from api.config import settings
+from services.daily_stats import TouchedDays
+
+logger = logging.getLogger(__name__)
+
+# Relative error of sketch quantiles. Stored bins depend on it: changing it
+# requires rebuilding metric_daily_sketches (see migration 010).
+SKETCH_RELATIVE_ACCURACY = 0.01
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+
+# Values with a magnitude at or below this are counted as zero
+SKETCH_MIN_VALUE = 1e-9
+
+# Recompute touched days from raw rows, as the daily stats refresh does;
+# days left without samples lose their sketch.
+_REFRESH_SQL = text("""
+    WITH touched AS (
+        SELECT DISTINCT t.metric_type, t.day
+        FROM unnest(CAST(:metric_types AS varchar[]), CAST(:days AS date[])) AS t(metric_type, day)
+        WHERE t.day >= CAST(:since AS date)
+    ),
+    binned AS (
+        SELECT
+            t.metric_type,
+            t.day,
+            sign(m.value) * (abs(m.value) > CAST(:min_value AS double precision))::integer AS side,
+            CASE WHEN abs(m.value) > CAST(:min_value AS double precision)
+                THEN ceil(ln(abs(m.value)) / CAST(:ln_gamma AS double precision))::integer
+                ELSE 0
+            END AS key,
+            count(*) AS value_count,
+            min(m.value) AS value_min,
+            max(m.value) AS value_max
+        FROM touched t
+        JOIN metrics m
+            ON m.user_id = :user_id
+            AND m.metric_type = t.metric_type
+            AND m.timestamp >= t.day::timestamp AT TIME ZONE 'UTC'
+            AND m.timestamp < (t.day + 1)::timestamp AT TIME ZONE 'UTC'
+        GROUP BY t.metric_type, t.day, side, key
+    ),
+    fresh AS (
+        SELECT
+            metric_type,
+            day,
+            sum(value_count) AS value_count,
+            min(value_min) AS value_min,
+            max(value_max) AS value_max,
+            coalesce(sum(value_count) FILTER (WHERE side = 0), 0) AS zero_count,
+            coalesce(array_agg(key ORDER BY key) FILTER (WHERE side = 1), '{}') AS positive_keys,
+            coalesce(array_agg(value_count::integer ORDER BY key) FILTER (WHERE side = 1), '{}') AS positive_counts,
+            coalesce(array_agg(key ORDER BY key) FILTER (WHERE side = -1), '{}') AS negative_keys,
+            coalesce(array_agg(value_count::integer ORDER BY key) FILTER (WHERE side = -1), '{}') AS negative_counts
+        FROM binned
+        GROUP BY metric_type, day
+    ),
+    emptied AS (
+        DELETE FROM metric_daily_sketches s
+        USING touched t
+        WHERE s.user_id = :user_id
+            AND s.metric_type = t.metric_type
+            AND s.day = t.day
+            AND NOT EXISTS (
+                SELECT 1 FROM fresh f WHERE f.metric_type = t.metric_type AND f.day = t.day
+            )
+    )
+    INSERT INTO metric_daily_sketches (
+        user_id, metric_type, day, value_count, value_min, value_max, zero_count,
+        positive_keys, positive_counts, negative_keys, negative_counts
+    )
+    SELECT
+        CAST(:user_id AS integer), metric_type, day, value_count, value_min, value_max, zero_count,
+        positive_keys, positive_counts, negative_keys, negative_counts
+    FROM fresh
+    ON CONFLICT (user_id, metric_type, day) DO UPDATE SET
+        value_count = EXCLUDED.value_count,
+        value_min = EXCLUDED.value_min,
+        value_max = EXCLUDED.value_max,
+        zero_count = EXCLUDED.zero_count,
+        positive_keys = EXCLUDED.positive_keys,
+        positive_counts = EXCLUDED.positive_counts,
+        negative_keys = EXCLUDED.negative_keys,
+        negative_counts = EXCLUDED.negative_counts
+""")
+
+# Merge a range of daily sketches into one: bin counts summed per key for
+# each side, plus a side-0 row with the zero count and the extremes
+_MERGE_SQL = text("""
+    WITH days AS (
+        SELECT *
+        FROM metric_daily_sketches
+        WHERE user_id = :user_id
+            AND metric_type = :metric_type
+            AND (CAST(:start_day AS date) IS NULL OR day >= CAST(:start_day AS date))
+            AND (CAST(:end_day AS date) IS NULL OR day <= CAST(:end_day AS date))
+    )
+    SELECT
+        1 AS side,
+        b.key,
+        sum(b.count) AS count,
+        NULL::double precision AS value_min,
+        NULL::double precision AS value_max
+    FROM days, unnest(days.positive_keys, days.positive_counts) AS b(key, count)
+    GROUP BY b.key
+    UNION ALL
+    SELECT -1, b.key, sum(b.count), NULL, NULL
+    FROM days, unnest(days.negative_keys, days.negative_counts) AS b(key, count)
+    GROUP BY b.key
+    UNION ALL
+    SELECT 0, 0, coalesce(sum(zero_count), 0), min(value_min), max(value_max)
+    FROM days
+""")
+
+
+class DDSketch:
+    """A sketch as sorted bin keys and counts per side, with exact extremes"""
+
+    def __init__(
+        self,
+        positive: Tuple[Sequence[int], Sequence[int]] = ((), ()),
+        negative: Tuple[Sequence[int], Sequence[int]] = ((), ()),
+        zero_count: int = 0,
+        value_min: Optional[float] = None,
+        value_max: Optional[float] = None,
+        relative_accuracy: float = SKETCH_RELATIVE_ACCURACY
+    ):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.positive = _sorted_bins(*positive)
+        self.negative = _sorted_bins(*negative)
+        self.zero_count = int(zero_count)
+        self.value_min = value_min
+        self.value_max = value_max
+
+    @property
+    def count(self) -> int:
+        return int(self.positive[1].sum() + self.negative[1].sum()) + self.zero_count
+
+    def _bin_values(self, keys: np.ndarray) -> np.ndarray:
+        """Representative value of each bin, within relative_accuracy of anything in it"""
+        return 2 * self.gamma ** keys.astype(np.float64) / (self.gamma + 1)
+
+    def _ordered(self) -> Tuple[np.ndarray, np.ndarray]:
+        """All bins as (value, count) in ascending order of value"""
+        negative_keys, negative_counts = self.negative
+        positive_keys, positive_counts = self.positive
+        values = np.concatenate([
+            -self._bin_values(negative_keys[::-1]),
+            [0.0],
+            self._bin_values(positive_keys)
+        ])
+        counts = np.concatenate([negative_counts[::-1], [self.zero_count], positive_counts])
+        if self.value_min is not None:
+            values = np.clip(values, self.value_min, self.value_max)
+        return values, counts
+
+    def quantiles(self, qs: Sequence[float]) -> Optional[np.ndarray]:
+        """Values at quantiles ``qs`` (0 to 1), or None for an empty sketch"""
+        count = self.count
+        if not count:
+            return None
+        values, counts = self._ordered()
+        ranks = np.asarray(qs, dtype=np.float64) * (count - 1)
+        return values[np.searchsorted(np.cumsum(counts), ranks, side="right")]
+
+    def histogram(self, bins: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Counts over ``bins`` equal-width bins from the minimum to the maximum
+
+        Each sketch bin is counted at its representative value, so values
+        within relative_accuracy of a bin edge may land in the neighbouring bin.
+        """
+        if not self.count:
+            return np.array([]), np.array([], dtype=np.int64)
+        values, counts = self._ordered()
+        edges = np.linspace(self.value_min, self.value_max, bins + 1)
+        if self.value_min == self.value_max:
+            return edges[[0, -1]], np.array([self.count], dtype=np.int64)
+        histogram, _ = np.histogram(values, edges, weights=counts)
+        return edges, np.rint(histogram).astype(np.int64)
+
+
+class SketchService:
+    """Service for the per-day sketch store"""
+
+    @staticmethod
+    async def refresh(
+        db: AsyncSession,
+        user_id: int,
+        touched: TouchedDays
+    ) -> None:
+        """
+        Recompute the sketches of touched days within the current transaction
+
+        Days older than the raw retention window are left alone, as their raw
+        rows may already be gone.
+        """
+        if not touched:
+            return
+
+        metric_types = []
+        days = []
+        for metric_type, metric_days in touched.items():
+            metric_types.extend([metric_type] * len(metric_days))
+            days.extend(metric_days)
+
+        since = datetime.now(timezone.utc).date() - timedelta(days=settings.RAW_DATA_RETENTION_DAYS)
+        await db.execute(_REFRESH_SQL, {
+            "user_id": user_id,
+            "metric_types": metric_types,
+            "days": days,
+            "since": since,
+            "min_value": SKETCH_MIN_VALUE,
+            "ln_gamma": math.log(SKETCH_GAMMA)
+        })
+
+    @staticmethod
+    async def merged(
+        db: AsyncSession,
+        user_id: int,
+        metric_type: str,
+        start_day: Optional[date] = None,
+        end_day: Optional[date] = None
+    ) -> DDSketch:
+        """One sketch of a metric over an inclusive range of UTC days (open ends allowed)"""
+        result = await db.execute(_MERGE_SQL, {
+            "user_id": user_id,
+            "metric_type": metric_type,
+            "start_day": start_day,
+            "end_day": end_day
+        })
+        bins = {1: ([], []), -1: ([], [])}
+        zero_count, value_min, value_max = 0, None, None
+        for row in result:
+            if row.side == 0:
+                zero_count, value_min, value_max = row.count, row.value_min, row.value_max
+            else:
+                bins[row.side][0].append(row.key)
+                bins[row.side][1].append(row.count)
+
+        return DDSketch(bins[1], bins[-1], zero_count, value_min, value_max)
+
+
+def _sorted_bins(keys: Sequence[int], counts: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    keys = np.asarray(keys, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    order = np.argsort(keys, kind="stable")
+    return keys[order], counts[order]
@@ -0,0 +1,185 @@
+"""
+Query planning across raw metrics and the hourly/daily rollup tiers
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import table, column, text, Float, Integer, String, DateTime
+from typing import Dict, Optional, Set
+from datetime import date, datetime, time, timedelta, timezone
+from enum import Enum
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Tier(str, Enum):
+    """Storage tiers, finest to coarsest"""
+    RAW = "raw"
+    HOURLY = "hourly"
+    DAILY = "daily"
+
+
+TIER_BUCKET_WIDTH = {
+    Tier.HOURLY: timedelta(hours=1),
+    Tier.DAILY: timedelta(days=1),
+}
+
+# How far behind now each rollup's refresh policy stops (end_offset in
+# migration 003); newer buckets are answered by real-time aggregation
+TIER_REFRESH_LAG = {
+    Tier.HOURLY: timedelta(hours=1),
+    Tier.DAILY: timedelta(days=1),
+}
+
+# Trend intervals each tier can serve without splitting its buckets
+TIER_INTERVALS = {
+    Tier.HOURLY: {"hour", "day", "week", "month"},
+    Tier.DAILY: {"day", "week", "month"},
+}
+
+
+def _rollup_table(name: str):
+    """Core table clause for a continuous aggregate (not part of Base.metadata)"""
+    return table(
+        name,
+        column("user_id", Integer),
+        column("metric_type", String),
+        column("bucket", DateTime(timezone=True)),
+        column("value_count", Integer),
+        column("value_sum", Float),
+        column("value_sum_sq", Float),
+        column("value_avg", Float),
+        column("value_min", Float),
+        column("value_max", Float),
+        column("unit", String),
+    )
+
+
+metrics_hourly = _rollup_table("metrics_hourly")
+metrics_daily = _rollup_table("metrics_daily")
+
+ROLLUP_TABLES = {
+    Tier.HOURLY: metrics_hourly,
+    Tier.DAILY: metrics_daily,
+}
+
+_timescaledb_available: Optional[bool] = None
+_rollups_available: Optional[bool] = None
+
+
+async def timescaledb_available(db: AsyncSession) -> bool:
+    """Check (once per process) whether the TimescaleDB extension is installed"""
+    global _timescaledb_available
+    if _timescaledb_available is None:
+        result = await db.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb')"
+        ))
+        _timescaledb_available = bool(result.scalar())
+        logger.info(f"TimescaleDB available: {_timescaledb_available}")
+    return _timescaledb_available
+
+
+async def rollups_available(db: AsyncSession) -> bool:
+    """Check (once per process) whether the rollup continuous aggregates exist"""
+    global _rollups_available
+    if _rollups_available is None:
+        if not await timescaledb_available(db):
+            _rollups_available = False
+        else:
+            result = await db.execute(text(
+                "SELECT to_regclass('metrics_daily') IS NOT NULL "
+                "AND to_regclass('metrics_hourly') IS NOT NULL"
+            ))
+            _rollups_available = bool(result.scalar())
+        logger.info(f"Metric rollup tiers available: {_rollups_available}")
+    return _rollups_available
+
+
+async def refresh_rollups(
+    db: AsyncSession,
+    touched: Dict[str, Set[date]],
+    now: Optional[datetime] = None
+) -> None:
+    """
+    Re-materialize the rollup buckets of past days a write touched
+
+    Real-time aggregation only covers buckets past a rollup's watermark, so
+    a backfill into older buckets would be served stale from the rollup
+    tiers until the refresh policy next runs. Writes to today only are left
+    to the policy. refresh_continuous_aggregate can't run in a transaction:
+    this uses its own autocommit connection, so call it after commit.
+    """
+    now = now or datetime.now(timezone.utc)
+    days = {day for metric_days in touched.values() for day in metric_days}
+    if not days or min(days) >= now.date() or not await rollups_available(db):
+        return
+
+    start = datetime.combine(min(days), time.min, tzinfo=timezone.utc)
+    end = datetime.combine(max(days), time.min, tzinfo=timezone.utc) + timedelta(days=1)
+
+    try:
+        async with db.bind.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for tier, rollup in ROLLUP_TABLES.items():
+                # Stop where the policy would, leaving newer buckets real-time
+                window_end = min(end, _floor(now - TIER_REFRESH_LAG[tier], TIER_BUCKET_WIDTH[tier]))
+                if window_end <= start:
+                    continue
+                await conn.execute(
+                    text(
+                        f"CALL refresh_continuous_aggregate('{rollup.name}', "
+                        "CAST(:start AS timestamptz), CAST(:end AS timestamptz))"
+                    ),
+                    {"start": start, "end": window_end}
+                )
+    except Exception as e:
+        logger.warning(f"Rollup refresh for {start.date()} to {end.date()} failed: {e}")
+
+
+def _floor(moment: datetime, width: timedelta) -> datetime:
+    """Start of the UTC bucket of ``width`` holding ``moment``"""
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return epoch + (moment - epoch) // width * width
+
+
+def _aligned(moment: Optional[datetime], width: timedelta) -> bool:
+    """Whether a range boundary falls on a UTC bucket edge (open ends always do)"""
+    if moment is None:
+        return True
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (moment - epoch) % width == timedelta(0)
+
+
+def choose_tier(
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    interval: Optional[str] = None,
+    needs_raw_values: bool = False,
+    available: bool = True
+) -> Tier:
+    """
+    Pick the coarsest tier that answers a query exactly
+
+    A rollup tier qualifies when both range boundaries fall on its bucket
+    edges and the requested interval is a whole number of its buckets.
+    ``end_date`` is inclusive, as elsewhere in the service layer, so an end
+    of 23:59:59.999999 counts as aligned to the following midnight.
+
+    - **interval**: Output bucket ("hour", "day", "week", "month"), if any
+    - **needs_raw_values**: The query needs individual samples (e.g. an exact median)
+    - **available**: Result of rollups_available(); False forces the raw tier
+    """
+    if needs_raw_values or not available:
+        return Tier.RAW
+
+    end_exclusive = end_date + timedelta(microseconds=1) if end_date else None
+
+    for tier in (Tier.DAILY, Tier.HOURLY):
+        width = TIER_BUCKET_WIDTH[tier]
+        if interval is not None and interval not in TIER_INTERVALS[tier]:
+            continue
+        if _aligned(start_date, width) and _aligned(end_exclusive, width):
+            return tier
+
+    return Tier.RAW
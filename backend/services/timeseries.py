@@ -0,0 +1,189 @@
+"""
+Columnar time-series loading shared by the services
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, and_, cast, literal, literal_column, BigInteger, Integer, LargeBinary
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+from datetime import datetime, timezone
+import numpy as np
+
+from api.models.metric import Metric, MetricDailyStat
+from services.daily_stats import day_aligned
+from services.kernels import daily_means
+
+_EMPTY = np.empty(0)
+
+
+@dataclass(frozen=True)
+class TimeSeries:
+    """One metric's samples as contiguous arrays, in timestamp order"""
+    timestamps: np.ndarray  # datetime64[us], UTC
+    values: np.ndarray      # float64
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @classmethod
+    def empty(cls) -> "TimeSeries":
+        return cls(_EMPTY.astype("datetime64[us]"), _EMPTY.astype(np.float64))
+
+    def epoch_seconds(self) -> np.ndarray:
+        """Timestamps as float64 seconds since the Unix epoch"""
+        return self.timestamps.view(np.int64) / 1e6
+
+    def daily_means(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Mean value per UTC day, as (datetime64[D] days, float64 means)"""
+        return daily_means(self.timestamps, self.values)
+
+    def isoformat(self, indices: Iterable[int]) -> List[str]:
+        """ISO 8601 UTC strings for selected samples, matching datetime.isoformat()"""
+        return [
+            moment.replace(tzinfo=timezone.utc).isoformat()
+            for moment in self.timestamps[np.asarray(indices, dtype=np.int64)].tolist()
+        ]
+
+
+@dataclass(frozen=True)
+class DailyMatrix:
+    """Daily means pivoted to a (days x metric types) matrix; NaN marks a missing day"""
+    days: np.ndarray        # datetime64[D], UTC, ascending
+    metric_types: List[str]
+    values: np.ndarray      # float64, shape (len(days), len(metric_types))
+
+    def dense(self) -> "DailyMatrix":
+        """The same matrix with a row for every calendar day from first to last"""
+        if not len(self.days):
+            return self
+        offsets = (self.days - self.days[0]).astype(np.int64)
+        values = np.full((int(offsets[-1]) + 1, len(self.metric_types)), np.nan)
+        values[offsets] = self.values
+        days = self.days[0] + np.arange(len(values))
+        return DailyMatrix(days, self.metric_types, values)
+
+    def column(self, metric_type: str) -> np.ndarray:
+        """One metric's daily means; all NaN when the metric has no data"""
+        if metric_type not in self.metric_types:
+            return np.full(len(self.days), np.nan)
+        return self.values[:, self.metric_types.index(metric_type)]
+
+
+def _packed_columns(order_by):
+    """
+    Aggregates packing (timestamp, value) into one big-endian bytea each
+
+    Postgres serializes every sample with int8send/float8send and
+    concatenates them in timestamp order, so the driver hands back two
+    buffers per metric type instead of one Python object per row and column.
+    """
+    epoch_us = cast(func.extract("epoch", Metric.timestamp) * 1_000_000, BigInteger)
+    separator = literal(b"", LargeBinary)
+    return (
+        func.string_agg(func.int8send(epoch_us), aggregate_order_by(separator, order_by)).label("timestamps"),
+        func.string_agg(func.float8send(Metric.value), aggregate_order_by(separator, order_by)).label("values"),
+    )
+
+
+def _unpack(timestamps: Optional[bytes], values: Optional[bytes]) -> TimeSeries:
+    """Decode packed buffers into native-endian arrays"""
+    if not timestamps:
+        return TimeSeries.empty()
+    return TimeSeries(
+        np.frombuffer(timestamps, dtype=">i8").astype(np.int64).view("datetime64[us]"),
+        np.frombuffer(values, dtype=">f8").astype(np.float64)
+    )
+
+
+def _range_filter(
+    user_id: int,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+) -> list:
+    conditions = [Metric.user_id == user_id]
+    if start_date:
+        conditions.append(Metric.timestamp >= start_date)
+    if end_date:
+        conditions.append(Metric.timestamp <= end_date)
+    return conditions
+
+
+async def load_series(
+    db: AsyncSession,
+    user_id: int,
+    metric_type: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    source: Optional[str] = None
+) -> TimeSeries:
+    """Load one metric's (timestamp, value) samples in a single round trip"""
+    conditions = _range_filter(user_id, start_date, end_date)
+    conditions.append(Metric.metric_type == metric_type)
+    if source:
+        conditions.append(Metric.source == source)
+
+    query = select(*_packed_columns(Metric.timestamp)).where(and_(*conditions))
+    row = (await db.execute(query)).one()
+    return _unpack(row.timestamps, row.values)
+
+
+async def load_daily_matrix(
+    db: AsyncSession,
+    user_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    metric_types: Optional[List[str]] = None
+) -> DailyMatrix:
+    """
+    Load the mean of every metric per UTC day in a single query
+
+    Reads the daily stats store when the range covers whole days, raw rows
+    otherwise.
+    """
+    if day_aligned(start_date, end_date):
+        query = select(
+            MetricDailyStat.metric_type.label("metric_type"),
+            MetricDailyStat.day.label("day"),
+            (MetricDailyStat.value_sum / MetricDailyStat.value_count).label("value")
+        ).where(MetricDailyStat.user_id == user_id)
+        if start_date:
+            query = query.where(MetricDailyStat.day >= start_date.date())
+        if end_date:
+            query = query.where(MetricDailyStat.day <= end_date.date())
+        if metric_types is not None:
+            query = query.where(MetricDailyStat.metric_type.in_(metric_types))
+    else:
+        day = func.date_trunc(literal_column("'day'"), Metric.timestamp, literal_column("'UTC'"))
+        query = select(
+            Metric.metric_type.label("metric_type"),
+            day.label("day"),
+            func.avg(Metric.value).label("value")
+        ).where(
+            and_(*_range_filter(user_id, start_date, end_date))
+        ).group_by(Metric.metric_type, day)
+        if metric_types is not None:
+            query = query.where(Metric.metric_type.in_(metric_types))
+
+    # Days travel as integers since the epoch rather than datetime objects
+    days = query.subquery()
+    query = select(
+        days.c.metric_type,
+        cast(func.floor(func.extract("epoch", days.c.day) / 86400), Integer),
+        days.c.value
+    )
+    rows = (await db.execute(query)).all()
+
+    if not rows:
+        return DailyMatrix(np.empty(0, dtype="datetime64[D]"), [], np.empty((0, 0)))
+
+    names = [getattr(row[0], "value", row[0]) for row in rows]
+    metric_index = {name: i for i, name in enumerate(sorted(set(names)))}
+    day_numbers = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    columns = np.fromiter((metric_index[name] for name in names), dtype=np.int64, count=len(rows))
+
+    unique_days, day_rows = np.unique(day_numbers, return_inverse=True)
+    matrix = np.full((len(unique_days), len(metric_index)), np.nan)
+    matrix[day_rows, columns] = values
+
+    return DailyMatrix(unique_days.view("datetime64[D]"), list(metric_index), matrix)
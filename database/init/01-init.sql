@@ -21,7 +21,8 @@ GRANT ALL PRIVILEGES ON ALL SEQUENCES IN SCHEMA public TO hygieia;
 -- Create data retention policies (example)
 -- SELECT add_retention_policy('metrics', INTERVAL '1 year');
 
--- Create continuous aggregates for common queries (example)
+-- Continuous aggregates (metrics_hourly, metrics_daily) are created by
+-- alembic migration 003_metric_rollups; the example below is kept for reference.
 -- CREATE MATERIALIZED VIEW metrics_hourly
 -- WITH (timescaledb.continuous) AS
 -- SELECT
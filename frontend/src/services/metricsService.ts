@@ -8,11 +8,16 @@ export interface Metric {
   source: string
 }
 
+export interface MetricPage {
+  data: Metric[]
+  next_cursor: string | null
+}
+
 export interface MetricSummary {
   metric_type: string
   count: number
   mean: number
-  median: number
+  median: number | null  // null when include_median is false
   min: number
   max: number
   std: number
@@ -26,11 +31,24 @@ export const metricsService = {
     start_date?: string
     end_date?: string
     limit?: number
+    max_points?: number
   }): Promise<Metric[]> {
     const { data } = await api.get('/metrics', { params })
     return data
   },
 
+  async getMetricsPage(params: {
+    metric_type?: string
+    source?: string
+    start_date?: string
+    end_date?: string
+    page_size: number
+    cursor?: string
+  }): Promise<MetricPage> {
+    const { data } = await api.get('/metrics', { params })
+    return data
+  },
+
   async getMetricTypes() {
     const { data } = await api.get('/metrics/types')
     return data
@@ -41,6 +59,7 @@ export const metricsService = {
     params?: {
       start_date?: string
       end_date?: string
+      include_median?: boolean
     }
   ): Promise<MetricSummary> {
     const { data } = await api.get(`/metrics/summary`, {